@@ -0,0 +1,182 @@
+import gzip
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from config import (
+    ARCHIVE_COMPRESSION, ARCHIVE_SEGMENT_MAX_BYTES, DB_CONNECTION_TIMEOUT
+)
+
+# zstd - если установлен пакет zstandard, иначе gzip
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ARCHIVE_INDEX_SQL = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    site TEXT,
+    kind TEXT,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    fetched_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_pages_site_kind ON pages(site, kind);
+"""
+
+RECORD_VERSION = 'ARCHIVE/1.0'
+
+
+def _compression() -> str:
+    if ARCHIVE_COMPRESSION == 'zstd' and zstandard is not None:
+        return 'zstd'
+    return 'gzip'
+
+
+def _compress(data: bytes, method: str) -> bytes:
+    if method == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data: bytes, method: str) -> bytes:
+    if method == 'zstd':
+        if zstandard is None:
+            raise ImportError("Архив сжат zstd: установите пакет zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _encode_record(url: str, kind: str, fetched_at: float, text: str) -> bytes:
+    body = text.encode('utf-8')
+    header = (
+        f"{RECORD_VERSION}\r\n"
+        f"URL: {url}\r\n"
+        f"Kind: {kind}\r\n"
+        f"Date: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(fetched_at))}\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode('utf-8')
+    return header + body
+
+
+def _decode_record(data: bytes) -> str:
+    _, _, body = data.partition(b"\r\n\r\n")
+    return body.decode('utf-8')
+
+
+class PageArchive:
+    """
+    Архив сырых страниц только на дозапись (по мотивам WARC).
+    Каждая запись сжимается отдельно (gzip или zstd) и дописывается в конец
+    текущего сегмента; индекс url -> (сегмент, смещение, длина) лежит в index.sqlite.
+    При повторной загрузке url индекс указывает на последнюю версию.
+    """
+
+    def __init__(self, archive_dir: str, segment_max_bytes: int = ARCHIVE_SEGMENT_MAX_BYTES):
+        self.archive_dir = archive_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.compression = _compression()
+        os.makedirs(archive_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(archive_dir, 'index.sqlite'),
+            timeout=DB_CONNECTION_TIMEOUT,
+            check_same_thread=False
+        )
+        self._conn.executescript(ARCHIVE_INDEX_SQL)
+        self._conn.commit()
+        self._segment_file = None
+        self._segment_name = None
+
+    def _segment_ext(self, method: str) -> str:
+        return '.zst' if method == 'zstd' else '.gz'
+
+    def _open_segment(self):
+        """Текущий сегмент для дозаписи; новый - если старый переполнен"""
+        if self._segment_file is not None and self._segment_file.tell() < self.segment_max_bytes:
+            return self._segment_file
+        if self._segment_file is not None:
+            self._segment_file.close()
+        ext = self._segment_ext(self.compression)
+        existing = sorted(f for f in os.listdir(self.archive_dir) if f.startswith('segment-') and f.endswith(ext))
+        number = int(existing[-1].split('-')[1].split('.')[0]) if existing else 0
+        name = f"segment-{number:06d}{ext}"
+        path = os.path.join(self.archive_dir, name)
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_max_bytes:
+            name = f"segment-{number + 1:06d}{ext}"
+            path = os.path.join(self.archive_dir, name)
+        self._segment_name = name
+        self._segment_file = open(path, 'ab')
+        return self._segment_file
+
+    def put(self, url: str, text: str, kind: str = 'article', site: Optional[str] = None):
+        fetched_at = time.time()
+        record = _compress(_encode_record(url, kind, fetched_at, text), self.compression)
+        with self._lock:
+            f = self._open_segment()
+            offset = f.tell()
+            f.write(record)
+            f.flush()
+            self._conn.execute("""
+            INSERT OR REPLACE INTO pages (url, site, kind, segment, offset, length, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (url, site, kind, self._segment_name, offset, len(record), fetched_at))
+            self._conn.commit()
+
+    def contains(self, url: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM pages WHERE url = ?", (url,)).fetchone() is not None
+
+    def _read(self, segment: str, offset: int, length: int) -> str:
+        with open(os.path.join(self.archive_dir, segment), 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        method = 'zstd' if segment.endswith('.zst') else 'gzip'
+        return _decode_record(_decompress(data, method))
+
+    def get(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT segment, offset, length FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._read(*row)
+
+    def urls(self, site: Optional[str] = None, kind: Optional[str] = None) -> List[str]:
+        """URL архива (в порядке записи), с фильтром по сайту и типу страницы"""
+        sql = "SELECT url FROM pages WHERE 1 = 1"
+        params: Tuple = ()
+        if site is not None:
+            sql += " AND site = ?"
+            params += (site,)
+        if kind is not None:
+            sql += " AND kind = ?"
+            params += (kind,)
+        sql += " ORDER BY segment, offset"
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params).fetchall()]
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        """Все страницы (url, html) последовательным чтением сегментов"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, segment, offset, length FROM pages ORDER BY segment, offset"
+            ).fetchall()
+        for url, segment, offset, length in rows:
+            yield url, self._read(segment, offset, length)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+            self._conn.close()
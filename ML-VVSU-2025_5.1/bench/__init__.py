@@ -0,0 +1,52 @@
+"""
+Бенчмарки парсеров, очистки текста и записи в БД на сохранённых страницах (bench/fixtures).
+Запуск из корня проекта: python -m bench.run
+Откуда страница сайта - из fixtures/sources.json: 'synthetic' (написана вручную по разметке
+сайта) или 'recorded' (записана с сайта через python -m bench.record).
+"""
+import json
+import os
+import time
+from typing import Dict
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+SOURCES_FILE = os.path.join(FIXTURES_DIR, 'sources.json')
+
+
+def fixture_path(site_name: str, kind: str) -> str:
+    """Путь к сохранённой странице сайта: kind - 'list' или 'article'"""
+    return os.path.join(FIXTURES_DIR, f'{site_name}_{kind}.html')
+
+
+def recorded_sites():
+    """Сайты реестра, для которых есть сохранённые страницы списка и статьи"""
+    from parser import site_names
+    return [site_name for site_name in site_names()
+            if all(os.path.exists(fixture_path(site_name, kind)) for kind in ('list', 'article'))]
+
+
+def _read_sources() -> Dict[str, Dict]:
+    if not os.path.exists(SOURCES_FILE):
+        return {}
+    with open(SOURCES_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def fixture_sources() -> Dict[str, str]:
+    """Сайт -> 'synthetic' или 'recorded' ('unknown', если не отмечено)"""
+    sources = _read_sources()
+    return {site_name: sources.get(site_name, {}).get('source', 'unknown') for site_name in recorded_sites()}
+
+
+def mark_recorded(site_name: str, list_url: str, article_url: str):
+    """Отмечает страницы сайта как записанные с сайта"""
+    sources = _read_sources()
+    sources[site_name] = {
+        'source': 'recorded',
+        'list_url': list_url,
+        'article_url': article_url,
+        'recorded_at': time.strftime('%Y-%m-%d'),
+    }
+    with open(SOURCES_FILE, 'w', encoding='utf-8') as f:
+        json.dump(sources, f, ensure_ascii=False, indent=2)
+        f.write('\n')
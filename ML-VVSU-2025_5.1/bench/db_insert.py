@@ -0,0 +1,127 @@
+"""
+Запись статей в БД: прежний путь по одной статье против BatchWriter на синтетических статьях.
+
+Прежний путь - как до пакетной записи: журнал DELETE с synchronous=FULL (умолчания SQLite),
+проверка exists_url и INSERT с commit на каждую статью.
+Пакетный - как сейчас: WAL, одна проверка exists_urls на страницу списка и BatchWriter.
+Статьи идут страницами по PAGE_ARTICLES, как при обходе. Текст - SYNTHETIC_WORDS случайных
+слов из словаря; каждая DUPLICATE_EVERY-я статья - копия более ранней с припиской, как
+перепечатка новости. Поиск почти дубликатов - как в config.NEAR_DUP_ACTION, --near-dup off
+оставляет только разницу в транзакциях.
+
+python -m bench.db_insert                     - 100 000 статей
+python -m bench.db_insert --rows 10000 --near-dup off
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from db import (
+    init_db, exists_url, exists_urls, BatchWriter, WRITE_ARTICLE_SQL, _dedup_params, _insert_article_row
+)
+from config import NEAR_DUP_ACTION
+
+DEFAULT_ROWS = 100_000
+# статей на странице списка
+PAGE_ARTICLES = 20
+SYNTHETIC_WORDS = 80
+VOCABULARY_SIZE = 5000
+DUPLICATE_EVERY = 10
+
+_SYLLABLES = ['ка', 'ро', 'ми', 'ла', 'но', 'ст', 'ве', 'ту', 'пре', 'дал', 'кон', 'сер', 'бы', 'гра', 'мо']
+_VOCABULARY = [''.join(random.Random(i).choices(_SYLLABLES, k=3)) + str(i % 7) for i in range(VOCABULARY_SIZE)]
+
+
+def _text(i: int) -> str:
+    return ' '.join(random.Random(i).choices(_VOCABULARY, k=SYNTHETIC_WORDS))
+
+
+def synthetic_pages(rows: int) -> Iterator[List[Dict]]:
+    """Страницы синтетических статей с уникальными url"""
+    for start in range(0, rows, PAGE_ARTICLES):
+        page = []
+        for i in range(start, min(start + PAGE_ARTICLES, rows)):
+            if i and i % DUPLICATE_EVERY == 0:
+                # перепечатка одной из прошлых статей
+                source = random.Random(-i).randrange(i)
+                source += source % DUPLICATE_EVERY == 0
+                description = _text(source) + ' Источник: агентство новостей'
+            else:
+                description = _text(i)
+            page.append({
+                'guid': f'bench-{i}',
+                'title': f'Статья номер {i} о технологиях',
+                'description': description,
+                'url': f'https://example.com/articles/{i}',
+                'published_at': f'2025-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}+00:00',
+            })
+        yield page
+
+
+def insert_per_row(db_path: str, rows: int, near_dup_action: str):
+    conn = init_db(db_path)
+    conn.execute("PRAGMA journal_mode=DELETE;")
+    conn.execute("PRAGMA synchronous=FULL;")
+    try:
+        for page in synthetic_pages(rows):
+            for record in page:
+                if exists_url(conn, record['url']):
+                    continue
+                _insert_article_row(conn, WRITE_ARTICLE_SQL,
+                                    _dedup_params(conn, record, int(time.time()), near_dup_action))
+                conn.commit()
+    finally:
+        conn.close()
+
+
+def insert_batched(db_path: str, rows: int, near_dup_action: str):
+    conn = init_db(db_path)
+    try:
+        writer = BatchWriter(conn, near_dup_action=near_dup_action, site='bench')
+        for page in synthetic_pages(rows):
+            known = exists_urls(conn, [record['url'] for record in page])
+            for record in page:
+                if record['url'] not in known:
+                    writer.add(record)
+        writer.close()
+    finally:
+        conn.close()
+
+
+def _timed(func: Callable[[str, int, str], None], rows: int, near_dup_action: str) -> Tuple[float, int]:
+    """(секунд, отмечено почти дубликатов)"""
+    with tempfile.TemporaryDirectory(prefix='bench_db_') as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.sqlite')
+        started = time.perf_counter()
+        func(db_path, rows, near_dup_action)
+        elapsed = time.perf_counter() - started
+        conn = init_db(db_path)
+        saved, duplicates = conn.execute("SELECT COUNT(*), COUNT(duplicate_of) FROM articles").fetchone()
+        conn.close()
+    if saved != rows:
+        raise RuntimeError(f"Записано {saved} статей из {rows}")
+    return elapsed, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Запись статей в БД: по одной против BatchWriter')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS,
+                        help=f'Число синтетических статей (по умолчанию: {DEFAULT_ROWS})')
+    parser.add_argument('--near-dup', choices=['off', 'flag', 'drop_text'], default=NEAR_DUP_ACTION,
+                        help=f'Поиск почти дубликатов при записи (по умолчанию, как в config: {NEAR_DUP_ACTION})')
+    args = parser.parse_args()
+
+    print(f"Статей: {args.rows}, поиск почти дубликатов: {args.near_dup}")
+    results = {}
+    for name, func in (('по одной', insert_per_row), ('BatchWriter', insert_batched)):
+        results[name], duplicates = _timed(func, args.rows, args.near_dup)
+        print(f"{name:<12} {results[name]:>8.1f} с  {args.rows / results[name]:>10.0f} статей/с  "
+              f"дубликатов {duplicates}")
+    print(f"Ускорение: {results['по одной'] / results['BatchWriter']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
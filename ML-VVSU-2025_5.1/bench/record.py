@@ -0,0 +1,55 @@
+"""
+Записывает страницы для бенчмарков: первую страницу списка каждого сайта
+и первую статью из неё. Существующие файлы перезаписываются, в fixtures/sources.json
+сайт отмечается как записанный.
+Запуск: python -m bench.record [--site habr]
+"""
+import argparse
+import os
+import sys
+
+from parser import site_names, site_spec, create_parser
+from http_client import fetch_page, close_sessions
+from bench import FIXTURES_DIR, fixture_path, mark_recorded
+
+
+def record_site(site_name: str) -> bool:
+    parser_instance = create_parser(site_name)
+    list_url = site_spec(site_name)['base_url']
+    page = fetch_page(list_url, parser_instance=parser_instance, kind='list')
+    if not page:
+        print(f"{site_name}: не удалось загрузить {list_url}", file=sys.stderr)
+        return False
+    articles_meta = parser_instance.parse_list_page(page.text)
+    if not articles_meta:
+        print(f"{site_name}: на странице списка не найдено статей", file=sys.stderr)
+        return False
+    article = fetch_page(articles_meta[0]['url'], parser_instance=parser_instance)
+    if not article:
+        print(f"{site_name}: не удалось загрузить {articles_meta[0]['url']}", file=sys.stderr)
+        return False
+
+    for kind, text in (('list', page.text), ('article', article.text)):
+        with open(fixture_path(site_name, kind), 'w', encoding='utf-8') as f:
+            f.write(text)
+    mark_recorded(site_name, list_url, articles_meta[0]['url'])
+    print(f"{site_name}: статей в списке {len(articles_meta)}, сохранено в {FIXTURES_DIR}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Запись страниц для бенчмарков')
+    parser.add_argument('--site', choices=site_names() + ['all'], default='all')
+    args = parser.parse_args()
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    sites = site_names() if args.site == 'all' else [args.site]
+    try:
+        ok = all([record_site(site_name) for site_name in sites])
+    finally:
+        close_sessions()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
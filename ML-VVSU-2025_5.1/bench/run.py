@@ -0,0 +1,278 @@
+"""
+Бенчмарки на сохранённых страницах: разбор списков и статей всеми парсерами,
+очистка текста (cleaner.clean_text_from_html) и запись статей в БД (BatchWriter).
+Для каждого замера: страниц (записей) в секунду по самому быстрому и медианному вызову
+из BENCH_ITERATIONS * BENCH_REPEATS, пик памяти и удержанная после вызова память (tracemalloc).
+
+На общих и виртуальных машинах скорость плавает на десятки процентов даже в процессорном
+времени. Поэтому перед каждым вызовом прогоняется эталонная нагрузка, и порог регрессии
+проверяется по относительной скорости (relative): во сколько раз самый быстрый вызов
+эталона медленнее самого быстрого вызова замера. Она от запуска к запуску меняется на
+единицы процентов и почти не зависит от машины.
+
+python -m bench.run                       - замер и сравнение с базой
+python -m bench.run --save-baseline       - замер и запись результатов как базы
+python -m bench.run --threshold 10        - ошибка, если скорость упала больше чем на 10%
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from parser import create_parser
+from cleaner import clean_text_from_html
+from db import init_db, BatchWriter
+from config import (
+    PARSER_BACKEND, BENCH_ITERATIONS, BENCH_REPEATS, BENCH_BASELINE_PATH,
+    BENCH_REGRESSION_THRESHOLD_PCT, BENCH_RECHECKS
+)
+from bench import fixture_path, fixture_sources, recorded_sites
+
+# число статей в одной пачке замера записи в БД
+DB_BATCH_RECORDS = 50
+
+
+def _read_fixture(site_name: str, kind: str) -> str:
+    with open(fixture_path(site_name, kind), encoding='utf-8') as f:
+        return f.read()
+
+
+def _db_insert_case(records: List[Dict]) -> Tuple[Callable[[], None], int, Callable[[], None]]:
+    """Запись пачки статей через BatchWriter во временную БД; url каждый раз новые"""
+    tmp_dir = tempfile.mkdtemp(prefix='bench_db_')
+    conn = init_db(os.path.join(tmp_dir, 'bench.sqlite'))
+    counter = [0]
+
+    def insert_batch():
+        writer = BatchWriter(conn, batch_size=len(records) + 1, site='bench')
+        for record in records:
+            counter[0] += 1
+            writer.add(dict(record, url=f"{record['url']}?bench={counter[0]}"))
+        writer.close()
+
+    def cleanup():
+        conn.close()
+        for name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, name))
+        os.rmdir(tmp_dir)
+
+    return insert_batch, len(records), cleanup
+
+
+def build_cases(backend: str, sites: List[str]) -> Tuple[List[Tuple[str, Callable[[], object], int]], List[Callable]]:
+    """
+    Замеры: (имя, функция одного прогона, сколько страниц/записей она обрабатывает)
+    и функции для удаления временных файлов после замеров
+    """
+    cases = []
+    cleanups = []
+    records = []
+    for site_name in sites:
+        parser_instance = create_parser(site_name, backend=backend)
+        list_html = _read_fixture(site_name, 'list')
+        article_html = _read_fixture(site_name, 'article')
+        articles_meta = parser_instance.parse_list_page(list_html)
+        meta = articles_meta[0] if articles_meta else {'url': f'https://example.com/{site_name}'}
+        article = parser_instance.parse_article_page(article_html, meta)
+        if article:
+            records.append(article)
+
+        cases.append((f'list:{site_name}', lambda p=parser_instance, h=list_html: p.parse_list_page(h), 1))
+        cases.append((f'article:{site_name}',
+                      lambda p=parser_instance, h=article_html, m=meta: p.parse_article_page(h, m), 1))
+        cases.append((f'clean:{site_name}', lambda h=article_html: clean_text_from_html(h), 1))
+    if records:
+        batch = (records * (DB_BATCH_RECORDS // len(records) + 1))[:DB_BATCH_RECORDS]
+        insert_batch, units, cleanup = _db_insert_case(batch)
+        cases.append(('db:insert', insert_batch, units))
+        cleanups.append(cleanup)
+    return cases, cleanups
+
+
+_REFERENCE_RE = re.compile(r'[\d-]+')
+
+
+def _reference_workload():
+    """Эталонная нагрузка на интерпретатор: строки, регулярные выражения, словари"""
+    counts = {}
+    for i in range(3000):
+        word = _REFERENCE_RE.sub('', f'слово-{i % 97}-текст')
+        counts[word] = counts.get(word, 0) + 1
+    return sorted(counts)
+
+
+def _timed(func: Callable[[], object]) -> float:
+    started = time.process_time()
+    func()
+    return time.process_time() - started
+
+
+def _throughput(func: Callable[[], object], units: int, iterations: int, repeats: int) -> Tuple[float, float, float]:
+    """
+    (страниц в секунду по самому быстрому вызову, по медианному,
+    относительная скорость - по самым быстрым вызовам замера и эталона)
+    """
+    func()  # прогрев
+    samples = []
+    reference = []
+    for _ in range(repeats):
+        gc.collect()
+        for _ in range(iterations):
+            # эталон и замер вперемежку - оба видят одно и то же состояние машины
+            reference.append(_timed(_reference_workload))
+            samples.append(_timed(func))
+    samples.sort()
+    best, median = samples[0], samples[len(samples) // 2]
+    if best <= 0:
+        return 0.0, 0.0, 0.0
+    return units / best, units / median, units * min(reference) / best
+
+
+def _memory(func: Callable[[], object]) -> Tuple[int, int]:
+    """
+    (пик, удержано) в байтах для одного вызова; удержано - что осталось
+    после освобождения результата (кэши и утечки)
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before, max(current - before, 0)
+
+
+def run_benchmarks(backend: str = PARSER_BACKEND, sites: Optional[List[str]] = None,
+                   iterations: int = BENCH_ITERATIONS, repeats: int = BENCH_REPEATS,
+                   only: Optional[List[str]] = None) -> Dict:
+    """Прогоняет замеры (only - только замеры с этими именами)"""
+    sites = sites or recorded_sites()
+    sources = fixture_sources()
+    results = {}
+    cases, cleanups = build_cases(backend, sites)
+    try:
+        for name, func, units in cases:
+            if only is not None and name not in only:
+                continue
+            pages_per_sec, median_pages_per_sec, relative = _throughput(func, units, iterations, repeats)
+            peak, retained = _memory(func)
+            results[name] = {
+                'pages_per_sec': round(pages_per_sec, 2),
+                'median_pages_per_sec': round(median_pages_per_sec, 2),
+                'relative': round(relative, 4),
+                'peak_kb': round(peak / 1024, 1),
+                'retained_kb': round(retained / 1024, 1),
+            }
+            print(f"{name:<28} {pages_per_sec:>10.1f} стр/с (медиана {median_pages_per_sec:>8.1f})   пик {peak / 1024:>9.1f} КБ   "
+                  f"удержано {retained / 1024:>8.1f} КБ")
+    finally:
+        for cleanup in cleanups:
+            cleanup()
+    return {
+        'backend': backend,
+        'python': platform.python_version(),
+        'iterations': iterations,
+        'repeats': repeats,
+        'fixtures': {site_name: sources.get(site_name, 'unknown') for site_name in sites},
+        'results': results,
+    }
+
+
+def compare_with_baseline(current: Dict, baseline: Dict, threshold_pct: float) -> List[str]:
+    """Замеры, относительная скорость которых упала больше чем на threshold_pct процентов"""
+    if baseline.get('backend') != current.get('backend'):
+        print(f"База снята с бэкендом {baseline.get('backend')}, сравнение пропущено")
+        return []
+    base_fixtures = baseline.get('fixtures', {})
+    changed = [site_name for site_name, source in current.get('fixtures', {}).items()
+               if base_fixtures.get(site_name, source) != source]
+    if changed:
+        print(f"База снята на других страницах ({', '.join(changed)}), сравнение пропущено: "
+              f"запишите новую базу через --save-baseline")
+        return []
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base.get('relative'):
+            continue
+        change = (result['relative'] / base['relative'] - 1) * 100
+        mark = ''
+        if change < -threshold_pct:
+            mark = '  <-- регрессия'
+            regressions.append(name)
+        print(f"{name:<28} {base['relative']:>8.3f} -> {result['relative']:>8.3f} "
+              f"({change:+.1f}%){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки парсеров на сохранённых страницах')
+    parser.add_argument('--parser-backend', choices=['bs4', 'lxml'], default=PARSER_BACKEND)
+    parser.add_argument('--site', choices=recorded_sites(), action='append',
+                        help='Только указанные сайты (можно несколько раз)')
+    parser.add_argument('--iterations', type=int, default=BENCH_ITERATIONS)
+    parser.add_argument('--repeats', type=int, default=BENCH_REPEATS)
+    parser.add_argument('--baseline', default=BENCH_BASELINE_PATH, help='Файл базовых результатов')
+    parser.add_argument('--save-baseline', action='store_true', help='Записать результаты как базу')
+    parser.add_argument('--output', default=None, help='Записать результаты в JSON-файл')
+    parser.add_argument('--threshold', type=float, default=BENCH_REGRESSION_THRESHOLD_PCT,
+                        help='Допустимое падение скорости в процентах '
+                             f'(по умолчанию: {BENCH_REGRESSION_THRESHOLD_PCT})')
+    args = parser.parse_args()
+
+    current = run_benchmarks(args.parser_backend, args.site, args.iterations, args.repeats)
+    synthetic = [site_name for site_name, source in current['fixtures'].items() if source != 'recorded']
+    if synthetic:
+        print(f"Страницы не записаны с сайтов (синтетические), скорость на реальных может отличаться: "
+              f"{', '.join(synthetic)}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"База записана: {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"Нет файла базы {args.baseline}, сравнение пропущено")
+        return
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nСравнение с базой {args.baseline} (порог {args.threshold}%):")
+    regressions = compare_with_baseline(current, baseline, args.threshold)
+    for attempt in range(1, BENCH_RECHECKS + 1):
+        if not regressions:
+            break
+        # единичный выброс на шумной машине - не регрессия: перемеряем и берём лучший результат
+        print(f"\nПовторный замер {attempt}/{BENCH_RECHECKS}: {', '.join(regressions)}")
+        recheck = run_benchmarks(args.parser_backend, args.site, args.iterations, args.repeats, only=regressions)
+        for name, result in recheck['results'].items():
+            if result['relative'] > current['results'][name]['relative']:
+                current['results'][name] = result
+        regressions = compare_with_baseline(
+            {**current, 'results': {name: current['results'][name] for name in regressions}},
+            baseline, args.threshold
+        )
+    if regressions:
+        print(f"Регрессия производительности: {', '.join(regressions)}")
+        sys.exit(1)
+    print("Регрессий нет")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 from bs4 import BeautifulSoup
 import re
 from config import MEDIA_ELEMENTS_TO_REMOVE, MIN_CLEANER_TEXT_LENGTH, STOP_KEYWORDS
+import profiling
 
 def remove_media(soup: BeautifulSoup):
     """Удаляет медиа элементы и скрипты"""
@@ -10,6 +11,10 @@ def remove_media(soup: BeautifulSoup):
 
 def clean_text_from_html(html: str) -> str:
     """Очищает HTML и возвращает текст"""
+    with profiling.stage('clean'):
+        return _clean_text_from_html(html)
+
+def _clean_text_from_html(html: str) -> str:
     soup = BeautifulSoup(html, 'lxml')
     remove_media(soup)
     
@@ -4,35 +4,70 @@ DEFAULT_DB_PATH = 'articles.sqlite'
 MIN_TEXT_LENGTH = 30
 MIN_PARAGRAPH_LENGTH = 30
 
-# Конфигурация сайтов
+# Конфигурация сайтов: декларативные описания для реестра parser/registry.py.
+# 'parser' - класс с кодом разбора ("модуль:Класс", импортируется при первом обращении);
+# без него сайт разбирается по селекторам (list_item, list_link, list_date, article_selectors...).
+# 'pagination': 'page' (page_pattern со {i}) или 'date' (ленты по дням, date_pattern для strftime)
 SITES_CONFIG = {
     'habr': {
+        'parser': 'parser.habr:HabrNewsParser',
         'base_url': 'https://habr.com/ru/news/',
         'page_pattern': 'page{i}/',
-        'domain': 'https://habr.com'
+        'domain': 'https://habr.com',
+        # часовой пояс дат на страницах (часов от UTC)
+        'utc_offset_hours': 3,
+        'cache_ttl': 300,
+        # период опроса в режиме --daemon, секунды; страницы списка демон запрашивает
+        # условным запросом без учёта cache_ttl, так что период может быть и короче его
+        'poll_interval': 300,
+        # класс контейнера списка: после его закрытия страницу списка можно не дочитывать
+        'list_container': 'tm-articles-list'
     },
     'newsvl': {
+        'parser': 'parser.newsvl:NewsVLParser',
         'base_url': 'https://www.newsvl.ru/',
         'page_pattern': '?page={i}',
-        'domain': 'https://www.newsvl.ru'
+        'domain': 'https://www.newsvl.ru',
+        'utc_offset_hours': 10,
+        'cache_ttl': 300,
+        'poll_interval': 300
     },
     'ixbt': {
+        'parser': 'parser.ixbt:IXBTParser',
         'base_url': 'https://ixbt.games/news',
         'page_pattern': '?page={i}',
-        'domain': 'https://ixbt.games'
+        'domain': 'https://ixbt.games',
+        'utc_offset_hours': 3,
+        'cache_ttl': 600,
+        'poll_interval': 600
     },
     'naked-science': {
+        'parser': 'parser.nakedscience:NakedScienceParser',
         'base_url': 'https://naked-science.ru/article/',
         'page_pattern': 'page/{i}/',
-        'domain': 'https://naked-science.ru'
+        'domain': 'https://naked-science.ru',
+        'utc_offset_hours': 3,
+        'cache_ttl': 600,
+        'poll_interval': 900
     },
     'interfax': {
+        'parser': 'parser.interfax:InterfaxParser',
         'base_url': 'https://www.interfax.ru/world/news/',
-        'page_pattern': None,  
-        'domain': 'https://www.interfax.ru'
+        'pagination': 'date',
+        'date_pattern': '%Y/%m/%d/',
+        'domain': 'https://www.interfax.ru',
+        'utc_offset_hours': 3,
+        'cache_ttl': 300,
+        'poll_interval': 300,
+        'list_container': 'an'
     }
 }
 
+# Даты публикации: смещение от UTC, если у сайта нет 'utc_offset_hours' (в России нет
+# перехода на летнее время, поэтому хватает постоянного смещения), и размер кэша разбора
+DEFAULT_UTC_OFFSET_HOURS = 3
+DATE_CACHE_SIZE = 4096
+
 # Селекторы для извлечения контента статей
 ARTICLE_SELECTORS = {
     'habr': ['.tm-article-presenter__content', '.article-formatted-body', 'article'],
@@ -64,9 +99,129 @@ META_KEYWORDS = [
 HTTP_REQUEST_TIMEOUT = 30
 DB_CONNECTION_TIMEOUT = 30
 
+# Пул HTTP-соединений (одна keep-alive сессия на домен)
+HTTP_POOL_CONNECTIONS = 4   # сколько хостов держит пул одной сессии
+HTTP_POOL_MAXSIZE = 8       # соединений на хост, не меньше --concurrency
+HTTP_POOL_BLOCK = False     # ждать свободное соединение вместо открытия лишнего
+HTTP_KEEP_ALIVE = True
+
+# Потоковая загрузка: размер куска, лимит размера страницы (для сайта - 'max_page_bytes'
+# в SITES_CONFIG) и сколько байт начала документа смотреть в поисках <meta charset>
+STREAM_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_PAGE_BYTES = 5 * 1024 * 1024
+ENCODING_SNIFF_BYTES = 4096
+
+# Метрики: границы корзин гистограмм задержек (секунды) и файл JSON-сводки запуска ('' - не писать)
+METRICS_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_METRICS_JSON = ''
+
+# Профилирование этапов (--profile): каталог для .pstats и свёрнутых стеков,
+# режим по умолчанию (cprofile / sampling / both) и период выборки стеков
+PROFILE_DIR = 'profile'
+PROFILE_MODE = 'both'
+PROFILE_SAMPLE_INTERVAL_SEC = 0.005
+
+# Бенчмарки (bench/): вызовов на замер (BENCH_ITERATIONS * BENCH_REPEATS), файл базовых
+# результатов и допустимое падение производительности относительно базы в процентах
+BENCH_ITERATIONS = 20
+BENCH_REPEATS = 5
+BENCH_BASELINE_PATH = 'bench/baseline.json'
+BENCH_REGRESSION_THRESHOLD_PCT = 20.0
+# сколько раз перемерять замеры, упавшие ниже порога, прежде чем считать это регрессией
+BENCH_RECHECKS = 2
+
+# Предобработка текстов (textprep): статей в пачке, процессов лемматизации (0 - в текущем
+# процессе), токенов в задании процесса и минимальная длина токена
+TEXTPREP_BATCH_SIZE = 500
+TEXTPREP_WORKERS = 0
+TEXTPREP_CHUNK_TOKENS = 2000
+TEXTPREP_MIN_TOKEN_LENGTH = 3
+
+# Векторы статей (embeddings): каталог хранилища и статей в пачке расчёта
+EMBEDDINGS_DIR = 'embeddings'
+EMBEDDINGS_BATCH_SIZE = 2000
+
+# Похожие статьи (neighbors): режимы поиска, сколько показывать, строк матрицы в блоке точного перебора,
+# с какого числа статей включается приближённый индекс IVF и сколько его списков просматривать;
+# выборка и итерации k-means для центроидов, во сколько раз должен вырасти корпус до их переобучения
+SIMILAR_MODES = ('auto', 'exact', 'ivf')
+DEFAULT_SIMILAR_K = 10
+NEIGHBORS_BLOCK_ROWS = 65536
+NEIGHBORS_IVF_MIN_ROWS = 50000
+NEIGHBORS_IVF_PROBES = 8
+NEIGHBORS_KMEANS_SAMPLE = 50000
+NEIGHBORS_KMEANS_ITERATIONS = 10
+NEIGHBORS_IVF_RETRAIN_FACTOR = 4.0
+
+# Темы статей (topics): число тем, статей в мини-пакете k-means и пакетов при полном обучении;
+# на сколько (доля) среднее расстояние новых статей до центроидов может вырасти относительно
+# обучения, прежде чем темы обучатся заново, и вес нового пакета в скользящем среднем;
+# период фонового обновления тем в режиме демона (--topics-model)
+TOPICS_CLUSTERS = 8
+TOPICS_BATCH_SIZE = 1024
+TOPICS_FIT_ITERATIONS = 100
+TOPICS_DRIFT_THRESHOLD = 0.15
+TOPICS_DRIFT_SMOOTHING = 0.3
+TOPICS_REFRESH_INTERVAL_SEC = 600
+
+# Выгрузка в Parquet (export): каталог, статей в куске чтения из БД и в группе строк файла,
+# сжатие ('zstd', 'snappy', 'gzip' или None)
+EXPORT_DIR = 'export'
+EXPORT_BATCH_ROWS = 5000
+EXPORT_COMPRESSION = 'zstd'
+
+# Дисковый кэш HTTP-ответов (ETag / Last-Modified)
+HTTP_CACHE_DIR = '.http_cache'
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Сколько секунд ответ считается свежим без запроса к серверу
+# (для сайта переопределяется ключом 'cache_ttl' в SITES_CONFIG)
+DEFAULT_CACHE_TTL = 300
+
+# Архив сырых страниц для оффлайн-воспроизведения
+ARCHIVE_COMPRESSION = 'zstd'    # 'zstd' (если установлен zstandard) или 'gzip'
+ARCHIVE_SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+
+# Настройки SQLite
+DB_JOURNAL_MODE = 'WAL'
+DB_SYNCHRONOUS = 'NORMAL'       # в режиме WAL безопасно и без fsync на каждый commit
+DB_CACHE_SIZE_KB = 64 * 1024    # кэш страниц SQLite, КБ
+# Пакетная запись: сброс каждые N статей или T секунд
+DB_BATCH_SIZE = 100
+DB_FLUSH_INTERVAL_SEC = 5.0
+
+# Индекс уже сохранённых URL в памяти: 'hashset' (64-битные хэши) или 'bloom'
+SEEN_INDEX_KIND = 'hashset'
+SEEN_INDEX_CAPACITY = 1_000_000     # ожидаемое число URL (для фильтра Блума)
+SEEN_INDEX_FP_RATE = 0.001          # допустимая доля ложных срабатываний фильтра Блума
+
+# Параметры URL, которые не входят в идентичность статьи (кроме всех utm_*)
+URL_TRACKING_PARAMS = frozenset(['fbclid', 'gclid', 'yclid', 'ysclid', 'from', 'ref', '_openstat'])
+
+# Полнотекстовый поиск: веса колонок в BM25 и размер выдачи
+FTS_TITLE_WEIGHT = 10.0
+FTS_DESCRIPTION_WEIGHT = 1.0
+DEFAULT_SEARCH_LIMIT = 10
+
+# Почти одинаковые статьи (MinHash + LSH): 'flag' - сохранять с пометкой duplicate_of,
+# 'drop_text' - сохранять без текста (только метаданные и ссылку на оригинал), 'off' - не проверять
+NEAR_DUP_ACTION = 'flag'
+NEAR_DUP_SHINGLE_SIZE = 3           # шинглы из 3 слов
+NEAR_DUP_NUM_HASHES = 64            # длина подписи MinHash (степень двойки)
+NEAR_DUP_BANDS = 16                 # полосы LSH по 4 значения: кандидаты с высокой вероятностью от сходства ~0.5
+NEAR_DUP_THRESHOLD = 0.6            # оценка коэффициента Жаккара, с которой статья считается дубликатом
+NEAR_DUP_MAX_CANDIDATES = 50        # сколько кандидатов с наибольшим числом совпавших полос проверять на статью
+
 # Настройки парсинга по умолчанию
 DEFAULT_PAGES = 1
 DEFAULT_ARTICLES_PER_PAGE = 10
+# Число одновременных загрузок статей на сайт (1 - последовательный режим)
+DEFAULT_CONCURRENCY = 1
+# Процессы для разбора статей (0 - разбор в потоке загрузки, без конвейера)
+DEFAULT_PARSE_WORKERS = 0
+# Ёмкость очереди сырого HTML между загрузкой и разбором
+PIPELINE_QUEUE_SIZE = 64
+# Режим демона: период опроса сайта без 'poll_interval' в SITES_CONFIG, секунды
+DAEMON_POLL_INTERVAL_SEC = 300
 
 # Минимальные длины текста
 MIN_DESCRIPTION_LENGTH = 20
@@ -76,6 +231,22 @@ MIN_NORMALIZED_LINE_LENGTH = 20
 
 # Настройки парсера
 DEFAULT_RATE_LIMIT_PER_SEC = 1.0
+DEFAULT_RATE_BURST = 3              # сколько запросов подряд можно сделать без ожидания
+MIN_RATE_LIMIT_PER_SEC = 0.05       # ниже этой скорости адаптивный лимитер не опускается
+RATE_DECREASE_FACTOR = 0.5          # во сколько раз снижать скорость при 429/5xx/росте задержки
+RATE_INCREASE_STEP = 0.05           # прибавка (доля базовой скорости) после успешного запроса
+LATENCY_SLOWDOWN_FACTOR = 3.0       # задержка выше базовой во столько раз - сигнал притормозить
+LATENCY_EWMA_ALPHA = 0.2
+
+# Повторы неудачных запросов (5xx, 429, таймауты, обрывы соединения)
+RETRY_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY_SEC = 1.0
+RETRY_MAX_DELAY_SEC = 60.0
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+RETRY_BUDGET_RATIO = 0.1            # повторов не больше 10% от числа запросов к хосту
+RETRY_BUDGET_MIN = 5                # плюс столько повторов в запас
+# Бэкенд извлечения: 'bs4' (BeautifulSoup) или 'lxml' (быстрее, нужен cssselect)
+PARSER_BACKEND = 'bs4'
 DEFAULT_USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -95,11 +266,82 @@ CREATE TABLE IF NOT EXISTS articles (
     published_at TEXT,
     comments_count INTEGER,
     created_at_utc INTEGER,
-    rating INTEGER
+    rating INTEGER,
+    content_hash TEXT,
+    minhash BLOB,
+    duplicate_of INTEGER
 );
 CREATE INDEX IF NOT EXISTS idx_guid ON articles(guid);
 CREATE INDEX IF NOT EXISTS idx_published ON articles(published_at);
 -- unique index on url to avoid duplicates; will be created only if possible
+
+-- индекс LSH почти одинаковых статей: хэши полос подписи MinHash
+CREATE TABLE IF NOT EXISTS article_lsh (
+    band_key INTEGER NOT NULL,
+    article_id INTEGER NOT NULL,
+    PRIMARY KEY (band_key, article_id)
+) WITHOUT ROWID;
+
+-- состояние инкрементального обхода по сайтам
+CREATE TABLE IF NOT EXISTS crawl_state (
+    site TEXT PRIMARY KEY,
+    last_run_at INTEGER,
+    newest_published_at TEXT,
+    cursor TEXT
+);
+
+-- предобработка текстов (textprep.py): леммы статьи через пробел и кэш токен -> лемма
+CREATE TABLE IF NOT EXISTS article_tokens (
+    article_id INTEGER PRIMARY KEY,
+    tokens TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lemma_cache (
+    token TEXT PRIMARY KEY,
+    lemma TEXT NOT NULL
+) WITHOUT ROWID;
+
+-- темы статей (topics.py): номер темы и косинусное расстояние до её центроида;
+-- модель тем - одна строка: центроиды (float32) и веса кластеров (int64) в BLOB
+CREATE TABLE IF NOT EXISTS article_topics (
+    article_id INTEGER PRIMARY KEY,
+    topic INTEGER NOT NULL,
+    distance REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_article_topics_topic ON article_topics(topic);
+CREATE TABLE IF NOT EXISTS topic_model (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    model_version TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    centroids BLOB NOT NULL,
+    weights BLOB NOT NULL,
+    baseline_distance REAL NOT NULL,
+    recent_distance REAL NOT NULL,
+    fitted_at INTEGER NOT NULL,
+    refreshed_at INTEGER NOT NULL
+);
+"""
+
+# Полнотекстовый индекс FTS5 по заголовку и тексту статьи (external content:
+# текст хранится только в articles, индекс обновляется триггерами)
+FTS_TOKENIZE = 'unicode61 remove_diacritics 2'
+DB_FTS_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, description,
+    content='articles', content_rowid='id',
+    tokenize='{FTS_TOKENIZE}'
+);
+CREATE TRIGGER IF NOT EXISTS articles_fts_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_fts_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_fts_au AFTER UPDATE OF title, description ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+    INSERT INTO articles_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+END;
 """
 
 # Медиа элементы для удаления
@@ -0,0 +1,140 @@
+"""
+Режим демона (--daemon): один долгоживущий процесс с циклом событий asyncio опрашивает
+каждый сайт со своим периодом ('poll_interval' в SITES_CONFIG).
+Между обходами остаются открытыми HTTP-сессии, индекс URL в памяти, парсеры и соединения с БД.
+Обход сайта блокирующий (requests, sqlite3), поэтому выполняется в отдельном потоке сайта -
+в нём же живёт соединение сайта с БД (sqlite3-соединение привязано к потоку).
+Фоновые задачи (tasks) выполняются так же - в своём потоке со своим соединением и периодом.
+SIGTERM / SIGINT: новые обходы не начинаются, текущие прерываются после очередной статьи,
+буферы записи сбрасываются в БД, соединения закрываются.
+"""
+import asyncio
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from db import init_db
+import metrics
+from config import SITES_CONFIG, DAEMON_POLL_INTERVAL_SEC
+
+# обход одного сайта: (сайт, соединение с БД или None, событие остановки) -> сохранено статей
+CycleFunc = Callable[[str, object, threading.Event], int]
+# фоновая задача: имя -> (функция того же вида, период в секундах)
+Tasks = Dict[str, Tuple[CycleFunc, float]]
+
+_SITE_REPORT = 'обход завершён, сохранено статей: {}'
+_TASK_REPORT = 'выполнено, обработано статей: {}'
+
+
+def poll_interval(site_name: str) -> float:
+    return float(SITES_CONFIG.get(site_name, {}).get('poll_interval', DAEMON_POLL_INTERVAL_SEC))
+
+
+class SiteWorker:
+    """Поток сайта и его соединение с БД, открытое при первом обходе"""
+
+    def __init__(self, site_name: str, db_path: Optional[str]):
+        self.site_name = site_name
+        self.db_path = db_path
+        self.conn = None
+        self.saved_count = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'daemon-{site_name}')
+
+    def run_cycle(self, cycle: CycleFunc, stop_event: threading.Event) -> int:
+        if self.conn is None and self.db_path:
+            self.conn = init_db(self.db_path)
+        saved = cycle(self.site_name, self.conn, stop_event)
+        self.saved_count += saved
+        return saved
+
+    def close_connection(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+async def _poll_site(worker: SiteWorker, cycle: CycleFunc, interval: float,
+                     stop: asyncio.Event, stop_event: threading.Event, metrics_json: Optional[str],
+                     report: str = _SITE_REPORT):
+    loop = asyncio.get_running_loop()
+    next_run = loop.time()
+    while not stop.is_set():
+        try:
+            saved = await loop.run_in_executor(worker.executor, worker.run_cycle, cycle, stop_event)
+            metrics.DAEMON_CYCLES.inc(worker.site_name, 'ok')
+            print(f"[{worker.site_name}] {report.format(saved)}")
+        except Exception as e:
+            # ошибка одного обхода не останавливает демон - следующий обход по расписанию
+            metrics.DAEMON_CYCLES.inc(worker.site_name, 'error')
+            print(f"[{worker.site_name}] ошибка обхода: {e!r}")
+        if metrics_json:
+            metrics.write_summary(metrics_json)
+
+        # расписание от начала обходов; пропущенные из-за долгого обхода запуски не догоняются
+        next_run += interval
+        now = loop.time()
+        if next_run < now:
+            next_run = now
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=next_run - now)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _install_signal_handlers(loop: asyncio.AbstractEventLoop, request_stop: Callable[[], None]):
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, request_stop)
+        except (NotImplementedError, RuntimeError):
+            # Windows: обработчик сигнала передаёт остановку в цикл событий
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(request_stop))
+
+
+async def _run(sites: List[str], cycle: CycleFunc, db_path: Optional[str], metrics_json: Optional[str],
+               tasks: Tasks) -> int:
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    stop_event = threading.Event()
+
+    def request_stop():
+        if not stop.is_set():
+            print("\nПолучен сигнал остановки: дожидаемся текущих обходов и сбрасываем буферы записи")
+            stop.set()
+            stop_event.set()
+
+    _install_signal_handlers(loop, request_stop)
+    workers = [SiteWorker(site_name, db_path) for site_name in sites]
+    task_workers = {name: SiteWorker(name, db_path) for name in tasks}
+    for worker in workers:
+        print(f"Демон: {worker.site_name} каждые {poll_interval(worker.site_name):g} с")
+    for name, (_, interval) in tasks.items():
+        print(f"Демон: фоновая задача {name} каждые {interval:g} с")
+    try:
+        await asyncio.gather(
+            *(_poll_site(worker, cycle, poll_interval(worker.site_name), stop, stop_event, metrics_json)
+              for worker in workers),
+            *(_poll_site(task_workers[name], task, interval, stop, stop_event, metrics_json, _TASK_REPORT)
+              for name, (task, interval) in tasks.items())
+        )
+    finally:
+        # соединение закрывается в том же потоке, где было открыто
+        all_workers = workers + list(task_workers.values())
+        await asyncio.gather(*(
+            loop.run_in_executor(worker.executor, worker.close_connection) for worker in all_workers
+        ))
+        for worker in all_workers:
+            worker.executor.shutdown(wait=True)
+    return sum(worker.saved_count for worker in workers)
+
+
+def run_daemon(sites: List[str], cycle: CycleFunc, db_path: Optional[str] = None,
+               metrics_json: Optional[str] = None, tasks: Optional[Tasks] = None) -> int:
+    """
+    Опрашивает сайты до SIGTERM / SIGINT; cycle выполняет один обход сайта и должен
+    сам сбрасывать буфер записи при установленном событии остановки.
+    metrics_json - сводка метрик перезаписывается после каждого обхода.
+    tasks - фоновые задачи со своими периодами; в счёт сохранённых статей не входят.
+    Возвращает число статей, сохранённых за всё время работы.
+    """
+    return asyncio.run(_run(sites, cycle, db_path, metrics_json, tasks or {}))
@@ -0,0 +1,213 @@
+"""
+Разбор дат публикации в ISO-8601 UTC.
+Форматы - заранее скомпилированные регулярные выражения: ISO, ДД.ММ.ГГГГ, "1 ноября 2025, 10:00",
+"сегодня/вчера, 10:30", "5 минут назад", время без даты (с датой со страницы).
+Для каждого сайта запоминается формат, подошедший последним, - он проверяется первым.
+Результаты кэшируются (LRU) по исходной строке, сайту и текущей дате сайта:
+"сегодня" и "вчера" не устаревают при смене суток; "N минут назад" не кэшируется.
+Сайт может задать свои форматы strptime ('date_formats' в описании) - они проверяются раньше общих.
+dateutil (fuzzy) - только если не подошёл ни один формат; он и импортируется только тогда.
+Даты без часового пояса считаются местным временем сайта ('utc_offset_hours' в SITES_CONFIG).
+"""
+import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sites import site_for_url
+from config import SITES_CONFIG, DEFAULT_UTC_OFFSET_HOURS, DATE_CACHE_SIZE
+
+# месяцы: именительный и родительный падеж, сокращения; сравнение по первым трём буквам
+RU_MONTHS = {
+    'янв': 1, 'фев': 2, 'мар': 3, 'апр': 4, 'мая': 5, 'май': 5, 'июн': 6,
+    'июл': 7, 'авг': 8, 'сен': 9, 'окт': 10, 'ноя': 11, 'дек': 12,
+}
+EN_MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+_TIME = r'(?:[,\s]+(?:в\s+)?(\d{1,2}):(\d{2})(?::(\d{2}))?)?'
+
+_ISO_RE = re.compile(r'^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?:Z|[+-]\d{2}:?\d{2})?$', re.I)
+_ISO_OFFSET_RE = re.compile(r'([+-]\d{2})(\d{2})$')
+_ISO_FRACTION_RE = re.compile(r'\.(\d+)')
+_NUMERIC_RE = re.compile(r'^(\d{1,2})[./](\d{1,2})[./](\d{2}|\d{4})' + _TIME + r'$')
+_MONTH_NAME_RE = re.compile(r'^(\d{1,2})\s+([a-zа-яё]+)\.?(?:\s+(\d{4}))?(?:\s*г\.?)?' + _TIME + r'$', re.I)
+_RELATIVE_DAY_RE = re.compile(r'^(сегодня|вчера|позавчера)' + _TIME + r'$', re.I)
+_AGO_RE = re.compile(r'^(\d+)\s+(секунд\w*|минут\w*|час\w*|дн\w*|день)\s+назад$', re.I)
+_TIME_ONLY_RE = re.compile(r'^(\d{1,2}):(\d{2})(?::(\d{2}))?$')
+
+_RELATIVE_DAYS = {'сегодня': 0, 'вчера': 1, 'позавчера': 2}
+
+Parsed = Optional[datetime]
+
+
+@lru_cache(maxsize=None)
+def site_tz(site: Optional[str]) -> timezone:
+    hours = SITES_CONFIG.get(site or '', {}).get('utc_offset_hours', DEFAULT_UTC_OFFSET_HOURS)
+    return timezone(timedelta(hours=hours))
+
+
+def _time_parts(hour, minute, second) -> Tuple[int, int, int]:
+    return int(hour or 0), int(minute or 0), int(second or 0)
+
+
+def _iso(text: str, today: date) -> Parsed:
+    if not _ISO_RE.match(text):
+        return None
+    # fromisoformat до 3.11 не понимает Z, смещение без двоеточия и дробную часть не из 3 или 6 цифр
+    text = _ISO_OFFSET_RE.sub(r'\1:\2', text.upper().replace('Z', '+00:00'))
+    return datetime.fromisoformat(_ISO_FRACTION_RE.sub(lambda m: '.' + m.group(1)[:6].ljust(6, '0'), text))
+
+
+def _numeric(text: str, today: date) -> Parsed:
+    match = _NUMERIC_RE.match(text)
+    if not match:
+        return None
+    day, month, year, hour, minute, second = match.groups()
+    year = int(year) + (2000 if len(year) == 2 else 0)
+    return datetime(year, int(month), int(day), *_time_parts(hour, minute, second))
+
+
+def _month_name(text: str, today: date) -> Parsed:
+    match = _MONTH_NAME_RE.match(text)
+    if not match:
+        return None
+    day, month_name, year, hour, minute, second = match.groups()
+    key = month_name.lower()[:3]
+    month = RU_MONTHS.get(key) or EN_MONTHS.get(key)
+    if month is None:
+        return None
+    if year is None:
+        # без года - ближайшая прошедшая дата
+        year = today.year if (month, int(day)) <= (today.month, today.day) else today.year - 1
+    return datetime(int(year), month, int(day), *_time_parts(hour, minute, second))
+
+
+def _relative_day(text: str, today: date) -> Parsed:
+    match = _RELATIVE_DAY_RE.match(text)
+    if not match:
+        return None
+    word, hour, minute, second = match.groups()
+    day = today - timedelta(days=_RELATIVE_DAYS[word.lower()])
+    return datetime(day.year, day.month, day.day, *_time_parts(hour, minute, second))
+
+
+def _ago(match) -> datetime:
+    amount, unit = int(match.group(1)), match.group(2).lower()
+    if unit.startswith('сек'):
+        delta = timedelta(seconds=amount)
+    elif unit.startswith('мин'):
+        delta = timedelta(minutes=amount)
+    elif unit.startswith('час'):
+        delta = timedelta(hours=amount)
+    else:
+        delta = timedelta(days=amount)
+    return (datetime.now(timezone.utc) - delta).replace(microsecond=0)
+
+
+# порядок по умолчанию; для сайта первым идёт формат, подошедший последним
+_FORMATS: List[Callable[[str, date], Parsed]] = [_iso, _numeric, _month_name, _relative_day]
+_last_format: Dict[Optional[str], int] = {}
+
+
+def _normalize_space(text: str) -> str:
+    return ' '.join(text.replace('\xa0', ' ').split())
+
+
+def _to_utc(value: datetime, site: Optional[str]) -> datetime:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=site_tz(site))
+    return value.astimezone(timezone.utc)
+
+
+def _site_formats(text: str, site: Optional[str]) -> Parsed:
+    for fmt in SITES_CONFIG.get(site or '', {}).get('date_formats', ()):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_cached(text: str, site: Optional[str], today: date) -> Optional[datetime]:
+    value = _site_formats(text, site)
+    if value is not None:
+        return _to_utc(value, site)
+    first = _last_format.get(site, 0)
+    order = [first] + [i for i in range(len(_FORMATS)) if i != first]
+    for index in order:
+        try:
+            value = _FORMATS[index](text, today)
+        except ValueError:
+            # формат узнан, но дата невозможная (31.02) - дальше не ищем
+            return None
+        if value is not None:
+            _last_format[site] = index
+            return _to_utc(value, site)
+    from dateutil import parser as dtparser
+    try:
+        value = dtparser.parse(text, dayfirst=True, fuzzy=True)
+    except (ValueError, OverflowError):
+        return None
+    return _to_utc(value, site)
+
+
+def parse_date(text: Optional[str], site: Optional[str] = None, base_date: Optional[str] = None) -> Optional[datetime]:
+    """
+    Дата публикации в UTC или None. base_date (ГГГГ-ММ-ДД) - дата для строки,
+    содержащей только время (так даты отдаёт interfax).
+    """
+    if not text:
+        return None
+    text = _normalize_space(text)
+    if base_date and _TIME_ONLY_RE.match(text):
+        text = f"{base_date} {text}"
+    ago = _AGO_RE.match(text)
+    if ago:
+        return _ago(ago)
+    today = datetime.now(site_tz(site)).date()
+    return _parse_cached(text, site, today)
+
+
+def to_iso_utc(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def published_iso(text: Optional[str], site: Optional[str] = None, base_date: Optional[str] = None) -> Optional[str]:
+    """Дата публикации строкой ISO-8601 UTC ("2025-11-01T07:30:00+00:00") или None"""
+    return to_iso_utc(parse_date(text, site, base_date))
+
+
+def local_date_iso(year: int, month: int, day: int, site: Optional[str] = None) -> str:
+    """Полночь по времени сайта в ISO-8601 UTC (для дат без времени, например из URL)"""
+    return to_iso_utc(_to_utc(datetime(year, month, day), site))
+
+
+def normalize_published_dates(conn, batch_size: int = 1000) -> Tuple[int, int]:
+    """
+    Приводит published_at уже сохранённых статей к ISO-8601 UTC (сайт - по url).
+    Неразборчивые значения не трогает. Возвращает (проверено, изменено).
+    """
+    checked = changed = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, url, published_at FROM articles WHERE id > ? AND published_at IS NOT NULL "
+            "ORDER BY id LIMIT ?", (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, url, published_at in rows:
+            normalized = published_iso(str(published_at), site_for_url(url))
+            if normalized is not None and normalized != published_at:
+                updates.append((normalized, row_id))
+        with conn:
+            conn.executemany("UPDATE articles SET published_at = ? WHERE id = ?", updates)
+        checked += len(rows)
+        changed += len(updates)
+        last_id = rows[-1][0]
+    return checked, changed
@@ -1,51 +1,462 @@
 import sqlite3
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 import time
 import os
-from config import DB_SCHEMA_SQL, DB_CONNECTION_TIMEOUT, DEFAULT_DB_PATH
+from config import (
+    DB_SCHEMA_SQL, DB_FTS_SQL, DB_CONNECTION_TIMEOUT, DEFAULT_DB_PATH,
+    DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_CACHE_SIZE_KB,
+    DB_BATCH_SIZE, DB_FLUSH_INTERVAL_SEC, NEAR_DUP_ACTION
+)
+from near_dup import article_minhash, band_keys, find_near_duplicate, find_batch_duplicates, index_signature
+from identity import content_hash
+import metrics
+import profiling
 
-def init_db(db_path: str = None):
+# SQLite по умолчанию разрешает не больше 999 параметров в запросе
+SQL_MAX_VARIABLES = 900
+
+_ARTICLE_VALUES_SQL = """articles
+    (guid, title, description, url, published_at, comments_count, created_at_utc, rating,
+     content_hash, minhash, duplicate_of)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_ARTICLE_SQL = "INSERT INTO " + _ARTICLE_VALUES_SQL
+INSERT_OR_IGNORE_ARTICLE_SQL = "INSERT OR IGNORE INTO " + _ARTICLE_VALUES_SQL
+
+# Метрики меняются только если пришло новое непустое значение, иначе строка не перезаписывается
+_METRICS_CHANGED_SQL = """
+    (excluded.comments_count IS NOT NULL AND excluded.comments_count IS NOT articles.comments_count)
+    OR (excluded.rating IS NOT NULL AND excluded.rating IS NOT articles.rating)
+"""
+# повторно загруженная статья обновляет только комментарии и рейтинг;
+# второй ON CONFLICT (та же статья под другим вариантом URL - совпал guid) - пропуск
+UPSERT_ARTICLE_SQL = INSERT_ARTICLE_SQL + f"""
+ON CONFLICT(url) DO UPDATE SET
+    comments_count = COALESCE(excluded.comments_count, articles.comments_count),
+    rating = COALESCE(excluded.rating, articles.rating)
+WHERE {_METRICS_CHANGED_SQL}
+ON CONFLICT DO NOTHING
+"""
+# несколько ON CONFLICT в одном INSERT - с SQLite 3.35
+UPSERT_SUPPORTED = sqlite3.sqlite_version_info >= (3, 35, 0)
+WRITE_ARTICLE_SQL = UPSERT_ARTICLE_SQL if UPSERT_SUPPORTED else INSERT_OR_IGNORE_ARTICLE_SQL
+
+UPDATE_METRICS_SQL = """
+UPDATE articles SET
+    comments_count = COALESCE(:comments_count, comments_count),
+    rating = COALESCE(:rating, rating)
+WHERE url = :url AND (
+    (:comments_count IS NOT NULL AND :comments_count IS NOT comments_count)
+    OR (:rating IS NOT NULL AND :rating IS NOT rating)
+)
+"""
+
+# колонки, добавленные после первой версии схемы: в старых БД создаются через ALTER TABLE
+ARTICLE_MIGRATION_COLUMNS = {
+    'content_hash': 'TEXT',
+    'minhash': 'BLOB',
+    'duplicate_of': 'INTEGER',
+}
+
+def init_db(db_path: str = None, require_url_unique: bool = True):
+    """
+    Открывает БД и доводит схему до текущей.
+    require_url_unique=False - не создавать уникальный индекс по url (для dedup-urls).
+    """
     if db_path is None:
         db_path = DEFAULT_DB_PATH
     first_time = not os.path.exists(db_path)
     conn = sqlite3.connect(db_path, timeout=DB_CONNECTION_TIMEOUT)
     cur = conn.cursor()
+    # WAL: читатели не блокируют писателя, fsync только на checkpoint
+    cur.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE};")
+    cur.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS};")
+    cur.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)};")
     cur.executescript(DB_SCHEMA_SQL)
     conn.commit()
+    migrate_articles(conn)
+    if require_url_unique:
+        try:
+            ensure_url_unique(conn)
+        except RuntimeError:
+            conn.close()
+            raise
+    init_fts(conn)
+    return conn
+
+def ensure_url_unique(conn):
+    """
+    Уникальный индекс по url (на нём держится ON CONFLICT(url)).
+    Если в старой БД есть повторы url, индекс не создаётся и записи не трогаются:
+    их удаляет только явный запуск dedup-urls.
+    """
+    try:
+        with conn:
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_url_unique ON articles(url);")
+    except sqlite3.IntegrityError:
+        extra = duplicate_url_report(conn)['articles']
+        raise RuntimeError(
+            f"В БД {extra} лишних записей с повторами url, уникальный индекс по url не создан. "
+            "Посмотреть, что будет удалено: python main.py dedup-urls; удалить: python main.py dedup-urls --apply"
+        ) from None
+
+# таблицы со строками по article_id, которые удаляются вместе с повторами url
+# (articles_fts чистит триггер на DELETE)
+URL_DEPENDENT_TABLES = ('article_lsh', 'article_tokens', 'article_topics')
+
+_URL_EXTRA_SQL = """
+CREATE TEMP TABLE url_extra AS
+SELECT a.id, k.keep_id FROM articles a
+JOIN (SELECT url, MIN(id) AS keep_id FROM articles WHERE url IS NOT NULL
+      GROUP BY url HAVING COUNT(*) > 1) k ON a.url = k.url
+WHERE a.id <> k.keep_id
+"""
+
+def _url_extra_counts(conn) -> Dict[str, int]:
+    counts = {
+        'articles': conn.execute("SELECT COUNT(*) FROM url_extra").fetchone()[0],
+        'urls': conn.execute("SELECT COUNT(DISTINCT keep_id) FROM url_extra").fetchone()[0],
+        'duplicate_of': conn.execute(
+            "SELECT COUNT(*) FROM articles WHERE duplicate_of IN (SELECT id FROM url_extra)"
+        ).fetchone()[0],
+    }
+    for table in URL_DEPENDENT_TABLES:
+        counts[table] = conn.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE article_id IN (SELECT id FROM url_extra)"
+        ).fetchone()[0]
+    return counts
+
+def duplicate_url_report(conn) -> Dict[str, int]:
+    """
+    Что удалит remove_duplicate_urls: лишние записи (articles) с повторами url (urls - сколько url),
+    строки зависимых таблиц и ссылки duplicate_of на удаляемые записи. Остаётся самая ранняя запись.
+    """
+    conn.execute(_URL_EXTRA_SQL)
+    try:
+        return _url_extra_counts(conn)
+    finally:
+        conn.execute("DROP TABLE url_extra")
+
+def remove_duplicate_urls(conn) -> Dict[str, int]:
+    """
+    Удаляет повторы url одной транзакцией вместе со строками зависимых таблиц,
+    переносит ссылки duplicate_of на оставшуюся запись и создаёт уникальный индекс по url.
+    """
+    conn.execute(_URL_EXTRA_SQL)
+    try:
+        with conn:
+            counts = _url_extra_counts(conn)
+            # ссылки на удаляемые копии ведут на оставшуюся запись того же url
+            conn.execute("""
+            UPDATE articles SET duplicate_of = (SELECT keep_id FROM url_extra WHERE id = articles.duplicate_of)
+            WHERE duplicate_of IN (SELECT id FROM url_extra)
+            """)
+            conn.execute("UPDATE articles SET duplicate_of = NULL WHERE duplicate_of = id")
+            for table in URL_DEPENDENT_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE article_id IN (SELECT id FROM url_extra)")
+            conn.execute("DELETE FROM articles WHERE id IN (SELECT id FROM url_extra)")
+            # оставшаяся запись могла быть копией удалённой и теперь сама оригинал - её полосы в индекс LSH
+            for article_id, signature in conn.execute("""
+            SELECT id, minhash FROM articles
+            WHERE id IN (SELECT keep_id FROM url_extra) AND duplicate_of IS NULL AND minhash IS NOT NULL
+            """).fetchall():
+                index_signature(conn, article_id, signature)
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_url_unique ON articles(url);")
+    finally:
+        conn.execute("DROP TABLE url_extra")
+    return counts
+
+def migrate_articles(conn):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(articles)")}
+    with conn:
+        for column, column_type in ARTICLE_MIGRATION_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE articles ADD COLUMN {column} {column_type}")
+
+def fts_exists(conn) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'"
+    ).fetchone() is not None
+
+def init_fts(conn) -> bool:
+    """Создаёт индекс FTS5 и триггеры; False, если SQLite собран без FTS5"""
+    created = not fts_exists(conn)
     try:
-        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_url_unique ON articles(url);")
+        conn.executescript(DB_FTS_SQL)
         conn.commit()
-    except Exception:
+    except sqlite3.OperationalError as e:
         conn.rollback()
-    return conn
+        print(f"Полнотекстовый индекс недоступен: {e}")
+        return False
+    if created and conn.execute("SELECT 1 FROM articles LIMIT 1").fetchone():
+        # триггеры видят только новые статьи, старые нужно проиндексировать отдельно
+        print("Создан полнотекстовый индекс, уже сохранённые статьи в него не попали: "
+              "выполните python main.py fts-rebuild")
+    return True
+
+def _article_params(record: Dict, now_ts: int, signature: Optional[bytes] = None,
+                    duplicate_of: Optional[int] = None) -> tuple:
+    return (
+        record['guid'],
+        record.get('title'),
+        record.get('description'),
+        record.get('url'),
+        record.get('published_at'),
+        record.get('comments_count'),
+        now_ts,
+        record.get('rating'),
+        record.get('content_hash') or content_hash(record.get('title'), record.get('description')),
+        signature,
+        duplicate_of
+    )
+
+def _dedup_params(conn, record: Dict, now_ts: int, action: str = NEAR_DUP_ACTION) -> tuple:
+    """Параметры INSERT с подписью MinHash и ссылкой на оригинал, если статья - почти дубликат"""
+    if action == 'off':
+        return _article_params(record, now_ts)
+    signature = article_minhash(record)
+    found = find_near_duplicate(conn, signature)
+    if found is None:
+        return _article_params(record, now_ts, signature)
+    if action == 'drop_text':
+        # текст уже есть у оригинала - второй раз его не храним
+        record = dict(record, description=None)
+    return _article_params(record, now_ts, signature, duplicate_of=found[0])
+
+def _insert_article_row(conn, sql: str, params: tuple):
+    """INSERT статьи и её полос LSH; возвращает курсор INSERT"""
+    cur = conn.execute(sql, params)
+    # в индекс попадают только оригиналы: копии сравнивать не нужно, они ссылаются на оригинал
+    if cur.rowcount and params[-1] is None:
+        index_signature(conn, cur.lastrowid, params[-2])
+    return cur
 
 def insert_article(conn, record: Dict):
-    cur = conn.cursor()
+    """
+    Сохраняет статью и возвращает id новой строки.
+    Для уже сохранённого url обновляет изменившиеся метрики и возвращает None.
+    """
     now_ts = int(time.time())
     try:
-        cur.execute("""
-        INSERT INTO articles
-            (guid, title, description, url, published_at, comments_count, created_at_utc, rating)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            record['guid'],
-            record.get('title'),
-            record.get('description'),
-            record.get('url'),
-            record.get('published_at'),
-            record.get('comments_count'),
-            now_ts,
-            record.get('rating')
-        ))
+        if exists_url(conn, record.get('url')):
+            _refresh_metrics(conn, [record], now_ts)
+            conn.commit()
+            return None
+        cur = _insert_article_row(conn, WRITE_ARTICLE_SQL, _dedup_params(conn, record, now_ts))
         conn.commit()
-        return cur.lastrowid
+        return cur.lastrowid if cur.rowcount else None
     except sqlite3.IntegrityError:
         conn.rollback()
         return None
 
+def _refresh_metrics(conn, records: List[Dict], now_ts: int) -> int:
+    """Повторно загруженные статьи: пишутся только изменившиеся comments_count/rating"""
+    if UPSERT_SUPPORTED:
+        cur = conn.executemany(WRITE_ARTICLE_SQL, [_article_params(r, now_ts) for r in records])
+    else:
+        cur = conn.executemany(UPDATE_METRICS_SQL, [_metrics_params(r) for r in records])
+    return cur.rowcount
+
+def _metrics_params(record: Dict) -> Dict:
+    return {
+        'url': record.get('url'),
+        'comments_count': record.get('comments_count'),
+        'rating': record.get('rating'),
+    }
+
+def has_metrics(meta: Dict) -> bool:
+    return meta.get('comments_count') is not None or meta.get('rating') is not None
+
+def update_metrics(conn, metas: List[Dict]) -> int:
+    """
+    Дешёвое обновление уже сохранённых статей по данным страницы списка,
+    без загрузки самих статей; пишутся только изменившиеся значения
+    """
+    rows = [_metrics_params(meta) for meta in metas if meta.get('url') and has_metrics(meta)]
+    if not rows:
+        return 0
+    with conn:
+        return conn.executemany(UPDATE_METRICS_SQL, rows).rowcount
+
 def exists_url(conn, url: str) -> bool:
     if not url:
         return False
     cur = conn.cursor()
     cur.execute("SELECT 1 FROM articles WHERE url = ? LIMIT 1", (url,))
     return cur.fetchone() is not None
+
+def exists_urls(conn, urls: Iterable[str]) -> Set[str]:
+    """Возвращает подмножество urls, которые уже есть в БД (один запрос на пачку)"""
+    urls = [u for u in dict.fromkeys(urls) if u]
+    found = set()
+    cur = conn.cursor()
+    for start in range(0, len(urls), SQL_MAX_VARIABLES):
+        chunk = urls[start:start + SQL_MAX_VARIABLES]
+        placeholders = ', '.join('?' * len(chunk))
+        cur.execute(f"SELECT url FROM articles WHERE url IN ({placeholders})", chunk)
+        found.update(row[0] for row in cur.fetchall())
+    return found
+
+def get_crawl_state(conn, site: str) -> Optional[Dict]:
+    row = conn.execute(
+        "SELECT last_run_at, newest_published_at, cursor FROM crawl_state WHERE site = ?",
+        (site,)
+    ).fetchone()
+    if row is None:
+        return None
+    return {'site': site, 'last_run_at': row[0], 'newest_published_at': row[1], 'cursor': row[2]}
+
+def save_crawl_state(conn, site: str, newest_published_at: Optional[str], cursor: Optional[str]):
+    """Сохраняет состояние обхода; отметка самой свежей статьи только растёт"""
+    with conn:
+        conn.execute("""
+        INSERT INTO crawl_state (site, last_run_at, newest_published_at, cursor)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(site) DO UPDATE SET
+            last_run_at = excluded.last_run_at,
+            newest_published_at = CASE
+                WHEN crawl_state.newest_published_at IS NULL THEN excluded.newest_published_at
+                WHEN excluded.newest_published_at > crawl_state.newest_published_at THEN excluded.newest_published_at
+                ELSE crawl_state.newest_published_at
+            END,
+            cursor = excluded.cursor
+        """, (site, int(time.time()), newest_published_at, cursor))
+
+
+def _ids_by_url(conn, urls: List[str]) -> Dict[str, int]:
+    urls = [u for u in urls if u]
+    found = {}
+    for start in range(0, len(urls), SQL_MAX_VARIABLES):
+        chunk = urls[start:start + SQL_MAX_VARIABLES]
+        rows = conn.execute(f"SELECT url, id FROM articles WHERE url IN ({', '.join('?' * len(chunk))})", chunk)
+        found.update(rows)
+    return found
+
+def _write_with_dedup(conn, records: List[Dict], now_ts: int, action: str) -> Tuple[int, int]:
+    """
+    Новые статьи пачки одним executemany: оригиналы для всей пачки ищутся до записи,
+    копии статей этой же пачки получают duplicate_of после неё, когда известны id.
+    Возвращает (записано статей, из них почти дубликатов).
+    """
+    signatures = [article_minhash(record) for record in records]
+    originals = find_batch_duplicates(conn, signatures)
+    params = []
+    for record, signature, (in_db, in_batch) in zip(records, signatures, originals):
+        if action == 'drop_text' and (in_db is not None or in_batch is not None):
+            # текст уже есть у оригинала - второй раз его не храним
+            record = dict(record, description=None)
+        params.append(_article_params(record, now_ts, signature, duplicate_of=in_db))
+    inserted = max(conn.executemany(WRITE_ARTICLE_SQL, params).rowcount, 0)
+
+    ids = _ids_by_url(conn, [record.get('url') for record in records])
+    links = []
+    bands = []
+    duplicates = 0
+    for record, signature, (in_db, in_batch) in zip(records, signatures, originals):
+        row_id = ids.get(record.get('url'))
+        if row_id is None:
+            continue
+        if in_db is not None:
+            duplicates += 1
+            continue
+        original_id = ids.get(records[in_batch].get('url')) if in_batch is not None else None
+        if original_id is not None:
+            links.append((original_id, row_id))
+            duplicates += 1
+            continue
+        # оригинал (или копия, чей оригинал из пачки не записался) - в индекс LSH
+        if signature is not None:
+            bands.extend((key, row_id) for key in band_keys(signature))
+    conn.executemany("UPDATE articles SET duplicate_of = ? WHERE id = ?", links)
+    conn.executemany("INSERT OR IGNORE INTO article_lsh (band_key, article_id) VALUES (?, ?)", bands)
+    return inserted, duplicates
+
+
+class BatchWriter:
+    """
+    Буферизует записи статей и пишет их пачкой в одной транзакции:
+    каждые batch_size записей или flush_interval секунд.
+    """
+
+    def __init__(self, conn, batch_size: int = DB_BATCH_SIZE, flush_interval: float = DB_FLUSH_INTERVAL_SEC,
+                 near_dup_action: str = NEAR_DUP_ACTION, site: Optional[str] = None):
+        self.conn = conn
+        # метка сайта для метрик
+        self.site = site or 'other'
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.near_dup_action = near_dup_action
+        self.duplicate_count = 0
+        self.updated_count = 0
+        self._buffer: List[Dict] = []
+        self._pending_urls: Set[str] = set()
+        self._last_flush = time.monotonic()
+        self.saved_count = 0
+
+    def is_pending(self, url: str) -> bool:
+        """url уже в буфере и ещё не записан"""
+        return url in self._pending_urls
+
+    def add(self, record: Dict) -> int:
+        """Добавляет запись; возвращает число статей, записанных при сбросе буфера"""
+        url = record.get('url')
+        if url and url in self._pending_urls:
+            return 0
+        self._buffer.append(record)
+        if url:
+            self._pending_urls.add(url)
+        if len(self._buffer) >= self.batch_size or \
+                time.monotonic() - self._last_flush >= self.flush_interval:
+            return self.flush()
+        return 0
+
+    def flush(self) -> int:
+        """
+        Пишет буфер в одной транзакции; возвращает число новых статей.
+        Для уже сохранённых url обновляются только изменившиеся метрики (updated_count).
+        """
+        with profiling.stage('insert'):
+            return self._write_buffer()
+
+    def _write_buffer(self) -> int:
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return 0
+        started = time.perf_counter()
+        duplicates = updated = 0
+        now_ts = int(time.time())
+        existing = exists_urls(self.conn, [record.get('url') for record in self._buffer])
+        new_records = [record for record in self._buffer if record.get('url') not in existing]
+        known_records = [record for record in self._buffer if record.get('url') in existing]
+        # rowcount, а не total_changes: тот учитывает и строки, записанные триггерами FTS
+        inserted = 0
+        with self.conn:
+            if known_records:
+                updated = _refresh_metrics(self.conn, known_records, now_ts)
+            if self.near_dup_action == 'off':
+                cur = self.conn.executemany(
+                    WRITE_ARTICLE_SQL,
+                    [_article_params(record, now_ts) for record in new_records]
+                )
+                inserted = max(cur.rowcount, 0)
+            elif new_records:
+                inserted, duplicates = _write_with_dedup(self.conn, new_records, now_ts, self.near_dup_action)
+        metrics.DB_WRITE_SECONDS.observe(self.site, value=time.perf_counter() - started)
+        metrics.ARTICLES.inc(self.site, 'saved', amount=inserted)
+        metrics.ARTICLES.inc(self.site, 'duplicate', amount=duplicates)
+        metrics.ARTICLES.inc(self.site, 'updated', amount=updated)
+        self._buffer.clear()
+        self._pending_urls.clear()
+        self.saved_count += inserted
+        self.duplicate_count += duplicates
+        self.updated_count += updated
+        return inserted
+
+    def close(self) -> int:
+        return self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
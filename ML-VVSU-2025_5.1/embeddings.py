@@ -0,0 +1,311 @@
+"""
+Хранилище векторов статей (нужен numpy; для загрузки модели Word2Vec - gensim).
+Вектор статьи - среднее векторов её лемм из article_tokens (textprep.py), как document_vector
+в ноутбуке: слова вне словаря модели пропускаются, статья без известных слов - нулевой вектор.
+
+Файлы в каталоге хранилища:
+    vectors.f32 - матрица float32 (статья x размерность) подряд по строкам;
+    ids.i64     - id статей (int64) в порядке строк, по возрастанию;
+    meta.json   - размерность, число строк и версия модели.
+Матрица открывается через np.memmap без чтения в память. Новые статьи дописываются в конец;
+если версия модели (хэш словаря и векторов) изменилась, векторы пересчитываются заново.
+Строк считается столько, сколько записано в meta.json, - хвост прерванной дозаписи отбрасывается.
+
+Запись (дозапись, пересчёт, обрезка хвоста) идёт под исключительной блокировкой файла .lock,
+поэтому демон и ручной embed не мешают друг другу. Читатели (readonly=True: similar, topics)
+ничего не обрезают: под разделяемой блокировкой они читают meta.json и отображают ровно
+count строк, так что дозапись, идущая параллельно, их не задевает.
+"""
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import EMBEDDINGS_DIR, EMBEDDINGS_BATCH_SIZE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: блокировки нет, одновременно с записью хранилище открывать нельзя
+    fcntl = None
+
+VECTORS_FILE = 'vectors.f32'
+IDS_FILE = 'ids.i64'
+META_FILE = 'meta.json'
+LOCK_FILE = '.lock'
+
+_NEW_TOKENS_SQL = "SELECT article_id, tokens FROM article_tokens WHERE article_id > ? ORDER BY article_id LIMIT ?"
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Для векторов статей нужен пакет numpy: pip install numpy")
+
+
+def load_word_vectors(path: str):
+    """
+    Векторы слов gensim: модель Word2Vec или KeyedVectors, сохранённые через .save(),
+    либо файл в формате word2vec (.bin - двоичный, .txt / .vec - текстовый)
+    """
+    try:
+        from gensim.models import KeyedVectors
+        from gensim.utils import SaveLoad
+    except ImportError as e:
+        raise ImportError("Для загрузки модели Word2Vec нужен пакет gensim: pip install gensim") from e
+    if path.endswith(('.bin', '.txt', '.vec')):
+        return KeyedVectors.load_word2vec_format(path, binary=path.endswith('.bin'))
+    model = SaveLoad.load(path)
+    return getattr(model, 'wv', model)
+
+
+def model_version(wv) -> str:
+    """Хэш словаря и векторов модели: меняется при любом переобучении"""
+    _require_numpy()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(wv.vectors.shape).encode())
+    digest.update('\n'.join(wv.index_to_key).encode('utf-8'))
+    digest.update(np.ascontiguousarray(wv.vectors, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def mean_vectors(token_lists: Sequence[List[str]], wv) -> 'np.ndarray':
+    """
+    Средние векторы слов для пачки документов операциями над матрицей модели:
+    пары (документ, слово) с числом повторов -> строки модели с весами -> суммы по отрезкам документов
+    """
+    _require_numpy()
+    n = len(token_lists)
+    vocab_size = len(wv.key_to_index)
+    out = np.zeros((n, wv.vector_size), dtype=np.float32)
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=n)
+    get_index = wv.key_to_index.get
+    word_rows = np.fromiter(
+        (get_index(token, -1) for tokens in token_lists for token in tokens),
+        dtype=np.int64, count=int(lengths.sum())
+    )
+    docs = np.repeat(np.arange(n, dtype=np.int64), lengths)
+    known = word_rows >= 0
+    word_rows, docs = word_rows[known], docs[known]
+    if not word_rows.size:
+        return out
+    # слова в документе повторяются: каждая строка модели берётся один раз на документ с весом
+    pairs, repeats = np.unique(docs * vocab_size + word_rows, return_counts=True)
+    weighted = wv.vectors[pairs % vocab_size] * repeats[:, None].astype(np.float32)
+    pair_counts = np.bincount(pairs // vocab_size, minlength=n)
+    nonempty = pair_counts > 0
+    starts = (np.cumsum(pair_counts) - pair_counts)[nonempty]
+    sums = np.add.reduceat(weighted, starts, axis=0)
+    out[nonempty] = sums / np.bincount(docs, minlength=n)[nonempty, None]
+    return out
+
+
+@contextmanager
+def store_lock(path: str, shared: bool = False):
+    """Блокировка каталога хранилища: исключительная для записи, shared=True - для чтения"""
+    if fcntl is None or not os.path.isdir(path):
+        yield
+        return
+    with open(os.path.join(path, LOCK_FILE), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class EmbeddingStore:
+    """
+    Векторы статей на диске: vectors - матрица (memmap), ids - id статей её строк.
+    readonly=True - только чтение: каталог не создаётся, файлы не обрезаются,
+    отображаются строки, записанные на момент открытия.
+    """
+
+    def __init__(self, path: str = EMBEDDINGS_DIR, readonly: bool = False):
+        _require_numpy()
+        self.path = path
+        self.readonly = readonly
+        self._ids = None
+        self._vectors = None
+        if readonly:
+            with store_lock(path, shared=True):
+                self._load_meta()
+                # отображения открываются сразу: дальнейшие reset / append их уже не меняют
+                _ = self.ids, self.vectors
+            return
+        os.makedirs(path, exist_ok=True)
+        with store_lock(path):
+            self._load_meta()
+            self._truncate()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load_meta(self):
+        meta = self._read_meta()
+        self.dim: int = meta.get('dim', 0)
+        self.count: int = meta.get('count', 0)
+        self.model_version: Optional[str] = meta.get('model_version')
+        self._ids = self._vectors = None
+
+    def _require_writable(self):
+        if self.readonly:
+            raise ValueError(f"Хранилище {self.path} открыто только для чтения")
+
+    def _read_meta(self) -> Dict:
+        if not os.path.exists(self._file(META_FILE)):
+            return {}
+        with open(self._file(META_FILE), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self):
+        meta = {
+            'dim': self.dim,
+            'count': self.count,
+            'model_version': self.model_version,
+            'updated_at': int(time.time()),
+        }
+        path = self._file(META_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def _truncate(self):
+        """Обрезает файлы до count строк (и создаёт их, если нет)"""
+        for name, row_bytes in ((VECTORS_FILE, 4 * self.dim), (IDS_FILE, 8)):
+            with open(self._file(name), 'ab') as f:
+                if f.tell() != self.count * row_bytes:
+                    f.truncate(self.count * row_bytes)
+
+    @property
+    def ids(self) -> 'np.ndarray':
+        if self._ids is None:
+            self._ids = self._map(IDS_FILE, np.int64, (self.count,))
+        return self._ids
+
+    @property
+    def vectors(self) -> 'np.ndarray':
+        """Матрица всех векторов без копирования в память"""
+        if self._vectors is None:
+            self._vectors = self._map(VECTORS_FILE, np.float32, (self.count, self.dim))
+        return self._vectors
+
+    def _map(self, name: str, dtype, shape: Tuple[int, ...]) -> 'np.ndarray':
+        if self.count == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode='r', shape=shape)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def last_id(self) -> int:
+        return int(self.ids[-1]) if self.count else 0
+
+    def rows(self, article_ids: Sequence[int]) -> 'np.ndarray':
+        """Номера строк для id статей (-1 - вектора нет)"""
+        wanted = np.asarray(article_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, wanted)
+        found = positions < self.count
+        found[found] = self.ids[positions[found]] == wanted[found]
+        return np.where(found, positions, -1)
+
+    def get(self, article_ids: Sequence[int]) -> 'np.ndarray':
+        """Векторы статей в порядке article_ids; KeyError, если какого-то нет"""
+        rows = self.rows(article_ids)
+        if (rows < 0).any():
+            missing = np.asarray(article_ids)[rows < 0]
+            raise KeyError(f"Нет векторов статей: {missing[:10].tolist()}")
+        return np.asarray(self.vectors[rows])
+
+    def reset(self, dim: int, version: str):
+        """Пустое хранилище под модель другой версии или размерности"""
+        self._require_writable()
+        with store_lock(self.path):
+            self.dim, self.count, self.model_version = dim, 0, version
+            self._ids = self._vectors = None
+            self._write_meta()
+            # файлы заменяются новыми, а не обрезаются: у читателей остаются отображения старых
+            for name in (VECTORS_FILE, IDS_FILE):
+                open(self._file(name) + '.tmp', 'wb').close()
+                os.replace(self._file(name) + '.tmp', self._file(name))
+
+    def append(self, article_ids: Sequence[int], vectors: 'np.ndarray'):
+        """
+        Дописывает векторы статей с id по возрастанию после уже сохранённых. Статьи,
+        которые успел дописать другой процесс, пропускаются; ValueError, если он пересчитал
+        хранилище под другую модель
+        """
+        self._require_writable()
+        ids = np.asarray(article_ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"Ожидалась матрица {len(ids)}x{self.dim}, получена {vectors.shape}")
+        if not len(ids):
+            return
+        if (np.diff(ids) <= 0).any():
+            raise ValueError("id статей дописываются по возрастанию после уже сохранённых")
+        with store_lock(self.path):
+            known_count, known_version, known_dim = self.count, self.model_version, self.dim
+            self._load_meta()
+            if (self.model_version, self.dim) != (known_version, known_dim):
+                raise ValueError(f"Хранилище {self.path} пересчитано другим процессом под другую модель")
+            if self.count > known_count:
+                # другой процесс уже дописал часть этих статей
+                keep = ids > self.last_id
+                ids, vectors = ids[keep], vectors[keep]
+                if not len(ids):
+                    return
+            if ids[0] <= self.last_id:
+                raise ValueError("id статей дописываются по возрастанию после уже сохранённых")
+            # хвост прерванной дозаписи другого процесса
+            self._truncate()
+            with open(self._file(VECTORS_FILE), 'ab') as f:
+                f.write(vectors.tobytes())
+            with open(self._file(IDS_FILE), 'ab') as f:
+                f.write(ids.tobytes())
+            # строки становятся видны только после записи meta.json
+            self.count += len(ids)
+            self._ids = self._vectors = None
+            self._write_meta()
+
+
+def update_embeddings(conn, wv, path: str = EMBEDDINGS_DIR,
+                      batch_size: int = EMBEDDINGS_BATCH_SIZE) -> Tuple[int, int, bool]:
+    """
+    Дописывает векторы статей из article_tokens, которых ещё нет в хранилище;
+    при другой версии модели пересчитывает все.
+    Возвращает (векторов добавлено, векторов всего, пересчитано ли хранилище заново).
+    """
+    store = EmbeddingStore(path)
+    version = model_version(wv)
+    rebuilt = False
+    if store.model_version != version or store.dim != wv.vector_size:
+        rebuilt = store.count > 0
+        store.reset(wv.vector_size, version)
+    # id растут со временем вставки, а textprep обрабатывает статьи по возрастанию id:
+    # новые статьи всегда идут после последнего сохранённого вектора
+    last_id = store.last_id
+    added = 0
+    while True:
+        rows = conn.execute(_NEW_TOKENS_SQL, (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        store.append([article_id for article_id, _ in rows], mean_vectors([tokens.split() for _, tokens in rows], wv))
+        added += len(rows)
+        last_id = rows[-1][0]
+    return added, len(store), rebuilt
+
+
+def run_embed(conn, model_path: str, path: str = EMBEDDINGS_DIR):
+    started = time.perf_counter()
+    wv = load_word_vectors(model_path)
+    added, total, rebuilt = update_embeddings(conn, wv, path)
+    note = ' (модель изменилась - векторы пересчитаны)' if rebuilt else ''
+    print(f"Добавлено векторов: {added}, всего: {total}{note} за {time.perf_counter() - started:.1f} с")
@@ -0,0 +1,197 @@
+"""
+Выгрузка таблицы articles в Parquet для аналитики (нужен pyarrow: pip install pyarrow).
+Статьи читаются из БД кусками по id и пишутся в каталоги по сайту и месяцу публикации
+(site=habr/month=2025-11/part-<первый id>.parquet, разбиение в стиле Hive):
+pandas и pyarrow читают выгрузку целиком, нужные колонки и разделы - без чтения остального.
+Типы: даты - timestamp UTC, счётчики - int32, id - int64; site и month при чтении - словарные
+колонки. Служебная подпись MinHash не выгружается.
+Повторная выгрузка дописывает только статьи с id больше выгруженного в прошлый раз
+(состояние в _export_state.json); --full пересоздаёт выгрузку.
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from dates import parse_date
+from sites import site_for_url
+from config import EXPORT_DIR, EXPORT_BATCH_ROWS, EXPORT_COMPRESSION
+
+STATE_FILE = '_export_state.json'
+# разделы для статей без сайта и без даты; не null - pandas не умеет склеивать
+# словарные колонки разделов с пропусками
+OTHER_SITE = 'other'
+UNKNOWN_MONTH = 'unknown'
+
+_SELECT_SQL = """
+SELECT id, guid, title, description, url, published_at, comments_count, rating,
+       created_at_utc, content_hash, duplicate_of
+FROM articles WHERE id > ? ORDER BY id LIMIT ?
+"""
+# колонки с небольшим числом разных значений - словарное кодирование в Parquet
+_DICTIONARY_COLUMNS = ['comments_count', 'rating']
+
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Для выгрузки в Parquet нужен пакет pyarrow: pip install pyarrow") from e
+    return pa, pq
+
+
+def _schema(pa):
+    return pa.schema([
+        ('id', pa.int64()),
+        ('guid', pa.string()),
+        ('title', pa.string()),
+        ('description', pa.string()),
+        ('url', pa.string()),
+        ('published_at', pa.timestamp('us', tz='UTC')),
+        ('comments_count', pa.int32()),
+        ('rating', pa.int32()),
+        ('created_at_utc', pa.timestamp('s', tz='UTC')),
+        ('content_hash', pa.string()),
+        ('duplicate_of', pa.int64()),
+    ])
+
+
+def _read_state(out_dir: str) -> Dict:
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_state(out_dir: str, state: Dict):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _remove_files(out_dir: str, suffixes: Tuple[str, ...]):
+    for root, _, files in os.walk(out_dir, topdown=False):
+        for name in files:
+            if name.endswith(suffixes):
+                os.remove(os.path.join(root, name))
+        if root != out_dir and not os.listdir(root):
+            os.rmdir(root)
+
+
+class _PartitionWriter:
+    """Один файл раздела за выгрузку; строки копятся и пишутся группами строк"""
+
+    def __init__(self, pa, pq, path: str):
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.rows: List[tuple] = []
+        self.writer = None
+        self.row_count = 0
+
+    def flush(self):
+        if not self.rows:
+            return
+        columns = list(zip(*self.rows))
+        schema = _schema(self.pa)
+        table = self.pa.Table.from_arrays(
+            [self.pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        )
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.writer = self.pq.ParquetWriter(
+                self.path + '.tmp', schema, compression=EXPORT_COMPRESSION,
+                use_dictionary=_DICTIONARY_COLUMNS
+            )
+        self.writer.write_table(table)
+        self.row_count += len(self.rows)
+        self.rows = []
+
+    def close(self, commit: bool = True):
+        if commit:
+            self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            if commit:
+                os.replace(self.path + '.tmp', self.path)
+            else:
+                os.remove(self.path + '.tmp')
+
+
+def _export_row(row: tuple) -> Tuple[str, str, tuple]:
+    """(сайт, месяц, значения колонок) для строки БД"""
+    row_id, guid, title, description, url, published_at, comments, rating, created, content_hash, dup = row
+    site = site_for_url(url or '')
+    # даты уже в ISO-8601 UTC (dates.py); старые записи в другом виде разбираются так же, как при обходе
+    published = parse_date(str(published_at), site) if published_at is not None else None
+    # created_at_utc - секунды Unix, pyarrow принимает их как timestamp('s') без преобразования
+    values = (row_id, guid, title, description, url, published, comments, rating, created, content_hash, dup)
+    month = published.strftime('%Y-%m') if published else UNKNOWN_MONTH
+    return site or OTHER_SITE, month, values
+
+
+def export_articles(conn, out_dir: str = EXPORT_DIR, full: bool = False,
+                    batch_rows: int = EXPORT_BATCH_ROWS) -> Dict:
+    """
+    Выгружает статьи в Parquet. Возвращает {'rows', 'files', 'last_id'}:
+    сколько статей выгружено, сколько файлов записано и последний выгруженный id.
+    """
+    pa, pq = _arrow()
+    os.makedirs(out_dir, exist_ok=True)
+    if full:
+        _remove_files(out_dir, ('.parquet', '.tmp', STATE_FILE))
+    # недописанные файлы прерванной выгрузки: состояние для них не сохранялось
+    _remove_files(out_dir, ('.tmp',))
+    last_id = 0 if full else _read_state(out_dir).get('last_id', 0)
+
+    writers: Dict[Tuple[str, str], _PartitionWriter] = {}
+    exported = 0
+    completed = False
+    try:
+        while True:
+            rows = conn.execute(_SELECT_SQL, (last_id, batch_rows)).fetchall()
+            if not rows:
+                break
+            touched = set()
+            for row in rows:
+                site, month, values = _export_row(row)
+                key = (site, month)
+                writer = writers.get(key)
+                if writer is None:
+                    path = os.path.join(out_dir, f'site={site}', f'month={month}', f'part-{values[0]:012d}.parquet')
+                    writer = writers[key] = _PartitionWriter(pa, pq, path)
+                writer.rows.append(values)
+                touched.add(key)
+                if len(writer.rows) >= batch_rows:
+                    writer.flush()
+            # id растут вместе с временем обхода: в разделы, не встретившиеся в куске,
+            # новые строки приходят редко - их буферы можно сбросить, не дожидаясь полноты
+            for key, writer in writers.items():
+                if key not in touched:
+                    writer.flush()
+            exported += len(rows)
+            last_id = rows[-1][0]
+        completed = True
+    finally:
+        # при ошибке файлы этой выгрузки удаляются - состояние останется прежним
+        for writer in writers.values():
+            writer.close(commit=completed)
+
+    files = sum(1 for writer in writers.values() if writer.row_count)
+    if exported:
+        _write_state(out_dir, {'last_id': last_id, 'exported_at': int(time.time())})
+    return {'rows': exported, 'files': files, 'last_id': last_id}
+
+
+def read_articles(path: str = EXPORT_DIR, columns: Optional[List[str]] = None, site: Optional[str] = None):
+    """
+    Статьи из выгрузки как pandas.DataFrame: только нужные колонки
+    и, если указан site, только файлы его раздела
+    """
+    _, pq = _arrow()
+    filters = [('site', '=', site)] if site else None
+    return pq.read_table(path, columns=columns, filters=filters).to_pandas()
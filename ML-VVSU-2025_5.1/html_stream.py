@@ -0,0 +1,114 @@
+"""
+Потоковое чтение HTML-ответа: тело читается кусками с ограничением размера,
+для страниц списка чтение можно оборвать сразу после закрытия контейнера со статьями.
+Кодировка берётся из заголовка Content-Type или <meta> в начале документа;
+определение по содержимому - только если ни того, ни другого нет и текст не UTF-8.
+"""
+import codecs
+import re
+from typing import Optional, Tuple
+
+from requests.compat import chardet
+
+from config import STREAM_CHUNK_SIZE, ENCODING_SNIFF_BYTES
+
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+# <meta charset="..."> и <meta http-equiv="Content-Type" content="text/html; charset=...">
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.I)
+
+
+def _known_encoding(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def encoding_from_headers(content_type: Optional[str]) -> Optional[str]:
+    match = _HEADER_CHARSET_RE.search(content_type or '')
+    return _known_encoding(match.group(1)) if match else None
+
+
+def encoding_from_meta(data: bytes) -> Optional[str]:
+    match = _META_CHARSET_RE.search(data[:ENCODING_SNIFF_BYTES])
+    return _known_encoding(match.group(1).decode('ascii', 'ignore')) if match else None
+
+
+def decode_html(data: bytes, content_type: Optional[str] = None) -> str:
+    """Текст страницы: кодировка из заголовка, затем из <meta>, затем UTF-8, затем определение"""
+    encoding = encoding_from_headers(content_type) or encoding_from_meta(data)
+    if encoding:
+        return data.decode(encoding, errors='replace')
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+    # определение кодировки - по началу документа, а не по всему телу
+    detected = chardet.detect(data[:ENCODING_SNIFF_BYTES * 16]).get('encoding')
+    return data.decode(_known_encoding(detected) or 'utf-8', errors='replace')
+
+
+class ContainerEndDetector:
+    """
+    Находит в потоке байтов закрытие элемента с классом class_name:
+    после открывающего тега считает вложенные открытия и закрытия того же тега.
+    Разметка - ASCII, поэтому байты можно сканировать до декодирования.
+    """
+
+    def __init__(self, class_name: str):
+        self._start_re = re.compile(
+            rb'<([a-zA-Z][\w-]*)\b[^>]*\bclass\s*=\s*["\'][^"\']*(?<![\w-])'
+            + re.escape(class_name.encode('ascii')) + rb'(?![\w-])'
+        )
+        self._tag_re = None
+        self._depth = 0
+        self._pos = 0
+
+    def feed(self, data: bytes) -> Optional[int]:
+        """data - всё прочитанное на данный момент; возвращает позицию конца контейнера или None"""
+        # последние байты могут оказаться началом ещё не дочитанного тега
+        limit = max(self._pos, len(data) - 256)
+        if self._tag_re is None:
+            match = self._start_re.search(data, self._pos, limit)
+            if match is None:
+                self._pos = max(self._pos, limit - 4096)
+                return None
+            tag = re.escape(match.group(1))
+            self._tag_re = re.compile(rb'<(/?)' + tag + rb'(?=[\s>/])', re.I)
+            self._depth = 1
+            self._pos = match.end()
+        for match in self._tag_re.finditer(data, self._pos, limit):
+            self._pos = match.end()
+            self._depth += -1 if match.group(1) else 1
+            if self._depth == 0:
+                end = data.find(b'>', match.end())
+                if end != -1:
+                    return end + 1
+                # закрывающий тег ещё не дочитан - разберём его в следующий раз
+                self._depth = 1
+                self._pos = match.start()
+                return None
+        return None
+
+
+def read_body(response, max_bytes: int, stop_after_class: Optional[str] = None) -> Tuple[bytes, Optional[str]]:
+    """
+    Читает тело ответа кусками. Возвращает (байты, причина обрыва чтения):
+    None - прочитано целиком, 'container' - контейнер stop_after_class закрылся,
+    'max_bytes' - достигнут лимит размера.
+    """
+    detector = ContainerEndDetector(stop_after_class) if stop_after_class else None
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+        body += chunk
+        if detector is not None:
+            end = detector.feed(body)
+            if end is not None:
+                del body[end:]
+                return bytes(body), 'container'
+        if len(body) >= max_bytes:
+            del body[max_bytes:]
+            return bytes(body), 'max_bytes'
+    return bytes(body), None
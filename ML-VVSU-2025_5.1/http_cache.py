@@ -0,0 +1,169 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from config import HTTP_CACHE_MAX_BYTES, DB_CONNECTION_TIMEOUT
+
+CACHE_INDEX_SQL = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    body_hash TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL,
+    accessed_at REAL,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at);
+CREATE INDEX IF NOT EXISTS idx_entries_hash ON entries(body_hash);
+"""
+# сколько самых старых записей читать за раз при вытеснении
+EVICT_BATCH = 64
+
+
+class CacheEntry(NamedTuple):
+    url: str
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class ResponseCache:
+    """
+    Дисковый кэш HTTP-ответов.
+    Тела хранятся по sha256 содержимого (одинаковые страницы - один файл),
+    валидаторы и отметки времени - в index.sqlite. При превышении
+    max_bytes вытесняются давно не использованные записи (LRU).
+    Объём кэша считается по индексу один раз при открытии и дальше ведётся в памяти.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(cache_dir, 'index.sqlite'),
+            timeout=DB_CONNECTION_TIMEOUT,
+            check_same_thread=False
+        )
+        self._conn.executescript(CACHE_INDEX_SQL)
+        self._conn.commit()
+        self._total_bytes = self._count_bytes()
+
+    def _object_path(self, body_hash: str) -> str:
+        return os.path.join(self.objects_dir, body_hash[:2], body_hash)
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body_hash, etag, last_modified, fetched_at, size FROM entries WHERE url = ?",
+                (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            body_hash, etag, last_modified, fetched_at, size = row
+            try:
+                with open(self._object_path(body_hash), 'rb') as f:
+                    text = f.read().decode('utf-8')
+            except OSError:
+                # файл удалён вручную - запись больше не годится
+                self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self._total_bytes -= self._drop_object_if_unused(body_hash, size)
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+            return CacheEntry(url, text, etag, last_modified, fetched_at)
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry) -> Dict[str, str]:
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def store(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        body = text.encode('utf-8')
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._object_path(body_hash)
+        now = time.time()
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+            old = self._conn.execute("SELECT body_hash, size FROM entries WHERE url = ?", (url,)).fetchone()
+            if not self._is_used(body_hash):
+                self._total_bytes += len(body)
+            self._conn.execute("""
+            INSERT OR REPLACE INTO entries
+                (url, body_hash, etag, last_modified, fetched_at, accessed_at, size)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (url, body_hash, etag, last_modified, now, now, len(body)))
+            if old and old[0] != body_hash:
+                self._total_bytes -= self._drop_object_if_unused(old[0], old[1])
+            self._conn.commit()
+            self._evict()
+
+    def touch(self, url: str):
+        """Отмечает запись как подтверждённую сервером (ответ 304)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                (now, now, url)
+            )
+            self._conn.commit()
+
+    def _is_used(self, body_hash: str) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)
+        ).fetchone() is not None
+
+    def _drop_object_if_unused(self, body_hash: str, size: int) -> int:
+        """Удаляет тело, на которое больше нет записей; возвращает освобождённые байты"""
+        if self._is_used(body_hash):
+            return 0
+        try:
+            os.remove(self._object_path(body_hash))
+        except OSError:
+            pass
+        return size or 0
+
+    def _count_bytes(self) -> int:
+        row = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT body_hash, size FROM entries)"
+        ).fetchone()
+        return row[0]
+
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def _evict(self):
+        # самые старые записи - по индексу accessed_at небольшими порциями, без просмотра всего индекса
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT url, body_hash, size FROM entries ORDER BY accessed_at ASC LIMIT ?", (EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            for url, body_hash, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self._total_bytes -= self._drop_object_if_unused(body_hash, size)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
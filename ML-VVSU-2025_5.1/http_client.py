@@ -0,0 +1,266 @@
+import itertools
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import ResponseCache
+from html_stream import read_body, decode_html
+from ratelimit import get_host_limiter, get_retry_budget, backoff_delay, parse_retry_after
+from archive import PageArchive
+from sites import domain_for_url, site_for_url
+import metrics
+import profiling
+from config import (
+    SITES_CONFIG, DEFAULT_USER_AGENTS, HTTP_REQUEST_TIMEOUT,
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_POOL_BLOCK, HTTP_KEEP_ALIVE,
+    HTTP_CACHE_MAX_BYTES, DEFAULT_CACHE_TTL, RETRY_MAX_ATTEMPTS, RETRY_STATUS_CODES,
+    DEFAULT_MAX_PAGE_BYTES
+)
+
+# brotli декодируется urllib3 только если установлен brotli/brotlicffi
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class SessionPool:
+    """
+    Пул keep-alive сессий: одна requests.Session на домен.
+    Соединения переиспользуются между запросами и потоками,
+    каждой новой сессии выдаётся следующий User-Agent из списка.
+    """
+
+    def __init__(
+        self,
+        user_agents: Optional[List[str]] = None,
+        pool_connections: int = HTTP_POOL_CONNECTIONS,
+        pool_maxsize: int = HTTP_POOL_MAXSIZE,
+        keep_alive: bool = HTTP_KEEP_ALIVE
+    ):
+        self._user_agents = itertools.cycle(user_agents or DEFAULT_USER_AGENTS)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=HTTP_POOL_BLOCK
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'User-Agent': next(self._user_agents),
+            'Accept-Encoding': ACCEPT_ENCODING,
+            'Connection': 'keep-alive' if self.keep_alive else 'close',
+        })
+        return session
+
+    def get(self, url: str) -> requests.Session:
+        domain = domain_for_url(url)
+        with self._lock:
+            session = self._sessions.get(domain)
+            if session is None:
+                session = self._create_session()
+                self._sessions[domain] = session
+            return session
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_default_pool = SessionPool()
+
+
+def get_session(url: str) -> requests.Session:
+    """Сессия общего пула для домена url"""
+    return _default_pool.get(url)
+
+
+def close_sessions():
+    _default_pool.close()
+    if _cache is not None:
+        _cache.close()
+    if _archive is not None:
+        _archive.close()
+
+
+class FetchResult(NamedTuple):
+    text: str
+    status: int
+    from_cache: bool = False
+    # True - содержимое не изменилось с прошлого раза (свежий кэш или 304)
+    not_modified: bool = False
+
+
+_cache: Optional[ResponseCache] = None
+# архив, куда пишутся загруженные страницы, и архив для оффлайн-воспроизведения
+_archive: Optional[PageArchive] = None
+_replay: Optional[PageArchive] = None
+
+
+def configure_cache(cache_dir: Optional[str], max_bytes: int = HTTP_CACHE_MAX_BYTES):
+    """Включает дисковый кэш ответов (None - выключает)"""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = ResponseCache(cache_dir, max_bytes) if cache_dir else None
+
+
+def configure_archive(archive_dir: Optional[str]):
+    """Сохранять каждую загруженную страницу в архив (None - не сохранять)"""
+    global _archive
+    if _archive is not None:
+        _archive.close()
+    _archive = PageArchive(archive_dir) if archive_dir else None
+
+
+def configure_replay(archive: Optional[PageArchive]):
+    """Брать страницы только из архива, без сети (None - обычный режим)"""
+    global _replay
+    _replay = archive
+
+
+def fetch_page(url: str, headers=None, parser_instance=None, kind: str = 'article',
+               revalidate: bool = False) -> Optional[FetchResult]:
+    """
+    Загружает страницу: в режиме воспроизведения - из архива, иначе через
+    дисковый кэш и пул сессий. kind ('list' / 'article') записывается в архив.
+    revalidate=True: свежесть по cache_ttl не учитывается - всегда условный запрос
+    (If-None-Match / If-Modified-Since), с диска отдаётся только ответ 304.
+    """
+    with profiling.stage('fetch'):
+        return _fetch_page(url, headers, parser_instance, kind, revalidate)
+
+
+def _fetch_page(url: str, headers=None, parser_instance=None, kind: str = 'article',
+                revalidate: bool = False) -> Optional[FetchResult]:
+    if _replay is not None:
+        text = _replay.get(url)
+        if text is None:
+            print(f"Нет в архиве: {url}", file=sys.stderr)
+            return None
+        metrics.PAGES_FETCHED.inc(site_for_url(url) or 'other', kind)
+        return FetchResult(text, 200, from_cache=True)
+
+    result = _fetch_network(url, headers, parser_instance, kind, revalidate)
+    if result is not None:
+        metrics.PAGES_FETCHED.inc(site_for_url(url) or 'other', kind)
+    if result is not None and _archive is not None:
+        # из кэша - только если в архиве этой страницы ещё нет
+        if not result.from_cache or not _archive.contains(url):
+            _archive.put(url, result.text, kind=kind, site=site_for_url(url))
+    return result
+
+
+def _fetch_network(url: str, headers=None, parser_instance=None, kind: str = 'article',
+                   revalidate: bool = False) -> Optional[FetchResult]:
+    """Загрузка через пул сессий и дисковый кэш, с лимитом запросов и повторами"""
+    site_name = site_for_url(url)
+    entry = _cache.lookup(url) if _cache is not None else None
+    if entry is not None and not revalidate:
+        ttl = SITES_CONFIG[site_name].get('cache_ttl', DEFAULT_CACHE_TTL) if site_name else DEFAULT_CACHE_TTL
+        if time.time() - entry.fetched_at < ttl:
+            metrics.CACHE_HITS.inc(site_name or 'other')
+            return FetchResult(entry.text, 200, from_cache=True, not_modified=True)
+
+    request_headers = dict(headers or {})
+    if entry is not None:
+        request_headers.update(ResponseCache.conditional_headers(entry))
+
+    # лимитер хранится в парсере сайта (один парсер = один хост)
+    domain = domain_for_url(url)
+    limiter = parser_instance.rate_limiter if parser_instance is not None else get_host_limiter(domain)
+    budget = get_retry_budget(domain)
+
+    attempt = 0
+    while True:
+        limiter.acquire()
+        budget.record_request()
+        retry_after = None
+        started = time.monotonic()
+        try:
+            # keep-alive сессия домена: User-Agent и сжатие заданы в ней;
+            # тело читается потоком в _handle_response
+            response = get_session(url).get(
+                url, headers=request_headers, timeout=HTTP_REQUEST_TIMEOUT, stream=True
+            )
+        except (requests.Timeout, requests.ConnectionError) as e:
+            limiter.record_failure()
+            error = e
+        except Exception as e:
+            print(f"Ошибка при загрузке {url}: {e}", file=sys.stderr)
+            return None
+        else:
+            metrics.HTTP_RESPONSES.inc(site_name or 'other', response.status_code)
+            if response.status_code in RETRY_STATUS_CODES:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if response.status_code in (429, 503):
+                    limiter.record_throttle(retry_after)
+                else:
+                    limiter.record_failure()
+                error = f"HTTP {response.status_code}"
+                response.close()
+            else:
+                limiter.record_success(time.monotonic() - started)
+                result = _handle_response(url, response, entry, kind)
+                # задержка - от запроса до конца чтения тела
+                metrics.FETCH_SECONDS.observe(site_name or 'other', kind, value=time.monotonic() - started)
+                return result
+
+        if attempt >= RETRY_MAX_ATTEMPTS or not budget.try_spend():
+            print(f"Ошибка при загрузке {url}: {error}", file=sys.stderr)
+            return None
+        delay = backoff_delay(attempt, retry_after)
+        attempt += 1
+        print(f"Повтор {attempt}/{RETRY_MAX_ATTEMPTS} для {url} через {delay:.1f} с ({error})", file=sys.stderr)
+        time.sleep(delay)
+
+
+def _handle_response(url: str, response, entry, kind: str = 'article') -> Optional[FetchResult]:
+    site_name = site_for_url(url)
+    try:
+        if response.status_code == 304 and entry is not None:
+            _cache.touch(url)
+            metrics.CACHE_HITS.inc(site_name or 'other')
+            return FetchResult(entry.text, 304, from_cache=True, not_modified=True)
+        response.raise_for_status()
+        site_config = SITES_CONFIG.get(site_name or '', {})
+        max_bytes = site_config.get('max_page_bytes', DEFAULT_MAX_PAGE_BYTES)
+        # страницу списка дочитываем только до конца контейнера со статьями
+        stop_after_class = site_config.get('list_container') if kind == 'list' else None
+        data, cut = read_body(response, max_bytes, stop_after_class)
+        metrics.BYTES_FETCHED.inc(site_name or 'other', amount=len(data))
+        text = decode_html(data, response.headers.get('Content-Type'))
+        if cut == 'max_bytes':
+            # обрезанную страницу не кэшируем, в следующий раз загрузим заново
+            print(f"Страница больше {max_bytes} байт, прочитано только начало: {url}", file=sys.stderr)
+        elif _cache is not None:
+            _cache.store(
+                url, text,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+        return FetchResult(text, response.status_code)
+    except Exception as e:
+        print(f"Ошибка при загрузке {url}: {e}", file=sys.stderr)
+        return None
+    finally:
+        response.close()
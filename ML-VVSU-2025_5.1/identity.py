@@ -0,0 +1,41 @@
+import hashlib
+import re
+import uuid
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import URL_TRACKING_PARAMS
+
+_SPACES_RE = re.compile(r'\s+')
+_DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Каноничный вид URL статьи: схема и хост в нижнем регистре, без порта по умолчанию,
+    фрагмента, меток отслеживания и завершающего слэша; параметры отсортированы
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and str(parts.port) != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in URL_TRACKING_PARAMS and not k.lower().startswith('utm_')
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def content_hash(title: Optional[str], description: Optional[str]) -> str:
+    """SHA-256 заголовка и текста; регистр и пробелы не влияют"""
+    text = f"{title or ''}\n{description or ''}"
+    normalized = _SPACES_RE.sub(' ', text).strip().lower()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def article_guid(url: str, title: Optional[str], description: Optional[str]) -> str:
+    """Детерминированный GUID статьи: uuid5 от нормализованного URL и хэша содержимого"""
+    name = f"{normalize_url(url or '')}#{content_hash(title, description)}"
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, name))
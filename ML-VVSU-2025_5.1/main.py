@@ -1,46 +1,68 @@
 import argparse
 import sys
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from urllib.parse import urljoin, urlparse
-from datetime import datetime, timedelta
-
-from parser import (
-    HabrNewsParser,
-    NewsVLParser,
-    IXBTParser,
-    NakedScienceParser,
-    InterfaxParser,
-)
-from db import init_db, insert_article, exists_url
+
+from parser import site_names, create_parser, list_urls
+from db import init_db, BatchWriter, duplicate_url_report, remove_duplicate_urls
+from seen_index import build_seen_index
+from http_client import configure_cache, configure_archive, configure_replay, close_sessions
+from archive import PageArchive
+from pipeline import iter_new_articles, run_pipeline, CrawlProgress, save_crawl_progress
+from search import run_search, rebuild_fts_index
+from near_dup import backfill_near_duplicates, duplicate_clusters
+from dates import normalize_published_dates
+from daemon import run_daemon
+import metrics
+import profiling
 from config import (
-    SITES_CONFIG, DEFAULT_DB_PATH, DEFAULT_USER_AGENT,
-    HTTP_REQUEST_TIMEOUT, DEFAULT_PAGES, DEFAULT_ARTICLES_PER_PAGE, RATE_LIMIT_PER_SEC
+    DEFAULT_DB_PATH, DEFAULT_SEARCH_LIMIT,
+    DEFAULT_PAGES, DEFAULT_ARTICLES_PER_PAGE, DEFAULT_CONCURRENCY, HTTP_CACHE_DIR,
+    SEEN_INDEX_KIND, PARSER_BACKEND, DEFAULT_PARSE_WORKERS, DEFAULT_METRICS_JSON,
+    PROFILE_DIR, PROFILE_MODE, EXPORT_DIR, TEXTPREP_WORKERS, EMBEDDINGS_DIR,
+    SIMILAR_MODES, DEFAULT_SIMILAR_K, TOPICS_CLUSTERS, TOPICS_REFRESH_INTERVAL_SEC
 )
 
 
-def fetch_html(url: str, headers=None):
-    _last_request_ts = 0.0
-    
-    now = time.time()
-    elapsed = now - _last_request_ts
-    min_interval = 1.0 / RATE_LIMIT_PER_SEC
-    if elapsed < min_interval:
-        time.sleep(min_interval - elapsed)
-    
-    try:
-        default_headers = {'User-Agent': DEFAULT_USER_AGENT}
-        if headers: default_headers.update(headers)
-        response = requests.get(url, headers=default_headers, timeout=30)
-        response.raise_for_status()
-        response.encoding = response.apparent_encoding or 'utf-8'
-        
-        _last_request_ts = time.time()  # отметка ПОСЛЕ
-        return response.text
-    except Exception as e:
-        _last_request_ts = time.time()  # даже при ошибке
-        print(f"Ошибка при загрузке {url}: {e}", file=sys.stderr)
-        return None
+def print_seen_index_stats(seen_index):
+    stats = seen_index.stats()
+    print(f"Индекс URL ({stats['kind']}): {stats['count']} адресов, "
+          f"~{stats['memory_bytes'] / 1024 / 1024:.1f} МБ, "
+          f"вероятность ложного срабатывания {stats['expected_fp_rate']:.2g}, "
+          f"проверок {stats['lookups']}, совпадений {stats['positives']}")
+
+
+def run_dedup(db_conn):
+    started = time.perf_counter()
+    processed, duplicates = backfill_near_duplicates(db_conn)
+    print(f"Обработано статей: {processed}, найдено почти дубликатов: {duplicates} "
+          f"за {time.perf_counter() - started:.1f} с")
+    for cluster in duplicate_clusters(db_conn):
+        print(f"  {cluster['copies']:>4} коп.  {(cluster['title'] or '')[:60]}  {cluster['url']}")
+
+
+def run_dedup_urls(db_conn, apply: bool):
+    counts = remove_duplicate_urls(db_conn) if apply else duplicate_url_report(db_conn)
+    action = "Удалено" if apply else "Будет удалено"
+    print(f"{action} лишних записей: {counts['articles']} (повторяющихся url: {counts['urls']}), "
+          f"строк article_lsh: {counts['article_lsh']}, article_tokens: {counts['article_tokens']}, "
+          f"article_topics: {counts['article_topics']}; ссылок duplicate_of на оставшиеся записи: "
+          f"{counts['duplicate_of']}")
+    if apply:
+        print("Создан уникальный индекс по url")
+    elif counts['articles']:
+        print("Ничего не изменено, удалить: dedup-urls --apply")
+
+
+def run_export(db_conn, out_dir: str, full: bool):
+    from export import export_articles
+    started = time.perf_counter()
+    result = export_articles(db_conn, out_dir, full=full)
+    print(f"Выгружено статей: {result['rows']} в {result['files']} файлов ({out_dir}) "
+          f"за {time.perf_counter() - started:.1f} с, последний id: {result['last_id']}")
 
 
 def parse_site(
@@ -48,71 +70,86 @@ def parse_site(
     list_urls: List[str],
     max_pages: int = 1,
     max_articles_per_page: int = 10,
-    db_conn=None
+    db_conn=None,
+    concurrency: int = 1,
+    seen_index=None,
+    site_name: Optional[str] = None,
+    incremental: bool = False,
+    refresh: bool = False,
+    stop_event: Optional[threading.Event] = None,
+    revalidate_lists: bool = False
 ) -> int:
-    """Парсит сайт и сохраняет статьи в БД"""
+    """
+    Парсит сайт и сохраняет статьи в БД; stop_event прерывает обход после текущей статьи.
+    revalidate_lists - страницы списка всегда условным запросом, без учёта cache_ttl
+    """
     parsed_count = 0
-    saved_count = 0
+    label = site_name or 'other'
     
-    for page_num, list_url in enumerate(list_urls[:max_pages], 1):
-        print(f"\nПарсинг страницы {page_num}: {list_url}")
-        
-        html = fetch_html(list_url)
-        if not html:
-            print(f"Не удалось загрузить страницу {list_url}")
-            continue
-        
-        # список статей
-        articles_meta = parser_instance.parse_list_page(html)
-        print(f"Найдено статей на странице: {len(articles_meta)}")
-        
-        # Ограничиваем количество статей
-        articles_meta = articles_meta[:max_articles_per_page]
-        
-        for i, meta in enumerate(articles_meta, 1):
-            url = meta.get('url')
-            if not url:
-                continue
-            
-            # проверка exists
-            if db_conn and exists_url(db_conn, url):
-                print(f"  [{i}/{len(articles_meta)}] Пропущена (уже есть): {meta.get('title', '')[:60]}")
-                continue
-            
-            print(f"  [{i}/{len(articles_meta)}] Парсинг: {meta.get('title', '')[:60]}")
-            
-            # грузим статью
-            article_html = fetch_html(url)
-            if not article_html:
-                print(f"    Не удалось загрузить статью")
-                continue
+    # статьи пишутся пачками в одной транзакции
+    writer = BatchWriter(db_conn, site=site_name) if db_conn else None
+    # состояние инкрементального обхода сохраняется после записи статей
+    progress = CrawlProgress(site_name) if writer and incremental and site_name else None
+    
+    try:
+        for meta, article_html in iter_new_articles(
+            parser_instance, list_urls,
+            max_pages=max_pages,
+            max_articles_per_page=max_articles_per_page,
+            db_conn=db_conn,
+            concurrency=concurrency,
+            seen_index=seen_index,
+            is_pending=writer.is_pending if writer else None,
+            site_name=site_name,
+            incremental=incremental,
+            refresh=refresh,
+            revalidate_lists=revalidate_lists,
+            progress=progress
+        ):
+            if stop_event is not None and stop_event.is_set():
+                print(f"    Обход прерван")
+                break
             
             #  полный текст статьи
-            article_data = parser_instance.parse_article_page(article_html, meta)
+            with metrics.measure_parse(label, 'article'), profiling.stage('article-parse'):
+                article_data = parser_instance.parse_article_page(article_html, meta)
             if not article_data:
                 print(f"    Не удалось извлечь контент")
+                metrics.ARTICLES.inc(label, 'failed')
                 continue
             
             parsed_count += 1
+            metrics.ARTICLES.inc(label, 'parsed')
             
-            if db_conn:
-                article_id = insert_article(db_conn, article_data)
-                if article_id:
-                    saved_count += 1
-                    print(f"    ✓ Сохранено (ID: {article_id})")
-                else:
-                    print(f"    ✗ Не удалось сохранить (дубликат или ошибка)")
+            if writer:
+                flushed = writer.add(article_data)
+                if seen_index is not None:
+                    seen_index.add(article_data.get('url'))
+                print(f"    ✓ Добавлено в очередь записи")
+                if flushed:
+                    print(f"    ✓ Записано в БД: {flushed}")
             else:
                 print(f"    ✓ Распарсено (БД не подключена)")
-    
-    return saved_count if db_conn else parsed_count
+    finally:
+        if writer:
+            flushed = writer.close()
+            if flushed:
+                print(f"    ✓ Записано в БД: {flushed}")
+            if writer.duplicate_count:
+                print(f"    Из них почти дубликатов других статей: {writer.duplicate_count}")
+            if writer.updated_count:
+                print(f"    Обновлены метрики статей: {writer.updated_count}")
+
+    if progress is not None:
+        save_crawl_progress(db_conn, progress)
+    return writer.saved_count if writer else parsed_count
 
 
 def main():
     parser = argparse.ArgumentParser(description='Парсер новостей')
     parser.add_argument(
         '--site',
-        choices=['habr', 'newsvl', 'ixbt', 'naked-science', 'interfax', 'all'],
+        choices=site_names() + ['all'],
         default='all',
         help='Какой сайт парсить (по умолчанию: all)'
     )
@@ -134,69 +171,400 @@ def main():
         default=None,
         help=f'Путь к файлу БД (по умолчанию: {DEFAULT_DB_PATH})'
     )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Режим тестирования без сохранения в БД'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=HTTP_CACHE_DIR,
+        help=f'Каталог дискового кэша HTTP-ответов (по умолчанию: {HTTP_CACHE_DIR})'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Не использовать дисковый кэш HTTP-ответов'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Останавливать пагинацию на уже известных статьях и вести состояние обхода в БД'
+    )
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help='Обновлять комментарии и рейтинг уже сохранённых статей'
+    )
+    parser.add_argument(
+        '--archive',
+        type=str,
+        default=None,
+        help='Каталог архива: каждая загруженная страница сохраняется в сжатые сегменты'
+    )
+    parser.add_argument(
+        '--replay',
+        type=str,
+        metavar='ARCHIVE',
+        default=None,
+        help='Разобрать страницы из архива без обращения к сети'
+    )
+    parser.add_argument(
+        '--seen-index',
+        choices=['hashset', 'bloom', 'none'],
+        default=SEEN_INDEX_KIND,
+        help=f'Индекс сохранённых URL в памяти (по умолчанию: {SEEN_INDEX_KIND})'
+    )
+    parser.add_argument(
+        '--parser-backend',
+        choices=['bs4', 'lxml'],
+        default=PARSER_BACKEND,
+        help=f'Бэкенд извлечения контента (по умолчанию: {PARSER_BACKEND})'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_PARSE_WORKERS,
+        help='Число процессов для разбора статей; при значении > 0 загрузка, разбор '
+             f'и запись идут конвейером (по умолчанию: {DEFAULT_PARSE_WORKERS} - разбор в потоке загрузки)'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f'Число одновременных загрузок статей на сайт; при значении > 1 '
+             f'сайты также парсятся параллельно (по умолчанию: {DEFAULT_CONCURRENCY})'
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help="Не завершаться: опрашивать каждый сайт с его периодом ('poll_interval' в SITES_CONFIG) "
+             'в инкрементальном режиме до SIGTERM / Ctrl+C'
+    )
+    parser.add_argument(
+        '--topics-model',
+        type=str,
+        default=None,
+        help='Модель Word2Vec для фонового обновления тем в режиме демона: каждые '
+             f'{TOPICS_REFRESH_INTERVAL_SEC} с леммы, векторы и темы новых статей (по умолчанию темы не ведутся)'
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=0,
+        help='Отдавать метрики в формате Prometheus на http://127.0.0.1:PORT/metrics во время обхода '
+             '(по умолчанию: 0 - не отдавать)'
+    )
+    parser.add_argument(
+        '--metrics-json',
+        type=str,
+        default=DEFAULT_METRICS_JSON,
+        help=f'Файл для JSON-сводки метрик в конце запуска, пустая строка - не писать '
+             f'(по умолчанию: {DEFAULT_METRICS_JSON or "не писать"})'
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const=PROFILE_MODE,
+        default=None,
+        choices=list(profiling.MODES),
+        help='Профилировать этапы fetch, list-parse, article-parse, clean, insert: '
+             f'cprofile, sampling или both (по умолчанию при указании флага: {PROFILE_MODE}); '
+             'cprofile профилирует только главный поток - этапы в потоках '
+             '(--concurrency > 1, --daemon) видны только в выборке стеков'
+    )
+    parser.add_argument(
+        '--profile-dir',
+        type=str,
+        default=PROFILE_DIR,
+        help=f'Каталог для файлов .pstats и свёрнутых стеков (по умолчанию: {PROFILE_DIR})'
+    )
+    
+    # подкоманды работают с уже собранной БД; без подкоманды - обход сайтов
+    subparsers = parser.add_subparsers(dest='command')
+    search_parser = subparsers.add_parser('search', help='Полнотекстовый поиск по сохранённым статьям')
+    search_parser.add_argument('query', help='Поисковый запрос')
+    search_parser.add_argument(
+        '--limit',
+        type=int,
+        default=DEFAULT_SEARCH_LIMIT,
+        help=f'Сколько статей показать (по умолчанию: {DEFAULT_SEARCH_LIMIT})'
+    )
+    search_parser.add_argument('--site', choices=site_names(), default=None, help='Только статьи сайта')
+    search_parser.add_argument('--from', dest='date_from', default=None, help='Опубликованы не раньше (YYYY-MM-DD)')
+    search_parser.add_argument('--to', dest='date_to', default=None, help='Опубликованы не позже (YYYY-MM-DD)')
+    search_parser.add_argument('--raw', action='store_true', help='Запрос в синтаксисе FTS5 MATCH без обработки')
+    rebuild_parser = subparsers.add_parser('fts-rebuild', help='Проиндексировать все статьи БД для поиска')
+    dedup_parser = subparsers.add_parser(
+        'dedup', help='Посчитать подписи MinHash для старых статей и отметить почти одинаковые'
+    )
+    dedup_urls_parser = subparsers.add_parser(
+        'dedup-urls', help='Показать повторы url в старой БД (с --apply - удалить и создать уникальный индекс)'
+    )
+    dedup_urls_parser.add_argument(
+        '--apply', action='store_true', help='Удалить повторы (остаётся самая ранняя запись) и их строки в других таблицах'
+    )
+    dates_parser = subparsers.add_parser(
+        'dates-normalize', help='Привести даты публикации сохранённых статей к ISO-8601 UTC'
+    )
+    export_parser = subparsers.add_parser(
+        'export', help='Выгрузить статьи в Parquet по сайтам и месяцам (дописываются только новые)'
+    )
+    export_parser.add_argument('--out', default=EXPORT_DIR, help=f'Каталог выгрузки (по умолчанию: {EXPORT_DIR})')
+    export_parser.add_argument('--full', action='store_true', help='Пересоздать выгрузку целиком')
+    textprep_parser = subparsers.add_parser(
+        'textprep', help='Лемматизировать тексты новых статей (кэш лемм и леммы статей в БД)'
+    )
+    textprep_parser.add_argument(
+        '--workers',
+        type=int,
+        default=TEXTPREP_WORKERS,
+        help=f'Процессов для лемматизации новых слов (по умолчанию: {TEXTPREP_WORKERS} - в текущем процессе)'
+    )
+    embed_parser = subparsers.add_parser(
+        'embed', help='Посчитать векторы новых статей (среднее векторов лемм модели Word2Vec)'
+    )
+    embed_parser.add_argument('--model', required=True, help='Файл модели Word2Vec / KeyedVectors (gensim)')
+    embed_parser.add_argument(
+        '--store', default=EMBEDDINGS_DIR, help=f'Каталог хранилища векторов (по умолчанию: {EMBEDDINGS_DIR})'
+    )
+    similar_parser = subparsers.add_parser('similar', help='Статьи, похожие на сохранённую (по векторам embed)')
+    similar_parser.add_argument('--id', dest='article_id', type=int, required=True, help='id статьи')
+    similar_parser.add_argument(
+        '--k', type=int, default=DEFAULT_SIMILAR_K, help=f'Сколько статей показать (по умолчанию: {DEFAULT_SIMILAR_K})'
+    )
+    similar_parser.add_argument(
+        '--mode',
+        choices=SIMILAR_MODES,
+        default='auto',
+        help='exact - перебор всех векторов, ivf - приближённый индекс, auto - ivf на большом корпусе'
+    )
+    similar_parser.add_argument(
+        '--store', default=EMBEDDINGS_DIR, help=f'Каталог хранилища векторов (по умолчанию: {EMBEDDINGS_DIR})'
+    )
+    topics_parser = subparsers.add_parser(
+        'topics', help='Отнести новые статьи к темам и обновить центроиды (мини-пакетный k-means)'
+    )
+    topics_parser.add_argument(
+        '--k', type=int, default=TOPICS_CLUSTERS, help=f'Число тем (по умолчанию: {TOPICS_CLUSTERS})'
+    )
+    topics_parser.add_argument('--refit', action='store_true', help='Обучить темы заново на всём корпусе')
+    topics_parser.add_argument(
+        '--store', default=EMBEDDINGS_DIR, help=f'Каталог хранилища векторов (по умолчанию: {EMBEDDINGS_DIR})'
+    )
+    for sub in (search_parser, rebuild_parser, dedup_parser, dedup_urls_parser, dates_parser, export_parser, textprep_parser,
+                embed_parser, similar_parser, topics_parser):
+        sub.add_argument('--db', type=str, default=argparse.SUPPRESS, help='Путь к файлу БД')
     
     args = parser.parse_args()
+    if args.daemon and (args.replay or args.workers > 0):
+        parser.error('--daemon нельзя сочетать с --replay и --workers')
+    if args.topics_model and not args.daemon:
+        parser.error('--topics-model используется только с --daemon (без демона: textprep, embed, topics)')
+    
+    # модули с numpy, gensim, pyarrow и pymorphy3 импортируются только своими подкомандами
+    if args.command:
+        db_path = args.db if args.db else DEFAULT_DB_PATH
+        try:
+            db_conn = init_db(db_path, require_url_unique=args.command != 'dedup-urls')
+        except RuntimeError as e:
+            sys.exit(str(e))
+        try:
+            if args.command == 'search':
+                run_search(db_conn, args)
+            elif args.command == 'dedup':
+                run_dedup(db_conn)
+            elif args.command == 'dedup-urls':
+                run_dedup_urls(db_conn, args.apply)
+            elif args.command == 'textprep':
+                from textprep import run_textprep
+                run_textprep(db_conn, args.workers)
+            elif args.command == 'embed':
+                from embeddings import run_embed
+                run_embed(db_conn, args.model, args.store)
+            elif args.command == 'topics':
+                from topics import run_topics
+                run_topics(db_conn, args.store, args.k, args.refit)
+            elif args.command == 'similar':
+                from neighbors import run_similar
+                run_similar(db_conn, args.article_id, args.k, args.mode, args.store)
+            elif args.command == 'export':
+                run_export(db_conn, args.out, args.full)
+            elif args.command == 'dates-normalize':
+                checked, changed = normalize_published_dates(db_conn)
+                print(f"Проверено дат: {checked}, приведено к UTC: {changed}")
+            else:
+                started = time.perf_counter()
+                count = rebuild_fts_index(db_conn)
+                print(f"Проиндексировано статей: {count} за {time.perf_counter() - started:.1f} с")
+        finally:
+            db_conn.close()
+        return
+    
+    if args.profile:
+        profiling.configure(args.profile_dir, args.profile)
+        print(f"Профилирование ({args.profile}): {args.profile_dir}")
+        if args.profile != 'sampling' and (args.daemon or args.concurrency > 1):
+            print("cProfile профилирует только главный поток: этапы в потоках обхода "
+                  "попадут только в выборку стеков (--profile both или sampling)")
+    
+    metrics_server = None
+    if args.metrics_port:
+        metrics_server = metrics.start_http_server(args.metrics_port)
+        print(f"Метрики: http://127.0.0.1:{args.metrics_port}/metrics")
+    
+    # в режиме воспроизведения сеть, кэш и архивирование не используются
+    replay = None
+    if args.replay:
+        replay = PageArchive(args.replay)
+        configure_replay(replay)
+        print(f"Воспроизведение из архива {args.replay}: {len(replay)} страниц")
+    else:
+        configure_cache(None if args.no_cache else args.cache_dir)
+        configure_archive(args.archive)
     
     # Инициализируем БД
     db_conn = None
     db_path = args.db if args.db else DEFAULT_DB_PATH
     if not args.dry_run:
         print(f"Инициализация БД: {db_path}")
-        db_conn = init_db(db_path)
+        try:
+            db_conn = init_db(db_path)
+        except RuntimeError as e:
+            sys.exit(str(e))
         print("БД инициализирована")
     else:
         print("Режим dry-run: данные не будут сохранены в БД")
     
-    # Конфигурация парсеров
-    parsers = {
-        'habr': HabrNewsParser(),
-        'newsvl': NewsVLParser(),
-        'ixbt': IXBTParser(),
-        'naked-science': NakedScienceParser(),
-        'interfax': InterfaxParser()
-    }
-    
-    def get_urls(site_name, max_pages):
-        config = SITES_CONFIG[site_name]
-        if site_name == 'interfax':
-            urls = []
-            today = datetime.now()
-            for i in range(max_pages):
-                date = today - timedelta(days=i)
-                urls.append(f"{config['base_url']}{date.strftime('%Y/%m/%d')}/")
-            return urls
-        urls = [config['base_url']]
-        for i in range(2, max_pages + 1):
-            urls.append(config['base_url'] + config['page_pattern'].format(i=i))
-        return urls
-    
-    
-    sites_to_parse = list(SITES_CONFIG.keys()) if args.site == 'all' else [args.site]
+    # индекс URL загружается из БД один раз и пополняется по ходу работы
+    seen_index = None
+    if db_conn and args.seen_index != 'none':
+        seen_index = build_seen_index(db_conn, args.seen_index)
+        print_seen_index_stats(seen_index)
     
-    total_saved = 0
-    for site_name in sites_to_parse:
-        if site_name not in SITES_CONFIG:
-            print(f"Неизвестный сайт: {site_name}", file=sys.stderr)
-            continue
-        
+    # парсеры только выбранных сайтов - модули остальных не импортируются
+    backend = args.parser_backend
+    sites_to_parse = site_names() if args.site == 'all' else [args.site]
+    parsers = {site_name: create_parser(site_name, backend=backend) for site_name in sites_to_parse}
+    concurrency = max(1, args.concurrency)
+    
+    if replay is not None:
+        # из архива разбираются все сохранённые страницы списков целиком
+        site_urls = {site_name: replay.urls(site_name, kind='list') for site_name in sites_to_parse}
+        max_pages = max([len(urls) for urls in site_urls.values()] + [1])
+        max_articles_per_page = sys.maxsize
+    else:
+        site_urls = {site_name: list_urls(site_name, args.pages) for site_name in sites_to_parse}
+        max_pages = args.pages
+        max_articles_per_page = args.articles_per_page
+    
+    def run_site(site_name, conn):
         print(f"\n{'='*60}")
         print(f"Парсинг сайта: {site_name}")
         print(f"{'='*60}")
         
         saved = parse_site(
             parsers[site_name],
-            get_urls(site_name, args.pages),
+            site_urls[site_name],
+            max_pages=max_pages,
+            max_articles_per_page=max_articles_per_page,
+            db_conn=conn,
+            concurrency=concurrency,
+            seen_index=seen_index,
+            site_name=site_name,
+            incremental=args.incremental,
+            refresh=args.refresh
+        )
+        print(f"\nОбработано статей ({site_name}): {saved}")
+        return saved
+    
+    def run_site_threaded(site_name):
+        # sqlite3-соединение нельзя делить между потоками - у каждого сайта своё
+        conn = init_db(db_path) if db_conn else None
+        try:
+            return run_site(site_name, conn)
+        finally:
+            if conn:
+                conn.close()
+    
+    def run_daemon_cycle(site_name, conn, stop_event):
+        # адреса списка пересчитываются на каждом обходе: у interfax они зависят от даты
+        return parse_site(
+            parsers[site_name],
+            list_urls(site_name, args.pages),
             max_pages=args.pages,
             max_articles_per_page=args.articles_per_page,
-            db_conn=db_conn
+            db_conn=conn,
+            concurrency=concurrency,
+            seen_index=seen_index,
+            site_name=site_name,
+            incremental=True,
+            refresh=args.refresh,
+            stop_event=stop_event,
+            # период опроса близок к cache_ttl: без условного запроса список часто брался бы
+            # из кэша и новые статьи находились бы только через обход
+            revalidate_lists=True
+        )
+    
+    daemon_tasks = {}
+    if args.daemon and args.topics_model and db_conn:
+        from embeddings import load_word_vectors
+        from topics import refresh_topics
+        word_vectors = load_word_vectors(args.topics_model)
+        
+        def run_topics_cycle(task_name, conn, stop_event):
+            return refresh_topics(conn, word_vectors)['assigned']
+        
+        daemon_tasks['topics'] = (run_topics_cycle, TOPICS_REFRESH_INTERVAL_SEC)
+    
+    started = time.perf_counter()
+    total_saved = 0
+    if args.daemon:
+        total_saved = run_daemon(
+            sites_to_parse, run_daemon_cycle, db_path if db_conn else None,
+            metrics_json=args.metrics_json or None, tasks=daemon_tasks
+        )
+    elif args.workers > 0:
+        total_saved = run_pipeline(
+            [(site_name, parsers[site_name], site_urls[site_name]) for site_name in sites_to_parse],
+            db_path if db_conn else None,
+            workers=args.workers,
+            max_pages=max_pages,
+            max_articles_per_page=max_articles_per_page,
+            concurrency=concurrency,
+            seen_index=seen_index,
+            backend=backend,
+            incremental=args.incremental,
+            refresh=args.refresh
         )
-        total_saved += saved
-        print(f"\nОбработано статей: {saved}")
+    elif concurrency > 1 and len(sites_to_parse) > 1:
+        with ThreadPoolExecutor(max_workers=len(sites_to_parse)) as sites_pool:
+            for saved in sites_pool.map(run_site_threaded, sites_to_parse):
+                total_saved += saved
+    else:
+        for site_name in sites_to_parse:
+            total_saved += run_site(site_name, db_conn)
+    elapsed = time.perf_counter() - started
     
     print(f"\n{'='*60}")
     print(f"Всего сохранено статей: {total_saved}")
+    print(f"Время работы: {elapsed:.1f} с (concurrency={concurrency}), "
+          f"статей в секунду: {total_saved / elapsed if elapsed > 0 else 0:.2f}")
+    if seen_index is not None:
+        print_seen_index_stats(seen_index)
+    if args.metrics_json:
+        metrics.write_summary(args.metrics_json)
+        print(f"Сводка метрик: {args.metrics_json}")
     print(f"{'='*60}")
+    if args.profile:
+        profiling.print_summary(profiling.finish())
     
+    close_sessions()
+    if metrics_server is not None:
+        metrics_server.shutdown()
+    if replay is not None:
+        replay.close()
     if db_conn:
         db_conn.close()
 
@@ -0,0 +1,261 @@
+"""
+Метрики обхода: счётчики и гистограммы с метками (сайт, тип страницы, статус...).
+Отдаются в текстовом формате Prometheus по HTTP (--metrics-port)
+и сводкой в JSON в конце запуска.
+"""
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Sequence, Tuple
+
+from config import METRICS_LATENCY_BUCKETS
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        key = tuple(str(label) for label in labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def items(self) -> List[Tuple[Tuple, float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in self.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # по меткам: [счётчики по корзинам (+Inf последней), сумма, количество, максимум]
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels, value: float):
+        key = tuple(str(label) for label in labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+            state[3] = max(state[3], value)
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - started)
+
+    def _quantile(self, counts: List[int], total: int, q: float, maximum: float) -> float:
+        """Оценка квантиля по корзинам (линейно внутри корзины)"""
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = min(self.buckets[i], maximum) if i < len(self.buckets) else maximum
+                lower = min(lower, upper)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return maximum
+
+    def items(self) -> List[Tuple[Tuple, Dict]]:
+        with self._lock:
+            values = sorted((key, (list(s[0]), s[1], s[2], s[3])) for key, s in self._values.items())
+        result = []
+        for key, (counts, total_sum, count, maximum) in values:
+            result.append((key, {
+                'count': count,
+                'sum': round(total_sum, 6),
+                'mean': round(total_sum / count, 6) if count else 0.0,
+                'p50': round(self._quantile(counts, count, 0.5, maximum), 6),
+                'p95': round(self._quantile(counts, count, 0.95, maximum), 6),
+                'max': round(maximum, 6),
+            }))
+        return result
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        lines = []
+        for key, (counts, total_sum, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total_sum:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+        self.started_at = time.time()
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        self.started_at = time.time()
+        for metric in self.metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+PAGES_FETCHED = REGISTRY.register(Counter(
+    'crawler_pages_fetched_total', 'Загруженные страницы', ('site', 'kind')))
+BYTES_FETCHED = REGISTRY.register(Counter(
+    'crawler_bytes_fetched_total', 'Прочитано байт тела ответов', ('site',)))
+HTTP_RESPONSES = REGISTRY.register(Counter(
+    'crawler_http_responses_total', 'Ответы HTTP по статусам (включая повторы)', ('site', 'status')))
+CACHE_HITS = REGISTRY.register(Counter(
+    'crawler_cache_hits_total', 'Страницы из кэша: свежие и подтверждённые 304', ('site',)))
+ARTICLES = REGISTRY.register(Counter(
+    'crawler_articles_total', 'Статьи по результату: parsed, skipped, failed, saved, duplicate, updated',
+    ('site', 'result')))
+PARSER_CPU = REGISTRY.register(Counter(
+    'crawler_parser_cpu_seconds_total', 'Процессорное время разбора страниц', ('site', 'stage')))
+FETCH_SECONDS = REGISTRY.register(Histogram(
+    'crawler_fetch_seconds', 'Время загрузки страницы из сети', ('site', 'kind')))
+PARSE_SECONDS = REGISTRY.register(Histogram(
+    'crawler_parse_seconds', 'Время разбора страницы', ('site', 'stage')))
+DB_WRITE_SECONDS = REGISTRY.register(Histogram(
+    'crawler_db_write_seconds', 'Время записи пачки статей в БД', ('site',)))
+DAEMON_CYCLES = REGISTRY.register(Counter(
+    'crawler_daemon_cycles_total', 'Обходы сайта в режиме демона: ok, error', ('site', 'result')))
+
+
+@contextmanager
+def measure_parse(site: str, stage: str):
+    """Время и процессорное время разбора (stage: list / article)"""
+    started = time.perf_counter()
+    cpu_started = time.thread_time()
+    try:
+        yield
+    finally:
+        record_parse(site, stage, time.perf_counter() - started, time.thread_time() - cpu_started)
+
+
+def record_parse(site: str, stage: str, seconds: float, cpu_seconds: float):
+    PARSE_SECONDS.observe(site, stage, value=seconds)
+    PARSER_CPU.inc(site, stage, amount=cpu_seconds)
+
+
+def summary(registry: Registry = REGISTRY) -> Dict:
+    """Сводка запуска по сайтам для JSON"""
+    sites: Dict[str, Dict] = {}
+
+    def site_entry(site: str) -> Dict:
+        return sites.setdefault(site, {
+            'pages_fetched': {}, 'bytes_fetched': 0, 'http_status': {}, 'cache_hits': 0,
+            'articles': {}, 'parser_cpu_seconds': {}, 'fetch_seconds': {}, 'parse_seconds': {},
+            'db_write_seconds': {}, 'daemon_cycles': {},
+        })
+
+    for (site, kind), value in PAGES_FETCHED.items():
+        site_entry(site)['pages_fetched'][kind] = int(value)
+    for (site,), value in BYTES_FETCHED.items():
+        site_entry(site)['bytes_fetched'] = int(value)
+    for (site, status), value in HTTP_RESPONSES.items():
+        site_entry(site)['http_status'][status] = int(value)
+    for (site,), value in CACHE_HITS.items():
+        site_entry(site)['cache_hits'] = int(value)
+    for (site, result), value in ARTICLES.items():
+        site_entry(site)['articles'][result] = int(value)
+    for (site, stage), value in PARSER_CPU.items():
+        site_entry(site)['parser_cpu_seconds'][stage] = round(value, 6)
+    for (site, kind), stats in FETCH_SECONDS.items():
+        site_entry(site)['fetch_seconds'][kind] = stats
+    for (site, stage), stats in PARSE_SECONDS.items():
+        site_entry(site)['parse_seconds'][stage] = stats
+    for (site,), stats in DB_WRITE_SECONDS.items():
+        site_entry(site)['db_write_seconds'] = stats
+    for (site, result), value in DAEMON_CYCLES.items():
+        site_entry(site)['daemon_cycles'][result] = int(value)
+
+    return {
+        'started_at': registry.started_at,
+        'duration_sec': round(time.time() - registry.started_at, 3),
+        'sites': sites,
+    }
+
+
+def write_summary(path: str, registry: Registry = REGISTRY) -> Dict:
+    data = summary(registry)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return data
+
+
+def start_http_server(port: int, host: str = '127.0.0.1', registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """Отдаёт метрики в формате Prometheus на http://host:port/metrics (в фоновом потоке)"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
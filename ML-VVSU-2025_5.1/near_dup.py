@@ -0,0 +1,226 @@
+"""
+Поиск почти одинаковых статей (одна и та же лента новостей на разных сайтах).
+У каждой статьи считается подпись MinHash по словесным шинглам. Доля совпавших
+позиций двух подписей оценивает коэффициент Жаккара их множеств шинглов.
+Подпись режется на NEAR_DUP_BANDS полос. Хэши полос оригинальных статей лежат
+в таблице article_lsh с индексом (LSH), поэтому кандидаты в дубликаты находятся
+по совпадению хотя бы одной полосы, без перебора всей таблицы. Проверяются
+NEAR_DUP_MAX_CANDIDATES кандидатов с наибольшим числом совпавших полос - все сразу,
+побитовыми операциями над склеенными подписями. Копии в индекс не добавляются,
+а ссылаются на оригинал через duplicate_of.
+"""
+import hashlib
+import re
+import struct
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from config import (
+    NEAR_DUP_SHINGLE_SIZE, NEAR_DUP_NUM_HASHES, NEAR_DUP_BANDS,
+    NEAR_DUP_THRESHOLD, NEAR_DUP_MAX_CANDIDATES
+)
+
+NUM_HASHES = NEAR_DUP_NUM_HASHES
+ROWS_PER_BAND = NUM_HASHES // NEAR_DUP_BANDS
+_BIN_BITS = NUM_HASHES.bit_length() - 1
+_VALUE_MASK = (1 << 32) - 1
+_SIGNATURE_FORMAT = f'<{NUM_HASHES}I'
+_EMPTY = _VALUE_MASK + 1
+_SIGNATURE_BYTES = 4 * NUM_HASHES
+# маски 32-битных значений подписи: младшие 31 бит и старший бит
+_LOW_BITS = b'\xff\xff\xff\x7f' * NUM_HASHES
+_HIGH_BIT = b'\x00\x00\x00\x80' * NUM_HASHES
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def shingles(text: str, size: int = NEAR_DUP_SHINGLE_SIZE) -> Set[str]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def minhash(text: Optional[str]) -> Optional[bytes]:
+    """
+    Подпись MinHash (NUM_HASHES значений по 32 бита) или None для пустого текста.
+    One permutation hashing: шингл хэшируется один раз, младшие биты хэша
+    выбирают ячейку, в ячейке хранится минимум. Пустые ячейки берут значение
+    ближайшей непустой справа (densification), чтобы подписи оставались сравнимыми.
+    """
+    features = shingles(text or '')
+    if not features:
+        return None
+    mins = [_EMPTY] * NUM_HASHES
+    for feature in features:
+        h = _hash64(feature.encode('utf-8'))
+        cell = h & (NUM_HASHES - 1)
+        value = (h >> _BIN_BITS) & _VALUE_MASK
+        if value < mins[cell]:
+            mins[cell] = value
+    if _EMPTY in mins:
+        filled = [i for i, v in enumerate(mins) if v != _EMPTY]
+        for i in range(NUM_HASHES):
+            if mins[i] == _EMPTY:
+                source = next((j for j in filled if j > i), filled[0])
+                # смещение по расстоянию, чтобы заимствованные значения не совпадали случайно
+                mins[i] = (mins[source] + (source - i) % NUM_HASHES * 0x9E3779B1) & _VALUE_MASK
+    return struct.pack(_SIGNATURE_FORMAT, *mins)
+
+
+def article_minhash(record: Dict) -> Optional[bytes]:
+    return minhash(record.get('description') or record.get('title'))
+
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Оценка коэффициента Жаккара по двум подписям"""
+    return similarities(a, [b])[0]
+
+
+def similarities(signature: bytes, others: Sequence[bytes]) -> List[float]:
+    """
+    Оценки сходства подписи с каждой из others за один проход: подписи склеиваются в одно
+    целое, XOR с повторённой подписью обнуляет совпавшие 32-битные значения, а старший бит
+    ((x & 0x7fffffff) + 0x7fffffff) | x у значения есть, только если оно ненулевое
+    """
+    if not others:
+        return []
+    n = len(others)
+    diff = int.from_bytes(b''.join(others), 'little') ^ int.from_bytes(signature * n, 'little')
+    low = int.from_bytes(_LOW_BITS * n, 'little')
+    nonzero = ((diff & low) + low) | diff
+    equal = (~nonzero & int.from_bytes(_HIGH_BIT * n, 'little')).to_bytes(n * _SIGNATURE_BYTES, 'little')
+    return [equal.count(0x80, start, start + _SIGNATURE_BYTES) / NUM_HASHES
+            for start in range(0, len(equal), _SIGNATURE_BYTES)]
+
+
+def band_keys(signature: bytes) -> List[int]:
+    """Хэши полос подписи (со знаком, как INTEGER в SQLite); номер полосы входит в хэш"""
+    step = ROWS_PER_BAND * 4
+    keys = []
+    for band in range(NEAR_DUP_BANDS):
+        h = _hash64(bytes([band]) + signature[band * step:(band + 1) * step])
+        keys.append(h - (1 << 64) if h >= 1 << 63 else h)
+    return keys
+
+
+# кандидаты - статьи с наибольшим числом совпавших полос (вероятнее всего похожие);
+# отбор только по индексу article_lsh, подписи читаются лишь у отобранных
+_CANDIDATES_SQL = f"""
+SELECT a.id, a.minhash, a.duplicate_of
+FROM (
+    SELECT article_id, COUNT(*) AS bands FROM article_lsh
+    WHERE band_key IN ({', '.join('?' * NEAR_DUP_BANDS)})
+    GROUP BY article_id ORDER BY bands DESC, article_id LIMIT {NEAR_DUP_MAX_CANDIDATES}
+) c JOIN articles a ON a.id = c.article_id
+ORDER BY c.bands DESC, a.id
+"""
+
+
+def find_near_duplicate(conn, signature: Optional[bytes], exclude_id: Optional[int] = None,
+                        threshold: float = NEAR_DUP_THRESHOLD) -> Optional[Tuple[int, float]]:
+    """
+    Самая похожая статья БД: (id исходной статьи, оценка сходства) или None.
+    Если найденная статья сама дубликат, возвращается id её оригинала.
+    """
+    if signature is None:
+        return None
+    rows = [row for row in conn.execute(_CANDIDATES_SQL, band_keys(signature))
+            if row[0] != exclude_id and row[1] is not None]
+    best = None
+    for (row_id, _, duplicate_of), score in zip(rows, similarities(signature, [row[1] for row in rows])):
+        if score < threshold:
+            continue
+        original = duplicate_of or row_id
+        if best is None or (score, -original) > (best[1], -best[0]):
+            best = (original, score)
+    return best
+
+
+def find_batch_duplicates(conn, signatures: Sequence[Optional[bytes]],
+                          threshold: float = NEAR_DUP_THRESHOLD) -> List[Tuple[Optional[int], Optional[int]]]:
+    """
+    Оригиналы для пачки новых статей (ещё не записанных): для каждой - (id оригинала в БД,
+    номер оригинала в пачке), заполнено не больше одного; (None, None) - статья сама оригинал.
+    Статья сравнивается с БД и с более ранними оригиналами пачки; при равной оценке
+    оригиналом считается статья БД - она раньше.
+    """
+    batch_bands: Dict[int, List[int]] = {}
+    found = []
+    for i, signature in enumerate(signatures):
+        if signature is None:
+            found.append((None, None))
+            continue
+        keys = band_keys(signature)
+        in_db = find_near_duplicate(conn, signature, threshold=threshold)
+        matched = Counter(j for key in keys for j in batch_bands.get(key, ()))
+        candidates = [j for j, _ in matched.most_common(NEAR_DUP_MAX_CANDIDATES)]
+        in_batch = None
+        for j, score in zip(candidates, similarities(signature, [signatures[j] for j in candidates])):
+            if score >= threshold and (in_batch is None or (score, -j) > (in_batch[1], -in_batch[0])):
+                in_batch = (j, score)
+        if in_batch is not None and (in_db is None or in_batch[1] > in_db[1]):
+            found.append((None, in_batch[0]))
+        elif in_db is not None:
+            found.append((in_db[0], None))
+        else:
+            found.append((None, None))
+            for key in keys:
+                batch_bands.setdefault(key, []).append(i)
+    return found
+
+
+def index_signature(conn, article_id: int, signature: Optional[bytes]):
+    """Добавляет полосы подписи статьи в индекс LSH"""
+    if signature is None:
+        return
+    conn.executemany(
+        "INSERT OR IGNORE INTO article_lsh (band_key, article_id) VALUES (?, ?)",
+        [(key, article_id) for key in band_keys(signature)]
+    )
+
+
+def backfill_near_duplicates(conn, batch_size: int = 1000) -> Tuple[int, int]:
+    """
+    Считает подписи статей, у которых их ещё нет, и отмечает дубликаты
+    (по порядку id: оригиналом считается более ранняя статья).
+    Тексты не удаляются. Возвращает (обработано статей, найдено дубликатов).
+    """
+    processed = duplicates = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, title, description FROM articles WHERE id > ? AND minhash IS NULL ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        with conn:
+            for row_id, title, description in rows:
+                signature = minhash(description or title)
+                found = find_near_duplicate(conn, signature, exclude_id=row_id)
+                duplicate_of = found[0] if found else None
+                conn.execute(
+                    "UPDATE articles SET minhash = ?, duplicate_of = ? WHERE id = ?",
+                    (signature, duplicate_of, row_id)
+                )
+                if duplicate_of is None:
+                    index_signature(conn, row_id, signature)
+                processed += 1
+                duplicates += duplicate_of is not None
+        last_id = rows[-1][0]
+    return processed, duplicates
+
+
+def duplicate_clusters(conn, limit: int = 20) -> List[Dict]:
+    """Крупнейшие группы дубликатов: оригинал и число копий"""
+    rows = conn.execute("""
+    SELECT o.id, o.title, o.url, COUNT(*) AS copies
+    FROM articles d JOIN articles o ON o.id = d.duplicate_of
+    GROUP BY o.id ORDER BY copies DESC LIMIT ?
+    """, (limit,)).fetchall()
+    return [{'id': r[0], 'title': r[1], 'url': r[2], 'copies': r[3]} for r in rows]
@@ -0,0 +1,276 @@
+"""
+Похожие статьи: ближайшие соседи по косинусной близости векторов из хранилища embeddings.py.
+
+Точный режим перебирает матрицу векторов блоками по NEIGHBORS_BLOCK_ROWS строк: одно матричное
+умножение на блок для всех запросов сразу, в памяти - только лучшие k на запрос.
+Приближённый режим (IVF) делит статьи на списки по ближайшему центроиду k-means
+и для запроса просматривает только NEIGHBORS_IVF_PROBES списков с ближайшими центроидами.
+
+Индекс лежит рядом с векторами и, как они, только дописывается:
+    index.json        - число проиндексированных строк, версия модели, когда обучены центроиды;
+    norms.f32         - обратные нормы векторов (нормированная матрица не хранится);
+    ivf_centroids.npy - центроиды, ivf_lists.i32 - номер списка каждой строки.
+update() добавляет строки новых статей к ближайшим центроидам; центроиды обучаются заново,
+когда корпус вырос в NEIGHBORS_IVF_RETRAIN_FACTOR раз или сменилась модель.
+Хранилище векторов индекс открывает только для чтения, а свои файлы дописывает под блокировкой
+хранилища (embeddings.store_lock).
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from embeddings import EmbeddingStore, store_lock
+from config import (
+    EMBEDDINGS_DIR, SIMILAR_MODES, DEFAULT_SIMILAR_K, NEIGHBORS_BLOCK_ROWS, NEIGHBORS_IVF_MIN_ROWS, NEIGHBORS_IVF_PROBES,
+    NEIGHBORS_KMEANS_SAMPLE, NEIGHBORS_KMEANS_ITERATIONS, NEIGHBORS_IVF_RETRAIN_FACTOR
+)
+
+try:
+    import numpy as np
+except ImportError:
+    # без numpy не откроется и EmbeddingStore - сообщение об установке выдаёт он
+    np = None
+
+INDEX_META = 'index.json'
+NORMS_FILE = 'norms.f32'
+LISTS_FILE = 'ivf_lists.i32'
+CENTROIDS_FILE = 'ivf_centroids.npy'
+MODES = SIMILAR_MODES
+KMEANS_SEED = 42
+
+
+def _inverse_norms(block: 'np.ndarray') -> 'np.ndarray':
+    norms = np.linalg.norm(block, axis=1)
+    # нулевой вектор (статья без известных модели слов) ни на что не похож
+    return np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0).astype(np.float32)
+
+
+def normalize_rows(block: 'np.ndarray') -> 'np.ndarray':
+    """Строки единичной длины (нулевые остаются нулевыми)"""
+    return block * _inverse_norms(block)[:, None]
+
+
+def _top_k(scores: 'np.ndarray', rows: 'np.ndarray', k: int) -> Tuple['np.ndarray', 'np.ndarray']:
+    """k лучших по каждой строке scores (запрос x кандидаты), по убыванию близости"""
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < scores.shape[1] else \
+        np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    best = np.take_along_axis(part, order, axis=1)
+    return np.take_along_axis(rows, best, axis=1), np.take_along_axis(scores, best, axis=1)
+
+
+def _nearest_centroid(unit_block: 'np.ndarray', centroids: 'np.ndarray') -> 'np.ndarray':
+    return np.argmax(unit_block @ centroids.T, axis=1).astype(np.int32)
+
+
+def spherical_kmeans(unit_vectors: 'np.ndarray', n_clusters: int,
+                     iterations: int = NEIGHBORS_KMEANS_ITERATIONS, seed: int = KMEANS_SEED) -> 'np.ndarray':
+    """Центроиды k-means по косинусной близости (векторы и центроиды единичной длины)"""
+    rng = np.random.default_rng(seed)
+    centroids = unit_vectors[rng.choice(len(unit_vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest_centroid(unit_vectors, centroids)
+        order = np.argsort(labels, kind='stable')
+        sizes = np.bincount(labels, minlength=n_clusters)
+        filled = sizes > 0
+        starts = (np.cumsum(sizes) - sizes)[filled]
+        # пустой кластер сохраняет прежний центроид
+        centroids[filled] = normalize_rows(np.add.reduceat(unit_vectors[order], starts, axis=0))
+    return centroids
+
+
+class NeighborIndex:
+    """Индекс ближайших соседей над EmbeddingStore"""
+
+    def __init__(self, store: EmbeddingStore):
+        self.store = store
+        meta = self._read_meta()
+        self.count: int = meta.get('count', 0)
+        self.trained_count: int = meta.get('trained_count', 0)
+        self.centroids: Optional['np.ndarray'] = None
+        self._inverted = None
+        if meta.get('model_version') != store.model_version or self.count > store.count:
+            # векторы пересчитаны под другую модель - индекс строится заново
+            self.count = self.trained_count = 0
+        elif self.trained_count:
+            self.centroids = np.load(self._file(CENTROIDS_FILE))
+        self._truncate()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.store.path, name)
+
+    def _read_meta(self) -> Dict:
+        if not os.path.exists(self._file(INDEX_META)):
+            return {}
+        with open(self._file(INDEX_META), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self):
+        meta = {
+            'count': self.count,
+            'model_version': self.store.model_version,
+            'trained_count': self.trained_count,
+            'lists': 0 if self.centroids is None else len(self.centroids),
+        }
+        path = self._file(INDEX_META)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def _truncate(self):
+        lists_rows = self.count if self.centroids is not None else 0
+        for name, size in ((NORMS_FILE, 4 * self.count), (LISTS_FILE, 4 * lists_rows)):
+            with open(self._file(name), 'ab') as f:
+                if f.tell() != size:
+                    f.truncate(size)
+
+    def _map(self, name: str, dtype) -> 'np.ndarray':
+        if self.count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode='r', shape=(self.count,))
+
+    @property
+    def inverse_norms(self) -> 'np.ndarray':
+        return self._map(NORMS_FILE, np.float32)
+
+    @property
+    def lists(self) -> 'np.ndarray':
+        return self._map(LISTS_FILE, np.int32)
+
+    def _inverted_lists(self) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Строки, упорядоченные по номеру списка, и начало каждого списка в этом порядке"""
+        if self._inverted is None:
+            lists = np.asarray(self.lists)
+            order = np.argsort(lists, kind='stable')
+            sizes = np.bincount(lists, minlength=len(self.centroids))
+            self._inverted = order, np.concatenate(([0], np.cumsum(sizes)))
+        return self._inverted
+
+    def _blocks(self, start: int, stop: int):
+        for block_start in range(start, stop, NEIGHBORS_BLOCK_ROWS):
+            block_stop = min(block_start + NEIGHBORS_BLOCK_ROWS, stop)
+            yield block_start, block_stop, np.asarray(self.store.vectors[block_start:block_stop])
+
+    def _train(self):
+        total = self.store.count
+        rng = np.random.default_rng(KMEANS_SEED)
+        sample_rows = np.sort(rng.choice(total, min(total, NEIGHBORS_KMEANS_SAMPLE), replace=False))
+        sample = normalize_rows(np.asarray(self.store.vectors[sample_rows]))
+        n_lists = max(1, min(int(np.sqrt(total)), len(sample)))
+        centroids = spherical_kmeans(sample, n_lists)
+        with open(self._file(LISTS_FILE) + '.tmp', 'wb') as f:
+            for _, _, block in self._blocks(0, self.count):
+                f.write(_nearest_centroid(normalize_rows(block), centroids).tobytes())
+        np.save(self._file(CENTROIDS_FILE), centroids)
+        os.replace(self._file(LISTS_FILE) + '.tmp', self._file(LISTS_FILE))
+        self.centroids = centroids
+        self.trained_count = total
+
+    def update(self, ivf: Optional[bool] = None) -> int:
+        """
+        Добавляет в индекс статьи, появившиеся в хранилище. ivf=None - центроиды обучаются,
+        когда статей не меньше NEIGHBORS_IVF_MIN_ROWS; True - в любом случае.
+        Возвращает число добавленных статей.
+        """
+        start, total = self.count, self.store.count
+        with open(self._file(NORMS_FILE), 'ab') as norms, open(self._file(LISTS_FILE), 'ab') as lists:
+            for _, _, block in self._blocks(start, total):
+                norms.write(_inverse_norms(block).tobytes())
+                if self.centroids is not None:
+                    lists.write(_nearest_centroid(normalize_rows(block), self.centroids).tobytes())
+        self.count = total
+        self._inverted = None
+        want_ivf = total >= NEIGHBORS_IVF_MIN_ROWS if ivf is None else ivf
+        if total and (want_ivf or self.centroids is not None) and (
+                self.centroids is None or total >= self.trained_count * NEIGHBORS_IVF_RETRAIN_FACTOR):
+            self._train()
+        self._write_meta()
+        return total - start
+
+    def _exact(self, queries: 'np.ndarray', k: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        inverse_norms = self.inverse_norms
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start, stop, block in self._blocks(0, self.count):
+            scores = (queries @ block.T) * inverse_norms[start:stop]
+            rows = np.broadcast_to(np.arange(start, stop, dtype=np.int64), scores.shape)
+            best_rows, best_scores = _top_k(
+                np.hstack([best_scores, scores]), np.hstack([best_rows, rows]), k
+            )
+        return best_rows, best_scores
+
+    def _ivf(self, queries: 'np.ndarray', k: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        probes = min(NEIGHBORS_IVF_PROBES, len(self.centroids))
+        nearest_lists = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :probes]
+        order, starts = self._inverted_lists()
+        found_rows, found_scores = [], []
+        for query, query_lists in zip(queries, nearest_lists):
+            candidates = np.sort(np.concatenate([order[starts[i]:starts[i + 1]] for i in query_lists]))
+            if len(candidates) < k:
+                rows, scores = self._exact(query[None, :], k)
+            else:
+                scores = (np.asarray(self.store.vectors[candidates]) @ query) * self.inverse_norms[candidates]
+                rows, scores = _top_k(scores[None, :], candidates[None, :], k)
+            found_rows.append(rows[0])
+            found_scores.append(scores[0])
+        return np.vstack(found_rows), np.vstack(found_scores)
+
+    def search(self, vectors: 'np.ndarray', k: int = DEFAULT_SIMILAR_K,
+               mode: str = 'auto') -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        Ближайшие статьи для каждого вектора-запроса: (id статей, косинусная близость),
+        матрицы запрос x min(k, статей в индексе), по убыванию близости
+        """
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим поиска: {mode}")
+        queries = normalize_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        if self.count == 0 or k <= 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        if mode == 'ivf' and self.centroids is None:
+            raise ValueError("Центроиды IVF не обучены: вызовите update(ivf=True)")
+        use_ivf = mode == 'ivf' or (mode == 'auto' and self.centroids is not None)
+        rows, scores = self._ivf(queries, k) if use_ivf else self._exact(queries, k)
+        return np.asarray(self.store.ids[rows.ravel()]).reshape(rows.shape), scores
+
+    def similar(self, article_id: int, k: int = DEFAULT_SIMILAR_K, mode: str = 'auto') -> List[Tuple[int, float]]:
+        """Статьи, похожие на сохранённую: [(id, близость)] без неё самой"""
+        row = self.store.rows([article_id])[0]
+        if row < 0:
+            raise KeyError(f"Нет вектора статьи {article_id}: выполните embed")
+        ids, scores = self.search(self.store.vectors[row], k + 1, mode)
+        pairs = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i != article_id]
+        return pairs[:k]
+
+
+def open_index(path: str = EMBEDDINGS_DIR, ivf: Optional[bool] = None) -> NeighborIndex:
+    """Индекс над хранилищем path, дополненный новыми статьями"""
+    store = EmbeddingStore(path, readonly=True)
+    os.makedirs(path, exist_ok=True)
+    # файлы индекса дописывают и обрезают и другие процессы similar
+    with store_lock(path):
+        index = NeighborIndex(store)
+        index.update(ivf=ivf)
+    return index
+
+
+def run_similar(conn, article_id: int, k: int = DEFAULT_SIMILAR_K, mode: str = 'auto',
+                path: str = EMBEDDINGS_DIR):
+    started = time.perf_counter()
+    index = open_index(path, ivf=True if mode == 'ivf' else None)
+    try:
+        pairs = index.similar(article_id, k, mode)
+    except KeyError as e:
+        print(e.args[0])
+        return
+    elapsed = time.perf_counter() - started
+    titles = {}
+    for neighbor_id, _ in [(article_id, 0.0)] + pairs:
+        row = conn.execute("SELECT title, url FROM articles WHERE id = ?", (neighbor_id,)).fetchone()
+        titles[neighbor_id] = row or ('', '')
+    print(f"Похожие на [{article_id}] {titles[article_id][0]} ({elapsed * 1000:.1f} мс):")
+    for neighbor_id, score in pairs:
+        title, url = titles[neighbor_id]
+        print(f"  {score:.3f}  [{neighbor_id}] {(title or '')[:60]}  {url}")
@@ -1,16 +1,42 @@
 # parser/__init__.py
-from .base import BaseParser
-from .habr import HabrNewsParser
-from .newsvl import NewsVLParser
-from .ixbt import IXBTParser
-from .nakedscience import NakedScienceParser
-from .interfax import InterfaxParser
+# Модули парсеров импортируются лениво: запуск по одному сайту грузит только его парсер
+import importlib
+
+from .registry import LazyParserClasses, site_names, site_spec, parser_class, create_parser, list_urls
+
+# Классы парсеров по именам сайтов (встроенные из SITES_CONFIG и из плагинов)
+PARSER_CLASSES = LazyParserClasses()
+
+_LAZY_ATTRS = {
+    'BaseParser': '.base',
+    'SelectorParser': '.selector',
+    'HabrNewsParser': '.habr',
+    'NewsVLParser': '.newsvl',
+    'IXBTParser': '.ixbt',
+    'NakedScienceParser': '.nakedscience',
+    'InterfaxParser': '.interfax',
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name, __name__), name)
+
 
 __all__ = [
     'BaseParser',
+    'SelectorParser',
     'HabrNewsParser',
     'NewsVLParser',
     'IXBTParser',
     'NakedScienceParser',
     'InterfaxParser',
+    'PARSER_CLASSES',
+    'site_names',
+    'site_spec',
+    'parser_class',
+    'create_parser',
+    'list_urls',
 ]
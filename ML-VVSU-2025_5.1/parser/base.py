@@ -1,28 +1,41 @@
 from abc import ABC, abstractmethod
 from typing import Dict, List, Optional
 import uuid
-import time
-from config import DEFAULT_RATE_LIMIT_PER_SEC, DEFAULT_USER_AGENTS
+from bs4 import BeautifulSoup
+from config import DEFAULT_RATE_LIMIT_PER_SEC, DEFAULT_RATE_BURST, DEFAULT_USER_AGENTS, PARSER_BACKEND
+from ratelimit import AdaptiveRateLimiter
+from .lxml_backend import LxmlSoup
 
 class BaseParser(ABC):
     """
     Базовый абстрактный класс парсера
     """
 
-    def __init__(self, rate_limit_per_sec: float = None, user_agents: Optional[List[str]] = None):
+    # CSS-селекторы бэкенда lxml, скомпилированные один раз на класс парсера
+    _compiled_selectors: Dict[str, object] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._compiled_selectors = {}
+
+    def __init__(self, rate_limit_per_sec: float = None, user_agents: Optional[List[str]] = None,
+                 backend: Optional[str] = None):
         self.rate_limit_per_sec = rate_limit_per_sec if rate_limit_per_sec is not None else DEFAULT_RATE_LIMIT_PER_SEC
-        self._last_request_ts = 0.0
+        # один парсер = один хост: лимитер общий для всех потоков загрузки сайта
+        self.rate_limiter = AdaptiveRateLimiter(self.rate_limit_per_sec, DEFAULT_RATE_BURST)
         self.user_agents = user_agents or DEFAULT_USER_AGENTS
+        self.backend = backend or PARSER_BACKEND
+        if self.backend not in ('bs4', 'lxml'):
+            raise ValueError(f"Неизвестный бэкенд парсинга: {self.backend}")
+
+    def _make_soup(self, html: str):
+        """Дерево документа: BeautifulSoup или быстрая обёртка над lxml с тем же интерфейсом"""
+        if self.backend == 'lxml':
+            return LxmlSoup(html, self._compiled_selectors)
+        return BeautifulSoup(html, 'lxml')
 
     def _wait_rate_limit(self):
-        now = time.time()
-        elapsed = now - self._last_request_ts
-        min_interval = 1.0 / max(self.rate_limit_per_sec, 1e-6)
-        if elapsed < min_interval:
-            time.sleep(min_interval - elapsed)
-
-    def _mark_request(self):
-        self._last_request_ts = time.time()
+        self.rate_limiter.acquire()
 
     @abstractmethod
     def parse_list_page(self, html: str) -> List[Dict]:
@@ -1,9 +1,9 @@
 from .base import BaseParser
-from bs4 import BeautifulSoup
 from typing import List, Dict, Optional
 from cleaner import clean_text_from_html
-import uuid
-from dateutil import parser as dtparser
+from identity import article_guid
+import profiling
+from dates import published_iso
 import re
 from config import (
     SITES_CONFIG, MIN_TEXT_LENGTH, META_KEYWORDS, ELEMENTS_TO_REMOVE,
@@ -14,7 +14,7 @@ from config import (
 class HabrNewsParser(BaseParser):
 
     def parse_list_page(self, html: str) -> List[Dict]:
-        soup = BeautifulSoup(html, 'lxml')
+        soup = self._make_soup(html)
         container = soup.select_one('.tm-articles-list')
         items = []
 
@@ -35,11 +35,8 @@ class HabrNewsParser(BaseParser):
                 # publish date
                 time_el = article.select_one("time")
                 published = None
-                if time_el and time_el.has_attr("datetime"):
-                    try:
-                        published = dtparser.isoparse(time_el["datetime"]).isoformat()
-                    except:
-                        published = time_el.get_text(strip=True)
+                if time_el:
+                    published = published_iso(time_el.get("datetime") or time_el.get_text(strip=True), 'habr')
 
                 # comments
                 comments_el = article.select_one('[data-test-id="counter-comments"] .tm-comments-counter__value')
@@ -74,7 +71,7 @@ class HabrNewsParser(BaseParser):
         return items
 
     def parse_article_page(self, html: str, meta: Dict) -> Optional[Dict]:
-        soup = BeautifulSoup(html, 'lxml')
+        soup = self._make_soup(html)
         # Ищем основной контент статьи
         body = soup.select_one('.tm-article-presenter__content') \
                or soup.select_one('.article-formatted-body') \
@@ -83,32 +80,33 @@ class HabrNewsParser(BaseParser):
         if not body:
             return None
         
-        for elem in body.select(', '.join(ELEMENTS_TO_REMOVE)):
-            elem.decompose()
+        with profiling.stage('clean'):
+            for elem in body.select(', '.join(ELEMENTS_TO_REMOVE)):
+                elem.decompose()
 
-        # извлек. текст из параграфов
-        paragraphs = []
-        seen_texts = set()
+            # извлек. текст из параграфов
+            paragraphs = []
+            seen_texts = set()
         
-        for p in body.find_all('p'):
-            text = p.get_text(separator=' ', strip=True)
-            if not text or len(text) < MIN_TEXT_LENGTH:
-                continue
+            for p in body.find_all('p'):
+                text = p.get_text(separator=' ', strip=True)
+                if not text or len(text) < MIN_TEXT_LENGTH:
+                    continue
             
-            # пропуск метаданных
-            text_lower = text.lower()
-            if any(kw in text_lower for kw in META_KEYWORDS):
-                continue
+                # пропуск метаданных
+                text_lower = text.lower()
+                if any(kw in text_lower for kw in META_KEYWORDS):
+                    continue
             
-            # дубликаты
-            normalized = re.sub(r'\s+', ' ', text).strip().lower()
-            if normalized in seen_texts:
-                continue
+                # дубликаты
+                normalized = re.sub(r'\s+', ' ', text).strip().lower()
+                if normalized in seen_texts:
+                    continue
             
-            seen_texts.add(normalized)
-            paragraphs.append(text)
+                seen_texts.add(normalized)
+                paragraphs.append(text)
         
-        description = '\n\n'.join(paragraphs)
+            description = '\n\n'.join(paragraphs)
 
         if not description or len(description.strip()) < MIN_DESCRIPTION_LENGTH:
             return None
@@ -135,7 +133,7 @@ class HabrNewsParser(BaseParser):
                     pass
 
         return {
-            "guid": str(uuid.uuid4()),
+            "guid": article_guid(meta.get("url"), meta.get("title"), description),
             "title": meta.get("title"),
             "description": description,
             "url": meta.get("url"),
@@ -1,10 +1,9 @@
 from .base import BaseParser
-from bs4 import BeautifulSoup
 from typing import List, Dict, Optional
 from cleaner import clean_text_from_html
-import uuid
-from dateutil import parser as dtparser
-from datetime import datetime
+from identity import article_guid
+import profiling
+from dates import published_iso
 import re
 from config import SITES_CONFIG, MIN_TEXT_LENGTH, ELEMENTS_TO_REMOVE, MIN_DESCRIPTION_LENGTH
 
@@ -12,7 +11,7 @@ class InterfaxParser(BaseParser):
     """Парсер для interfax.ru"""
 
     def parse_list_page(self, html: str) -> List[Dict]:
-        soup = BeautifulSoup(html, 'lxml')
+        soup = self._make_soup(html)
         container = soup.select_one('.an')
         items = []
 
@@ -47,15 +46,8 @@ class InterfaxParser(BaseParser):
                 time_elem = article_div.select_one('span')
                 published = None
                 if time_elem:
-                    time_text = time_elem.get_text(strip=True)
-                    if date_from_page and re.match(r'\d{2}:\d{2}', time_text):
-                        try:
-                            full_datetime = f"{date_from_page} {time_text}"
-                            published = dtparser.parse(full_datetime, dayfirst=False).isoformat()
-                        except:
-                            published = time_text
-                    else:
-                        published = time_text
+                    # в списке только время, дата - одна на страницу
+                    published = published_iso(time_elem.get_text(strip=True), 'interfax', base_date=date_from_page)
 
                 items.append({
                     "title": title,
@@ -71,7 +63,7 @@ class InterfaxParser(BaseParser):
         return items
 
     def parse_article_page(self, html: str, meta: Dict) -> Optional[Dict]:
-        soup = BeautifulSoup(html, 'lxml')
+        soup = self._make_soup(html)
         #  основной текст статьи 
         body = soup.select_one('.textMTitle') \
                or soup.select_one('.articleText') \
@@ -80,16 +72,17 @@ class InterfaxParser(BaseParser):
         if not body:
             return None
 
-        for elem in body.select(', '.join(ELEMENTS_TO_REMOVE)):
-            elem.decompose()
+        with profiling.stage('clean'):
+            for elem in body.select(', '.join(ELEMENTS_TO_REMOVE)):
+                elem.decompose()
 
-        paragraphs = []
-        for p in body.find_all(['p', 'div']):
-            text = p.get_text(separator=' ', strip=True)
-            if text and len(text) > MIN_TEXT_LENGTH:
-                paragraphs.append(text)
+            paragraphs = []
+            for p in body.find_all(['p', 'div']):
+                text = p.get_text(separator=' ', strip=True)
+                if text and len(text) > MIN_TEXT_LENGTH:
+                    paragraphs.append(text)
         
-        description = '\n\n'.join(paragraphs)
+            description = '\n\n'.join(paragraphs)
 
         if not description or len(description.strip()) < MIN_DESCRIPTION_LENGTH:
             return None
@@ -118,7 +111,7 @@ class InterfaxParser(BaseParser):
                         pass
 
         return {
-            "guid": str(uuid.uuid4()),
+            "guid": article_guid(meta.get("url"), meta.get("title"), description),
             "title": meta.get("title"),
             "description": description,
             "url": meta.get("url"),
@@ -1,9 +1,8 @@
 from .base import BaseParser
-from bs4 import BeautifulSoup
 from typing import List, Dict, Optional
-import uuid
-from dateutil import parser as dtparser
-from datetime import datetime
+from identity import article_guid
+import profiling
+from dates import published_iso, local_date_iso
 import re
 from config import SITES_CONFIG, MIN_TEXT_LENGTH, ELEMENTS_TO_REMOVE, MIN_TITLE_LENGTH
 
@@ -11,7 +10,7 @@ class IXBTParser(BaseParser):
     """Парсер для ixbt.games"""
 
     def parse_list_page(self, html: str) -> List[Dict]:
-        soup = BeautifulSoup(html, 'lxml')
+        soup = self._make_soup(html)
         links = soup.select('a[href*="/news/"]') or soup.select('a[href*="/article/"]')
         if not links:
             return []
@@ -35,7 +34,7 @@ class IXBTParser(BaseParser):
                 url_match = re.search(r'/(\d{4})/(\d{1,2})/(\d{1,2})/', url)
                 if url_match:
                     try:
-                        published = datetime(*map(int, url_match.groups())).isoformat()
+                        published = local_date_iso(*map(int, url_match.groups()), site='ixbt')
                     except:
                         pass
 
@@ -61,25 +60,26 @@ class IXBTParser(BaseParser):
         return items
 
     def parse_article_page(self, html: str, meta: Dict) -> Optional[Dict]:
-        soup = BeautifulSoup(html, 'lxml')
+        soup = self._make_soup(html)
         body = soup.select_one('article') or soup.select_one('[class*="article-content"]') or soup.select_one('main')
         if not body:
             return None
 
         # del лишние элементы
-        for elem in body.select(', '.join(ELEMENTS_TO_REMOVE + ['ul', 'ol'])):
-            elem.decompose()
+        with profiling.stage('clean'):
+            for elem in body.select(', '.join(ELEMENTS_TO_REMOVE + ['ul', 'ol'])):
+                elem.decompose()
 
-        # текст из параграфов
-        paragraphs = []
-        for p in body.find_all('p'):
-            if p.find_parent(['ul', 'ol']):
-                continue
-            text = p.get_text(separator=' ', strip=True)
-            if text and len(text) > MIN_TEXT_LENGTH:
-                paragraphs.append(text)
+            # текст из параграфов
+            paragraphs = []
+            for p in body.find_all('p'):
+                if p.find_parent(['ul', 'ol']):
+                    continue
+                text = p.get_text(separator=' ', strip=True)
+                if text and len(text) > MIN_TEXT_LENGTH:
+                    paragraphs.append(text)
         
-        description = '\n\n'.join(paragraphs)
+            description = '\n\n'.join(paragraphs)
         if not description or len(description.strip()) < MIN_TEXT_LENGTH:
             return None
 
@@ -121,19 +121,16 @@ class IXBTParser(BaseParser):
             url_match = re.search(r'/(\d{4})/(\d{1,2})/(\d{1,2})/', meta.get("url", ""))
             if url_match:
                 try:
-                    published_at = datetime(*map(int, url_match.groups())).isoformat()
+                    published_at = local_date_iso(*map(int, url_match.groups()), site='ixbt')
                 except:
                     pass
             if not published_at:
                 date_elem = soup.select_one('time[datetime]') or soup.select_one('[datetime]')
                 if date_elem and date_elem.has_attr('datetime'):
-                    try:
-                        published_at = dtparser.isoparse(date_elem['datetime']).isoformat()
-                    except:
-                        pass
+                    published_at = published_iso(date_elem['datetime'], 'ixbt')
 
         return {
-            "guid": str(uuid.uuid4()),
+            "guid": article_guid(meta.get("url"), meta.get("title"), description),
             "title": meta.get("title"),
             "description": description,
             "url": meta.get("url"),
@@ -0,0 +1,247 @@
+"""
+Быстрый бэкенд извлечения на lxml с интерфейсом, совместимым с BeautifulSoup
+в том объёме, который используют парсеры (select/select_one/find_all/find,
+find_parent, get_text, get/has_attr/[], decompose, string).
+Дерево строится один раз через etree.HTMLParser, CSS-селекторы компилируются
+в XPath один раз и хранятся в словаре класса парсера.
+"""
+from typing import Dict, List, Optional, Union
+import re
+import threading
+
+from lxml import etree
+
+# Строки внутри этих тегов BeautifulSoup не включает в get_text()
+_SKIP_TEXT_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+
+def compile_selector(css: str, cache: Dict[str, object]):
+    """Возвращает скомпилированный CSSSelector, кэшируя его в cache"""
+    selector = cache.get(css)
+    if selector is None:
+        try:
+            from lxml.cssselect import CSSSelector
+        except ImportError as e:
+            raise ImportError("Для бэкенда lxml нужен пакет cssselect: pip install cssselect") from e
+        selector = CSSSelector(css, translator='html')
+        cache[css] = selector
+    return selector
+
+
+def _is_element(node) -> bool:
+    # у комментариев и processing instructions tag - не строка
+    return isinstance(node.tag, str)
+
+
+def _has_text(node) -> bool:
+    return _is_element(node) and node.tag not in _SKIP_TEXT_TAGS and bool(node.text)
+
+
+def _iter_strings(root):
+    """Текстовые узлы поддерева в порядке документа, как _all_strings у bs4"""
+    if _has_text(root):
+        yield root.text
+    # обход без рекурсии: хвост узла отдаётся после всех его потомков
+    iterators = [iter(root)]
+    opened = []
+    while iterators:
+        child = next(iterators[-1], None)
+        if child is None:
+            iterators.pop()
+            if opened:
+                node = opened.pop()
+                if node.tail:
+                    yield node.tail
+            continue
+        if _has_text(child):
+            yield child.text
+        iterators.append(iter(child))
+        opened.append(child)
+
+
+def _node_string(el) -> Optional[str]:
+    """Аналог Tag.string: единственная строка-потомок или None"""
+    children = list(el)
+    if not children:
+        return el.text
+    if len(children) == 1 and not el.text and not children[0].tail:
+        child = children[0]
+        return _node_string(child) if _is_element(child) else child.text
+    return None
+
+
+def _match_name(el, names) -> bool:
+    if names is None:
+        return True
+    if isinstance(names, str):
+        return el.tag == names
+    return el.tag in names
+
+
+def _match_class(el, class_) -> bool:
+    if class_ is None:
+        return True
+    value = el.get('class')
+    if value is None:
+        return False
+    if isinstance(class_, str):
+        return class_ in value.split()
+    # как в bs4: регулярка проверяется по каждому классу и по строке целиком
+    return any(class_.search(c) for c in value.split()) or bool(class_.search(value))
+
+
+class LxmlNode:
+    __slots__ = ('el', '_selectors')
+
+    def __init__(self, el, selectors: Dict[str, object]):
+        self.el = el
+        self._selectors = selectors
+
+    def __bool__(self):
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, LxmlNode) and other.el is self.el
+
+    def __hash__(self):
+        return hash(self.el)
+
+    def _wrap(self, el) -> 'LxmlNode':
+        return LxmlNode(el, self._selectors)
+
+    def _select_iter(self, css: str):
+        # CSSSelector ищет по descendant-or-self, bs4 - только среди потомков
+        for el in compile_selector(css, self._selectors)(self.el):
+            if el is not self.el:
+                yield el
+
+    # --- поиск ---
+
+    def select(self, css: str) -> List['LxmlNode']:
+        return [self._wrap(el) for el in self._select_iter(css)]
+
+    def select_one(self, css: str) -> Optional['LxmlNode']:
+        for el in self._select_iter(css):
+            return self._wrap(el)
+        return None
+
+    def find_all(self, name: Union[str, List[str], None] = None, class_=None, string=None) -> List['LxmlNode']:
+        found = []
+        for el in self.el.iterdescendants():
+            if not _is_element(el) or not _match_name(el, name) or not _match_class(el, class_):
+                continue
+            if string is not None:
+                text = _node_string(el)
+                if text is None or not _match_string(text, string):
+                    continue
+            found.append(self._wrap(el))
+        return found
+
+    def find(self, name: Union[str, List[str], None] = None, class_=None, string=None) -> Optional['LxmlNode']:
+        for el in self.el.iterdescendants():
+            if not _is_element(el) or not _match_name(el, name) or not _match_class(el, class_):
+                continue
+            if string is not None:
+                text = _node_string(el)
+                if text is None or not _match_string(text, string):
+                    continue
+            return self._wrap(el)
+        return None
+
+    def find_parent(self, name: Union[str, List[str], None] = None, class_=None) -> Optional['LxmlNode']:
+        for el in self.el.iterancestors():
+            if _match_name(el, name) and _match_class(el, class_):
+                return self._wrap(el)
+        return None
+
+    # --- текст и атрибуты ---
+
+    def get_text(self, separator: str = '', strip: bool = False) -> str:
+        strings = _iter_strings(self.el)
+        if strip:
+            strings = (s.strip() for s in strings)
+            return separator.join(s for s in strings if s)
+        return separator.join(strings)
+
+    @property
+    def text(self) -> str:
+        return self.get_text()
+
+    @property
+    def string(self) -> Optional[str]:
+        return _node_string(self.el)
+
+    @property
+    def name(self) -> str:
+        return self.el.tag
+
+    def get(self, key: str, default=None):
+        return self.el.get(key, default)
+
+    def has_attr(self, key: str) -> bool:
+        return key in self.el.attrib
+
+    def __getitem__(self, key: str) -> str:
+        return self.el.attrib[key]
+
+    # --- изменение дерева ---
+
+    def decompose(self):
+        el = self.el
+        parent = el.getparent()
+        if parent is None:
+            return
+        if el.tail:
+            # bs4 оставляет хвостовой текст отдельной строкой; чтобы get_text
+            # не склеил его с соседним текстом, на месте узла остаётся комментарий
+            marker = etree.Comment('')
+            marker.tail = el.tail
+            parent.replace(el, marker)
+        else:
+            parent.remove(el)
+
+
+def _match_string(text: str, pattern) -> bool:
+    if isinstance(pattern, str):
+        return text == pattern
+    if isinstance(pattern, re.Pattern):
+        return pattern.search(text) is not None
+    return bool(pattern(text))
+
+
+# объект парсера lxml не стоит делить между потоками
+_local = threading.local()
+
+
+def _html_parser():
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = etree.HTMLParser(encoding='utf-8')
+    return parser
+
+
+class LxmlSoup(LxmlNode):
+    """Корень документа: поиск включает и сам элемент <html>"""
+
+    __slots__ = ()
+
+    def __init__(self, html: str, selectors: Dict[str, object]):
+        data = html.encode('utf-8') if isinstance(html, str) else html
+        root = etree.fromstring(data, _html_parser()) if data.strip() else None
+        if root is None:
+            root = etree.Element('html')
+        super().__init__(root, selectors)
+
+    def _select_iter(self, css: str):
+        return iter(compile_selector(css, self._selectors)(self.el))
+
+    def find_all(self, name=None, class_=None, string=None):
+        found = super().find_all(name, class_, string)
+        if _match_name(self.el, name) and _match_class(self.el, class_) and string is None:
+            found.insert(0, self._wrap(self.el))
+        return found
+
+    def find(self, name=None, class_=None, string=None):
+        if _match_name(self.el, name) and _match_class(self.el, class_) and string is None:
+            return self._wrap(self.el)
+        return super().find(name, class_, string)
@@ -1,9 +1,9 @@
 from .base import BaseParser
-from bs4 import BeautifulSoup
 from typing import List, Dict, Optional
 from cleaner import clean_text_from_html
-import uuid
-from dateutil import parser as dtparser
+from identity import article_guid
+import profiling
+from dates import published_iso
 import re
 from config import (
     SITES_CONFIG, MIN_TEXT_LENGTH, ELEMENTS_TO_REMOVE, ARTICLE_SELECTORS,
@@ -15,7 +15,7 @@ class NakedScienceParser(BaseParser):
     """Парсер для naked-science.ru"""
 
     def parse_list_page(self, html: str) -> List[Dict]:
-        soup = BeautifulSoup(html, 'lxml')
+        soup = self._make_soup(html)
         articles = soup.select('.news-item')
         items = []
 
@@ -40,11 +40,7 @@ class NakedScienceParser(BaseParser):
                 date_elem = article.select_one('.echo_date')
                 published = None
                 if date_elem:
-                    date_text = date_elem.get_text(strip=True)
-                    try:
-                        published = dtparser.parse(date_text, dayfirst=True, fuzzy=True).isoformat()
-                    except:
-                        published = date_text
+                    published = published_iso(date_elem.get_text(strip=True), 'naked-science')
 
                 items.append({
                     "title": title,
@@ -60,7 +56,7 @@ class NakedScienceParser(BaseParser):
         return items
 
     def parse_article_page(self, html: str, meta: Dict) -> Optional[Dict]:
-        soup = BeautifulSoup(html, 'lxml')
+        soup = self._make_soup(html)
         
         #  основной контент статьи
         body = None
@@ -73,16 +69,17 @@ class NakedScienceParser(BaseParser):
             return None
 
         # Удаляем навигацию, метаданные и рекламу
-        for elem in body.select(', '.join(ELEMENTS_TO_REMOVE + ['.ads_single', '.ads', '[class*="ads"]', '[class*="ad"]'])):
-            elem.decompose()
+        with profiling.stage('clean'):
+            for elem in body.select(', '.join(ELEMENTS_TO_REMOVE + ['.ads_single', '.ads', '[class*="ads"]', '[class*="ad"]'])):
+                elem.decompose()
         
-        paragraphs = []
-        for p in body.find_all('p'):
-            text = p.get_text(separator=' ', strip=True)
-            if text and len(text) > MIN_TEXT_LENGTH:
-                paragraphs.append(text)
+            paragraphs = []
+            for p in body.find_all('p'):
+                text = p.get_text(separator=' ', strip=True)
+                if text and len(text) > MIN_TEXT_LENGTH:
+                    paragraphs.append(text)
         
-        description = '\n\n'.join(paragraphs)
+            description = '\n\n'.join(paragraphs)
 
         if not description or len(description.strip()) < MIN_DESCRIPTION_LENGTH:
             return None
@@ -144,7 +141,7 @@ class NakedScienceParser(BaseParser):
                         pass
 
         return {
-            "guid": str(uuid.uuid4()),
+            "guid": article_guid(meta.get("url"), meta.get("title"), description),
             "title": meta.get("title"),
             "description": description,
             "url": meta.get("url"),
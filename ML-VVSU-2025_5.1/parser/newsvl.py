@@ -1,9 +1,9 @@
 from .base import BaseParser
-from bs4 import BeautifulSoup
 from typing import List, Dict, Optional
 from cleaner import clean_text_from_html
-import uuid
-from dateutil import parser as dtparser
+from identity import article_guid
+import profiling
+from dates import published_iso
 import re
 from config import SITES_CONFIG, MIN_TEXT_LENGTH, MIN_DESCRIPTION_LENGTH
 
@@ -11,7 +11,7 @@ class NewsVLParser(BaseParser):
     """Парсер для newsvl.ru"""
 
     def parse_list_page(self, html: str) -> List[Dict]:
-        soup = BeautifulSoup(html, 'lxml')
+        soup = self._make_soup(html)
         container = soup.select_one('.story-list_default') or soup.select_one('.story-list')
         items = []
 
@@ -33,11 +33,7 @@ class NewsVLParser(BaseParser):
                 date_elem = article.select_one('.story-list__item-date')
                 published = None
                 if date_elem:
-                    date_text = date_elem.get_text(strip=True)
-                    try:
-                        published = dtparser.parse(date_text, dayfirst=True, fuzzy=True).isoformat()
-                    except:
-                        published = date_text
+                    published = published_iso(date_elem.get_text(strip=True), 'newsvl')
 
                 items.append({
                     "title": title,
@@ -53,20 +49,21 @@ class NewsVLParser(BaseParser):
         return items
 
     def parse_article_page(self, html: str, meta: Dict) -> Optional[Dict]:
-        soup = BeautifulSoup(html, 'lxml')
+        soup = self._make_soup(html)
         #  основной текст статьи 
         body = soup.select_one('.story__text')
 
         if not body:
             return None
 
-        paragraphs = []
-        for p in body.find_all('p'):
-            text = p.get_text(separator=' ', strip=True)
-            if text and len(text) > MIN_TEXT_LENGTH:
-                paragraphs.append(text)
+        with profiling.stage('clean'):
+            paragraphs = []
+            for p in body.find_all('p'):
+                text = p.get_text(separator=' ', strip=True)
+                if text and len(text) > MIN_TEXT_LENGTH:
+                    paragraphs.append(text)
         
-        description = '\n\n'.join(paragraphs)
+            description = '\n\n'.join(paragraphs)
 
         if not description or len(description.strip()) < MIN_DESCRIPTION_LENGTH:
             return None
@@ -96,7 +93,7 @@ class NewsVLParser(BaseParser):
                         pass
 
         return {
-            "guid": str(uuid.uuid4()),
+            "guid": article_guid(meta.get("url"), meta.get("title"), description),
             "title": meta.get("title"),
             "description": description,
             "url": meta.get("url"),
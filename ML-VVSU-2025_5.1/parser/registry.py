@@ -0,0 +1,131 @@
+"""
+Реестр сайтов. Сайт - это декларативное описание (словарь того же вида, что записи SITES_CONFIG):
+адреса и пагинация, селекторы списка и статьи, часовой пояс и форматы дат,
+'parser' - необязательный путь "модуль:Класс" к классу с собственным кодом разбора.
+Без 'parser' сайт разбирается SelectorParser по селекторам из описания.
+
+Встроенные сайты описаны в SITES_CONFIG. Сторонние пакеты добавляют сайты через точки входа:
+    [project.entry-points."news_parser.sites"]
+    lenta = "lenta_plugin:SITE"
+Имена сайтов берутся из метаданных установленных пакетов без импорта; модуль плагина
+и модуль парсера импортируются только при первом обращении к сайту.
+"""
+import importlib
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from functools import lru_cache
+from importlib.metadata import entry_points
+from typing import Dict, List, Optional
+
+from config import SITES_CONFIG
+
+ENTRY_POINT_GROUP = 'news_parser.sites'
+PAGINATIONS = ('page', 'date')
+REQUIRED_KEYS = ('base_url', 'domain')
+
+_parser_classes: Dict[str, type] = {}
+
+
+@lru_cache(maxsize=None)
+def _plugin_entry_points() -> Dict[str, object]:
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        found = eps.select(group=ENTRY_POINT_GROUP)
+    else:
+        # Python < 3.10: entry_points() возвращает словарь групп
+        found = eps.get(ENTRY_POINT_GROUP, [])
+    return {ep.name: ep for ep in found}
+
+
+def site_names() -> List[str]:
+    """Встроенные сайты и сайты плагинов (без импорта плагинов)"""
+    names = list(SITES_CONFIG.keys())
+    names += sorted(name for name in _plugin_entry_points() if name not in SITES_CONFIG)
+    return names
+
+
+def _validate(name: str, spec: Dict):
+    missing = [key for key in REQUIRED_KEYS if not spec.get(key)]
+    if missing:
+        raise ValueError(f"В описании сайта {name} нет ключей: {', '.join(missing)}")
+    if spec.get('pagination', 'page') not in PAGINATIONS:
+        raise ValueError(f"Неизвестная пагинация сайта {name}: {spec['pagination']}")
+    if spec.get('pagination') == 'date' and not spec.get('date_pattern'):
+        raise ValueError(f"Для пагинации по датам сайту {name} нужен 'date_pattern'")
+    if 'parser' not in spec and not spec.get('list_item'):
+        raise ValueError(f"Сайту {name} нужен 'parser' или селектор 'list_item'")
+
+
+def site_spec(name: str) -> Dict:
+    """
+    Описание сайта. Описание из плагина при первом обращении загружается и добавляется
+    в SITES_CONFIG - дальше с сайтом работают как со встроенным (кэш, даты, поиск по домену).
+    """
+    spec = SITES_CONFIG.get(name)
+    if spec is not None:
+        return spec
+    entry_point = _plugin_entry_points().get(name)
+    if entry_point is None:
+        raise ValueError(f"Неизвестный сайт: {name}")
+    spec = entry_point.load()
+    if callable(spec):
+        spec = spec()
+    spec = dict(spec)
+    _validate(name, spec)
+    SITES_CONFIG[name] = spec
+    return spec
+
+
+def _import_class(path: str) -> type:
+    module_name, _, class_name = path.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def parser_class(name: str) -> type:
+    """Класс парсера сайта; модуль импортируется при первом вызове"""
+    cls = _parser_classes.get(name)
+    if cls is not None:
+        return cls
+    spec = site_spec(name)
+    from .selector import SelectorParser
+    cls = _import_class(spec['parser']) if spec.get('parser') else SelectorParser
+    if issubclass(cls, SelectorParser) and cls.site_name != name:
+        # парсер по селекторам привязывается к сайту подклассом - у него свой кэш селекторов
+        cls = type(f"{cls.__name__}[{name}]", (cls,), {'site_name': name, '__module__': cls.__module__})
+    _parser_classes[name] = cls
+    return cls
+
+
+def create_parser(name: str, **kwargs):
+    return parser_class(name)(**kwargs)
+
+
+def list_urls(name: str, max_pages: int, today: Optional[datetime] = None) -> List[str]:
+    """
+    Адреса страниц списка: 'page' - base_url и page_pattern со {i} от 2;
+    'date' - ленты за последние max_pages дней по date_pattern (strftime)
+    """
+    spec = site_spec(name)
+    base_url = spec['base_url']
+    if spec.get('pagination', 'page') == 'date':
+        today = today or datetime.now()
+        return [base_url + (today - timedelta(days=i)).strftime(spec['date_pattern']) for i in range(max_pages)]
+    urls = [base_url]
+    if spec.get('page_pattern'):
+        urls += [base_url + spec['page_pattern'].format(i=i) for i in range(2, max_pages + 1)]
+    return urls
+
+
+class LazyParserClasses(Mapping):
+    """Словарь сайт -> класс парсера, импортирующий модули парсеров по обращению"""
+
+    def __getitem__(self, name: str) -> type:
+        if name not in SITES_CONFIG and name not in _plugin_entry_points():
+            raise KeyError(name)
+        return parser_class(name)
+
+    def __iter__(self):
+        return iter(site_names())
+
+    def __len__(self) -> int:
+        return len(site_names())
@@ -0,0 +1,110 @@
+from .base import BaseParser
+import re
+from typing import List, Dict, Optional
+from urllib.parse import urljoin
+from identity import article_guid
+import profiling
+from dates import published_iso
+from config import MIN_TEXT_LENGTH, MIN_DESCRIPTION_LENGTH, MIN_TITLE_LENGTH, ELEMENTS_TO_REMOVE, ARTICLE_SELECTORS
+
+
+class SelectorParser(BaseParser):
+    """
+    Парсер по селекторам из описания сайта (parser/registry.py). Ключи описания:
+    list_item - элемент статьи в списке; list_link - ссылка в нём (по умолчанию 'a[href]');
+    list_title - заголовок (по умолчанию текст ссылки); list_date / article_date - дата в списке
+    или на странице статьи, date_attr - атрибут с датой (иначе текст элемента);
+    article_selectors - кандидаты на тело статьи (по умолчанию ARTICLE_SELECTORS[сайт]);
+    comments - элемент с числом комментариев на странице статьи.
+    Подкласс с собственным кодом (ключ 'parser') переопределяет list_item_meta или article_text.
+    """
+
+    site_name: str = ''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        from .registry import site_spec
+        self.spec = site_spec(self.site_name)
+
+    def _date(self, root, selector: Optional[str]) -> Optional[str]:
+        if not selector:
+            return None
+        el = root.select_one(selector)
+        if not el:
+            return None
+        date_attr = self.spec.get('date_attr')
+        raw = (el.get(date_attr) if date_attr else None) or el.get_text(strip=True)
+        return published_iso(raw, self.site_name)
+
+    def list_item_meta(self, item) -> Optional[Dict]:
+        link = item if item.name == 'a' else item.select_one(self.spec.get('list_link', 'a[href]'))
+        if not link or not link.get('href'):
+            return None
+        title_selector = self.spec.get('list_title')
+        title_elem = item.select_one(title_selector) if title_selector else link
+        title = title_elem.get_text(strip=True) if title_elem else ''
+        if len(title) < MIN_TITLE_LENGTH:
+            return None
+        return {
+            "title": title,
+            "url": urljoin(self.spec['domain'] + '/', link.get('href')),
+            "published_at": self._date(item, self.spec.get('list_date')),
+            "comments_count": None,
+            "rating": None
+        }
+
+    def _comments(self, soup, default: Optional[int]) -> Optional[int]:
+        selector = self.spec.get('comments')
+        el = soup.select_one(selector) if selector else None
+        numbers = re.findall(r'\d+', el.get_text(strip=True)) if el else []
+        return int(numbers[0]) if numbers else default
+
+    def parse_list_page(self, html: str) -> List[Dict]:
+        soup = self._make_soup(html)
+        items = []
+        for item in soup.select(self.spec['list_item']):
+            try:
+                meta = self.list_item_meta(item)
+            except Exception:
+                continue
+            if meta:
+                items.append(meta)
+        return items
+
+    def article_text(self, body) -> str:
+        """Текст статьи: абзацы тела без ELEMENTS_TO_REMOVE, иначе весь текст тела"""
+        for elem in body.select(', '.join(ELEMENTS_TO_REMOVE)):
+            elem.decompose()
+        paragraphs = [
+            text for text in (p.get_text(separator=' ', strip=True) for p in body.find_all('p'))
+            if len(text) > MIN_TEXT_LENGTH
+        ]
+        if paragraphs:
+            return '\n\n'.join(paragraphs)
+        return body.get_text(separator='\n', strip=True)
+
+    def parse_article_page(self, html: str, meta: Dict) -> Optional[Dict]:
+        soup = self._make_soup(html)
+        body = None
+        for selector in self.spec.get('article_selectors') or ARTICLE_SELECTORS.get(self.site_name, ['article']):
+            body = soup.select_one(selector)
+            if body:
+                break
+        if not body:
+            return None
+
+        with profiling.stage('clean'):
+            description = self.article_text(body)
+
+        if not description or len(description.strip()) < MIN_DESCRIPTION_LENGTH:
+            return None
+
+        return {
+            "guid": article_guid(meta.get("url"), meta.get("title"), description),
+            "title": meta.get("title"),
+            "description": description,
+            "url": meta.get("url"),
+            "published_at": meta.get("published_at") or self._date(soup, self.spec.get('article_date')),
+            "comments_count": self._comments(soup, meta.get("comments_count")),
+            "rating": meta.get("rating"),
+        }
@@ -0,0 +1,360 @@
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from parser import create_parser
+from db import (
+    init_db, exists_urls, BatchWriter, get_crawl_state, save_crawl_state, has_metrics, update_metrics
+)
+from http_client import fetch_page
+import metrics
+import profiling
+from config import PIPELINE_QUEUE_SIZE, PARSER_BACKEND
+
+
+def known_urls(urls: List[str], db_conn=None, seen_index=None) -> set:
+    """URL из списка, которые уже сохранены в БД"""
+    urls = [u for u in urls if u]
+    if seen_index is None:
+        return exists_urls(db_conn, urls) if db_conn else set()
+    # отрицательный ответ индекса окончателен, в БД идут только возможные совпадения
+    candidates = [u for u in urls if seen_index.might_contain(u)]
+    if seen_index.is_exact or not candidates or not db_conn:
+        return set(candidates)
+    return exists_urls(db_conn, candidates)
+
+
+# сравнивать по строке можно только даты в ISO-формате
+_ISO_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+
+def _iso_dates(articles_meta: List[Dict]) -> List[str]:
+    return [
+        m['published_at'] for m in articles_meta
+        if isinstance(m.get('published_at'), str) and _ISO_DATE_RE.match(m['published_at'])
+    ]
+
+
+class CrawlProgress:
+    """
+    Ход инкрементального обхода сайта. Заполняется загрузкой, а сохраняет его писатель
+    (save_crawl_progress) после записи статей в БД - отметка не обгоняет сохранённое.
+    """
+
+    def __init__(self, site: str):
+        self.site = site
+        self.newest_seen: Optional[str] = None
+        self.cursor: Optional[str] = None
+        # url -> published_at статей, отданных на разбор, и даты статей, которые не загрузились
+        self.yielded: Dict[str, Optional[str]] = {}
+        self.failed_dates: List[Optional[str]] = []
+        # обход дошёл до конца, а не прерван
+        self.completed = False
+
+
+def save_crawl_progress(db_conn, progress: CrawlProgress):
+    """
+    Сохраняет состояние обхода в crawl_state. Если часть статей не сохранена (ошибка загрузки
+    или разбора), отметка не поднимается выше самой ранней из них, чтобы следующий обход
+    до неё дошёл; статья без даты - отметка не меняется вовсе. Прерванный обход не сохраняется.
+    """
+    if not progress.completed:
+        return
+    stored = exists_urls(db_conn, list(progress.yielded))
+    missed = [date for url, date in progress.yielded.items() if url not in stored] + progress.failed_dates
+    mark = progress.newest_seen
+    if missed:
+        missed_iso = _iso_dates([{'published_at': date} for date in missed])
+        mark = min([mark] + missed_iso) if mark and len(missed_iso) == len(missed) else None
+    save_crawl_state(db_conn, progress.site, mark, progress.cursor)
+
+
+def iter_new_articles(
+    parser_instance,
+    list_urls: List[str],
+    max_pages: int = 1,
+    max_articles_per_page: int = 10,
+    db_conn=None,
+    concurrency: int = 1,
+    seen_index=None,
+    is_pending: Optional[Callable[[str], bool]] = None,
+    site_name: Optional[str] = None,
+    incremental: bool = False,
+    refresh: bool = False,
+    revalidate_lists: bool = False,
+    progress: Optional[CrawlProgress] = None
+) -> Iterator[Tuple[Dict, str]]:
+    """
+    Загружает страницы списка и новые статьи сайта.
+    Отдаёт пары (meta, html) в порядке страниц; разбор статей - на стороне вызывающего.
+    incremental=True: пагинация останавливается на странице, где все статьи
+    уже известны или есть статьи не новее сохранённой отметки published_at;
+    ход обхода записывается в progress - в crawl_state его сохраняет писатель (save_crawl_progress).
+    refresh=True: у уже сохранённых статей обновляются комментарии и рейтинг -
+    прямо из страницы списка, если она их содержит, иначе статья загружается заново.
+    revalidate_lists=True: страницы списка запрашиваются условным запросом даже при свежем кэше.
+    """
+    label = site_name or 'other'
+    track_state = incremental and db_conn is not None and site_name is not None
+    state = get_crawl_state(db_conn, site_name) if track_state else None
+    high_water_mark = state['newest_published_at'] if state else None
+    newest_seen = None
+    # пул потоков для загрузки статей (при concurrency=1 - последовательно)
+    pool = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+
+    def fetch_article(meta):
+        page = fetch_page(meta['url'], parser_instance=parser_instance)
+        return page.text if page else None
+
+    try:
+        for page_num, list_url in enumerate(list_urls[:max_pages], 1):
+            print(f"\nПарсинг страницы {page_num}: {list_url}")
+
+            page = fetch_page(list_url, parser_instance=parser_instance, kind='list', revalidate=revalidate_lists)
+            if not page:
+                print(f"Не удалось загрузить страницу {list_url}")
+                continue
+            # неизменившуюся страницу (свежий кэш или 304) всё равно разбираем: статьи прошлого
+            # обхода могли не сохраниться (--dry-run, ошибка загрузки, сбой до записи) -
+            # что пропустить, решает known_urls
+
+            # список статей
+            with metrics.measure_parse(label, 'list'), profiling.stage('list-parse'):
+                articles_meta = parser_instance.parse_list_page(page.text)
+            print(f"Найдено статей на странице: {len(articles_meta)}")
+
+            # Ограничиваем количество статей
+            articles_meta = articles_meta[:max_articles_per_page]
+            if progress is not None:
+                progress.cursor = list_url
+
+            # проверка exists - по индексу в памяти и одним запросом на всю страницу
+            known = known_urls([m.get('url') for m in articles_meta], db_conn, seen_index)
+
+            stop_after_page = False
+            if incremental:
+                page_dates = _iso_dates(articles_meta)
+                if page_dates:
+                    newest_seen = max([newest_seen] + page_dates) if newest_seen else max(page_dates)
+                    if progress is not None:
+                        progress.newest_seen = newest_seen
+                if articles_meta and all(m.get('url') in known for m in articles_meta if m.get('url')):
+                    print(f"Все статьи страницы уже известны - дальше не идём")
+                    stop_after_page = True
+                elif high_water_mark and page_dates and min(page_dates) <= high_water_mark:
+                    print(f"Достигнута отметка прошлого обхода ({high_water_mark}) - дальше не идём")
+                    stop_after_page = True
+
+            refetch = set()
+            if refresh and known and db_conn is not None:
+                known_metas = [m for m in articles_meta if m.get('url') in known]
+                updated = update_metrics(db_conn, [m for m in known_metas if has_metrics(m)])
+                if updated:
+                    metrics.ARTICLES.inc(label, 'updated', amount=updated)
+                    print(f"Обновлены метрики статей: {updated}")
+                refetch = {m['url'] for m in known_metas if not has_metrics(m)}
+
+            to_fetch = []
+            for i, meta in enumerate(articles_meta, 1):
+                url = meta.get('url')
+                if not url:
+                    continue
+
+                if (url in known and url not in refetch) or (is_pending and is_pending(url)):
+                    print(f"  [{i}/{len(articles_meta)}] Пропущена (уже есть): {meta.get('title', '')[:60]}")
+                    metrics.ARTICLES.inc(label, 'skipped')
+                    continue
+                to_fetch.append((i, meta))
+
+            # грузим статьи; map сохраняет порядок, загрузки идут параллельно
+            metas = [meta for _, meta in to_fetch]
+            htmls = pool.map(fetch_article, metas) if pool else map(fetch_article, metas)
+
+            for (i, meta), article_html in zip(to_fetch, htmls):
+                print(f"  [{i}/{len(articles_meta)}] Загружена: {meta.get('title', '')[:60]}")
+
+                if not article_html:
+                    print(f"    Не удалось загрузить статью")
+                    metrics.ARTICLES.inc(label, 'failed')
+                    if progress is not None:
+                        progress.failed_dates.append(meta.get('published_at'))
+                    continue
+
+                if progress is not None:
+                    progress.yielded[meta['url']] = meta.get('published_at')
+                yield meta, article_html
+
+            if stop_after_page:
+                break
+
+        if progress is not None:
+            progress.completed = True
+    finally:
+        if pool:
+            pool.shutdown(wait=True)
+
+
+# --- разбор в пуле процессов ---
+
+_worker_backend = PARSER_BACKEND
+_worker_parsers: Dict[str, object] = {}
+
+
+def _init_parse_worker(backend: str, profile_settings: Optional[Tuple[str, str]] = None):
+    global _worker_backend
+    _worker_backend = backend
+    if profile_settings is not None:
+        profiling.init_worker(*profile_settings)
+
+
+def _parse_in_worker(site_name: str, meta: Dict, html: str) -> Tuple[str, Dict, Optional[Dict], float, float]:
+    """(сайт, meta, результат разбора, время разбора, процессорное время) - метрики пишет родитель"""
+    # парсер создаётся один раз на процесс и сайт
+    parser_instance = _worker_parsers.get(site_name)
+    if parser_instance is None:
+        parser_instance = create_parser(site_name, backend=_worker_backend)
+        _worker_parsers[site_name] = parser_instance
+    started = time.perf_counter()
+    cpu_started = time.thread_time()
+    with profiling.stage('article-parse'):
+        article_data = parser_instance.parse_article_page(html, meta)
+    return site_name, meta, article_data, time.perf_counter() - started, time.thread_time() - cpu_started
+
+
+def run_pipeline(
+    site_jobs: List[Tuple[str, object, List[str]]],
+    db_path: Optional[str],
+    workers: int,
+    max_pages: int = 1,
+    max_articles_per_page: int = 10,
+    concurrency: int = 1,
+    seen_index=None,
+    backend: str = PARSER_BACKEND,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    incremental: bool = False,
+    refresh: bool = False
+) -> int:
+    """
+    Конвейер: потоки загрузки (по одному на сайт + concurrency загрузок статей)
+    кладут сырой HTML в ограниченную очередь, пул процессов разбирает статьи,
+    единственный писатель в текущем потоке сохраняет результаты в БД.
+    site_jobs - список (имя сайта, экземпляр парсера, URL страниц списка).
+    Возвращает число сохранённых (или, без БД, распарсенных) статей.
+    """
+    html_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    result_queue: "queue.Queue" = queue.Queue()
+    # ограничивает число статей между загрузкой и записью - память не растёт
+    in_flight = threading.BoundedSemaphore(queue_size)
+    done = object()
+    # ход обхода сайтов: сохраняется после записи их статей
+    progress = {}
+
+    def download(site_name, parser_instance, list_urls):
+        # у каждого потока своё соединение: sqlite3 не делится между потоками
+        conn = init_db(db_path) if db_path else None
+        if conn and incremental:
+            progress[site_name] = CrawlProgress(site_name)
+        try:
+            for meta, html in iter_new_articles(
+                parser_instance, list_urls,
+                max_pages=max_pages,
+                max_articles_per_page=max_articles_per_page,
+                db_conn=conn,
+                concurrency=concurrency,
+                seen_index=seen_index,
+                site_name=site_name,
+                incremental=incremental,
+                refresh=refresh,
+                progress=progress.get(site_name)
+            ):
+                html_queue.put((site_name, meta, html))
+        finally:
+            if conn:
+                conn.close()
+
+    def download_all():
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(site_jobs))) as downloaders:
+                for future in [downloaders.submit(download, *job) for job in site_jobs]:
+                    future.result()
+        finally:
+            html_queue.put(done)
+
+    def dispatch(pool):
+        while True:
+            item = html_queue.get()
+            if item is done:
+                break
+            in_flight.acquire()
+            future = pool.submit(_parse_in_worker, *item)
+            future.add_done_callback(result_queue.put)
+
+    db_conn = init_db(db_path) if db_path else None
+    # писатель на сайт (соединение общее) - метрики записи считаются по сайтам
+    writers = {site_name: BatchWriter(db_conn, site=site_name) for site_name, _, _ in site_jobs} if db_conn else {}
+    parsed_count = 0
+    written = False
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_parse_worker,
+                             initargs=(backend, profiling.settings())) as pool:
+        downloader = threading.Thread(target=download_all, name='downloaders', daemon=True)
+        dispatcher = threading.Thread(target=dispatch, args=(pool,), name='dispatcher', daemon=True)
+        downloader.start()
+        dispatcher.start()
+
+        def finish():
+            dispatcher.join()
+            pool.shutdown(wait=True)
+            result_queue.put(done)
+
+        threading.Thread(target=finish, name='pipeline-finish', daemon=True).start()
+
+        try:
+            while True:
+                future = result_queue.get()
+                if future is done:
+                    break
+                in_flight.release()
+                try:
+                    site_name, meta, article_data, seconds, cpu_seconds = future.result()
+                except Exception as e:
+                    print(f"    Ошибка разбора статьи: {e}")
+                    continue
+                metrics.record_parse(site_name, 'article', seconds, cpu_seconds)
+                if not article_data:
+                    print(f"    Не удалось извлечь контент: {meta.get('url')}")
+                    metrics.ARTICLES.inc(site_name, 'failed')
+                    continue
+
+                parsed_count += 1
+                metrics.ARTICLES.inc(site_name, 'parsed')
+                writer = writers.get(site_name)
+                if writer:
+                    flushed = writer.add(article_data)
+                    if seen_index is not None:
+                        seen_index.add(article_data.get('url'))
+                    if flushed:
+                        print(f"    ✓ Записано в БД: {flushed}")
+            written = True
+        finally:
+            for writer in writers.values():
+                flushed = writer.close()
+                if flushed:
+                    print(f"    ✓ Записано в БД: {flushed}")
+            # состояние обхода - только когда все статьи записаны
+            if written:
+                for site_progress in progress.values():
+                    save_crawl_progress(db_conn, site_progress)
+            duplicate_count = sum(writer.duplicate_count for writer in writers.values())
+            updated_count = sum(writer.updated_count for writer in writers.values())
+            if duplicate_count:
+                print(f"    Из них почти дубликатов других статей: {duplicate_count}")
+            if updated_count:
+                print(f"    Обновлены метрики статей: {updated_count}")
+            if db_conn:
+                db_conn.close()
+
+    return sum(writer.saved_count for writer in writers.values()) if writers else parsed_count
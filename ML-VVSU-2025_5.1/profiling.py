@@ -0,0 +1,237 @@
+"""
+Профилирование этапов обхода (--profile): fetch, list-parse, article-parse, clean, insert.
+Каждый этап оборачивается в stage(name). clean - часть parse_article_page каждого парсера
+от удаления лишних элементов из тела статьи до сбора её текста. Когда профилирование выключено, stage()
+возвращает общий пустой контекст и почти ничего не стоит.
+
+Режимы:
+- cprofile - детерминированный профилировщик: на каждый этап свой cProfile.Profile,
+  результат - <каталог>/<этап>.pstats. Вложенный этап (clean внутри article-parse)
+  профилируется отдельно - на это время профиль внешнего этапа приостанавливается.
+  Профилируется только главный поток процесса: в Python 3.12+ включённым может быть лишь
+  один профилировщик на интерпретатор. Этапы в других потоках (--concurrency > 1, несколько
+  сайтов, демон) видны только в выборке стеков;
+- sampling - фоновый поток раз в PROFILE_SAMPLE_INTERVAL_SEC снимает стеки потоков,
+  находящихся внутри этапа, и пишет <каталог>/stacks.collapsed в формате свёрнутых стеков
+  ("этап;кадр;кадр количество") для flamegraph.pl, speedscope и подобных;
+- both - оба сразу (накладные расходы cProfile попадут и в выборку).
+Процессы разбора конвейера (--workers) пишут свои файлы с pid, в конце они сливаются в общие.
+"""
+import cProfile
+import glob
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+
+from config import PROFILE_SAMPLE_INTERVAL_SEC
+
+STAGES = ('fetch', 'list-parse', 'article-parse', 'clean', 'insert')
+MODES = ('cprofile', 'sampling', 'both')
+STACKS_FILE = 'stacks.collapsed'
+
+_NULL = nullcontext()
+
+_enabled = False
+_use_cprofile = False
+_output_dir: Optional[str] = None
+_mode: Optional[str] = None
+# этап -> профиль главного потока
+_profiles: Dict[str, cProfile.Profile] = {}
+# id потока -> стек этапов [(этап, профиль)], его же читает поток выборки
+_active: Dict[int, list] = {}
+_sampler: Optional['_Sampler'] = None
+
+
+class _Stage:
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        ident = threading.get_ident()
+        stack = _active.get(ident)
+        if stack is None:
+            stack = _active.setdefault(ident, [])
+        profile = None
+        if _use_cprofile and ident == threading.main_thread().ident:
+            if stack and stack[-1][1] is not None:
+                stack[-1][1].disable()
+            profile = _profiles.get(self.name)
+            if profile is None:
+                profile = _profiles[self.name] = cProfile.Profile()
+            profile.enable()
+        stack.append((self.name, profile))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stack = _active[threading.get_ident()]
+        _, profile = stack.pop()
+        if profile is not None:
+            profile.disable()
+            if stack and stack[-1][1] is not None:
+                stack[-1][1].enable()
+        return False
+
+
+def stage(name: str):
+    """Контекст этапа; без --profile - общий пустой контекст"""
+    if not _enabled:
+        return _NULL
+    return _Stage(name)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class _Sampler(threading.Thread):
+    """Периодически снимает стеки потоков, находящихся внутри этапов"""
+
+    def __init__(self, interval: float):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, stack in list(_active.items()):
+                stages = [name for name, _ in list(stack)]
+                frame = frames.get(ident)
+                if not stages or frame is None:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.reverse()
+                self.counts[';'.join(stages + labels)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def configure(output_dir: str, mode: str = 'both', interval: float = PROFILE_SAMPLE_INTERVAL_SEC):
+    """Включает профилирование этапов; результаты пишутся в output_dir"""
+    global _enabled, _use_cprofile, _output_dir, _mode, _sampler
+    if mode not in MODES:
+        raise ValueError(f"Неизвестный режим профилирования: {mode}")
+    os.makedirs(output_dir, exist_ok=True)
+    _output_dir = output_dir
+    _mode = mode
+    # после fork процесс разбора наследует профили родителя - они ему не нужны
+    _profiles.clear()
+    _active.clear()
+    _use_cprofile = mode in ('cprofile', 'both')
+    _sampler = None
+    if mode in ('sampling', 'both'):
+        _sampler = _Sampler(interval)
+        _sampler.start()
+    _enabled = True
+
+
+def settings() -> Optional[Tuple[str, str]]:
+    """(каталог, режим) для передачи в процессы разбора или None, если выключено"""
+    return (_output_dir, _mode) if _enabled else None
+
+
+def _stop() -> Counter:
+    global _enabled
+    _enabled = False
+    counts = Counter()
+    if _sampler is not None:
+        _sampler.stop()
+        counts = _sampler.counts
+    return counts
+
+
+def _stage_stats(stage_name: str) -> Optional[pstats.Stats]:
+    profile = _profiles.get(stage_name)
+    return pstats.Stats(profile) if profile is not None else None
+
+
+def _write_stacks(path: str, counts: Counter):
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, count in sorted(counts.items()):
+            f.write(f"{stack} {count}\n")
+
+
+def _read_stacks(path: str) -> Counter:
+    counts = Counter()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                counts[stack] += int(count)
+    return counts
+
+
+def dump_worker():
+    """Пишет профиль процесса разбора в файлы с его pid (сливаются в finish)"""
+    counts = _stop()
+    pid = os.getpid()
+    for stage_name in STAGES:
+        stats = _stage_stats(stage_name)
+        if stats is not None:
+            stats.dump_stats(os.path.join(_output_dir, f"{stage_name}.{pid}.pstats"))
+    if counts:
+        _write_stacks(os.path.join(_output_dir, f"stacks.{pid}.collapsed"), counts)
+
+
+def init_worker(output_dir: str, mode: str):
+    """Профилирование в процессе разбора; файлы пишутся при завершении процесса"""
+    from multiprocessing import util
+    configure(output_dir, mode)
+    util.Finalize(None, dump_worker, exitpriority=10)
+
+
+def finish() -> List[Tuple[str, str]]:
+    """
+    Останавливает профилирование и пишет результаты, сливая файлы процессов разбора.
+    Возвращает [(этап или 'stacks', путь к файлу)].
+    """
+    if not _enabled:
+        return []
+    counts = _stop()
+    written = []
+    for stage_name in STAGES:
+        stats = _stage_stats(stage_name)
+        for path in glob.glob(os.path.join(_output_dir, f"{glob.escape(stage_name)}.*.pstats")):
+            if stats is None:
+                stats = pstats.Stats(path)
+            else:
+                stats.add(path)
+            os.remove(path)
+        if stats is not None:
+            path = os.path.join(_output_dir, f"{stage_name}.pstats")
+            stats.dump_stats(path)
+            written.append((stage_name, path))
+
+    for path in glob.glob(os.path.join(_output_dir, 'stacks.*.collapsed')):
+        counts.update(_read_stacks(path))
+        os.remove(path)
+    if counts:
+        path = os.path.join(_output_dir, STACKS_FILE)
+        _write_stacks(path, counts)
+        written.append(('stacks', path))
+    return written
+
+
+def print_summary(written: List[Tuple[str, str]], top: int = 5):
+    """Самые затратные функции каждого этапа (по собственному времени)"""
+    for stage_name, path in written:
+        if stage_name == 'stacks':
+            print(f"Свёрнутые стеки: {path}")
+            continue
+        stats = pstats.Stats(path)
+        print(f"\n{stage_name}: {stats.total_tt:.2f} с, {path}")
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+        for (filename, line, func), (_, ncalls, tottime, cumtime, _) in rows:
+            print(f"  {tottime:>8.3f} с  {ncalls:>8}  {func} ({os.path.basename(filename)}:{line})")
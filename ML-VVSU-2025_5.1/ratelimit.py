@@ -0,0 +1,173 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from config import (
+    DEFAULT_RATE_LIMIT_PER_SEC, DEFAULT_RATE_BURST, MIN_RATE_LIMIT_PER_SEC,
+    RATE_DECREASE_FACTOR, RATE_INCREASE_STEP, LATENCY_SLOWDOWN_FACTOR, LATENCY_EWMA_ALPHA,
+    RETRY_BASE_DELAY_SEC, RETRY_MAX_DELAY_SEC,
+    RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN
+)
+
+
+class TokenBucket:
+    """
+    Ведро токенов: в среднем rate запросов в секунду, всплеск до burst.
+    Токен резервируется под блокировкой (баланс может уйти в минус),
+    ждать своей очереди поток уходит уже без блокировки.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = max(rate, 1e-6)
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Забирает токен и возвращает, сколько секунд нужно подождать"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1.0
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def block_for(self, seconds: float):
+        """Никаких запросов ближайшие seconds секунд (например, по Retry-After)"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(rate, 1e-6)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Ведро токенов с подстройкой скорости (AIMD): при 429/503, ошибках и
+    росте задержки ответа скорость уменьшается в RATE_DECREASE_FACTOR раз,
+    после успешных запросов - плавно возвращается к базовой.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE_LIMIT_PER_SEC, burst: float = DEFAULT_RATE_BURST,
+                 min_rate: float = MIN_RATE_LIMIT_PER_SEC):
+        super().__init__(rate, burst)
+        self.base_rate = self.rate
+        self.min_rate = min(min_rate, self.base_rate)
+        self.latency_ewma: Optional[float] = None
+        self.latency_baseline: Optional[float] = None
+        self._last_decrease = 0.0
+
+    def _decrease(self):
+        now = time.monotonic()
+        # не чаще раза за интервал между запросами, чтобы пачка ошибок не обнулила скорость
+        if now - self._last_decrease < 1.0 / self.rate:
+            return
+        self._last_decrease = now
+        self.set_rate(max(self.min_rate, self.rate * RATE_DECREASE_FACTOR))
+
+    def record_success(self, latency: float):
+        ewma = latency if self.latency_ewma is None else \
+            LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self.latency_ewma
+        self.latency_ewma = ewma
+        if self.latency_baseline is None or ewma < self.latency_baseline:
+            self.latency_baseline = ewma
+        else:
+            # базовая задержка медленно подтягивается к текущей
+            self.latency_baseline += (ewma - self.latency_baseline) * 0.01
+        if ewma > self.latency_baseline * LATENCY_SLOWDOWN_FACTOR:
+            # сервер отвечает заметно медленнее обычного - притормаживаем
+            self._decrease()
+        elif self.rate < self.base_rate:
+            self.set_rate(min(self.base_rate, self.rate + self.base_rate * RATE_INCREASE_STEP))
+
+    def record_failure(self):
+        self._decrease()
+
+    def record_throttle(self, retry_after: Optional[float] = None):
+        """Ответ 429/503: снижаем скорость и выдерживаем Retry-After"""
+        self._decrease()
+        if retry_after:
+            self.block_for(retry_after)
+
+
+class RetryBudget:
+    """
+    Бюджет повторов хоста: не больше RETRY_BUDGET_MIN + ratio * число запросов,
+    чтобы при массовых сбоях повторы не умножали нагрузку на сайт.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_retries: int = RETRY_BUDGET_MIN):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.retries >= self.min_retries + self.ratio * self.requests:
+                return False
+            self.retries += 1
+            return True
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None,
+                  base: float = RETRY_BASE_DELAY_SEC, cap: float = RETRY_MAX_DELAY_SEC) -> float:
+    """Экспоненциальная задержка с полным джиттером; Retry-After сервера важнее"""
+    if retry_after is not None:
+        return min(retry_after, cap)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах: число секунд или HTTP-дата"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_budgets: Dict[str, RetryBudget] = {}
+_registry_lock = threading.Lock()
+
+
+def get_host_limiter(domain: str) -> AdaptiveRateLimiter:
+    """Лимитер по умолчанию для хоста, у которого нет своего парсера"""
+    with _registry_lock:
+        limiter = _limiters.get(domain)
+        if limiter is None:
+            limiter = _limiters[domain] = AdaptiveRateLimiter()
+        return limiter
+
+
+def get_retry_budget(domain: str) -> RetryBudget:
+    with _registry_lock:
+        budget = _budgets.get(domain)
+        if budget is None:
+            budget = _budgets[domain] = RetryBudget()
+        return budget
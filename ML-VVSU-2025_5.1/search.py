@@ -0,0 +1,135 @@
+import re
+import time
+from typing import Dict, List, Optional
+
+from parser import site_spec
+from config import (
+    FTS_TITLE_WEIGHT, FTS_DESCRIPTION_WEIGHT, DEFAULT_SEARCH_LIMIT
+)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_CYRILLIC_RE = re.compile(r'[а-яё]', re.IGNORECASE)
+
+# Окончания русских слов (от длинных к коротким): unicode61 не знает морфологии,
+# поэтому слово запроса обрезается до основы и ищется по префиксу
+_RU_ENDINGS = sorted("""
+    ами ями ого его ому ему ыми ими ать ять ить еть уть ешь ете ишь ите ует уют
+    ала ало али ила ило или ась ось ись ется ится ются ятся ания ение ения ией ость
+    ой ей ий ый ая яя ое ее ом ем ам ям ах ях ов ев ую юю ым им ию ья ье ьи
+    а я о е ы и у ю ь
+""".split(), key=len, reverse=True)
+MIN_STEM_LENGTH = 4
+
+
+def stem_ru(word: str) -> str:
+    """Грубая основа русского слова: отбрасывает окончание, если остаётся >= MIN_STEM_LENGTH букв"""
+    for ending in _RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def build_match_query(query: str) -> str:
+    """
+    Строка запроса пользователя -> выражение MATCH для FTS5.
+    Все слова обязательны; русские слова ищутся по основе (префиксный запрос),
+    поэтому «статьи» находит и «статья», и «статей».
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(query.lower()):
+        if _CYRILLIC_RE.search(token) and len(token) >= MIN_STEM_LENGTH:
+            terms.append(f'"{stem_ru(token)}"*')
+        else:
+            terms.append(f'"{token}"')
+    return ' AND '.join(terms)
+
+
+def search_articles(
+    conn,
+    query: str,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    site: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    raw: bool = False
+) -> List[Dict]:
+    """
+    Топ-limit статей по релевантности BM25 (заголовок весит больше текста).
+    site - имя сайта из реестра (фильтр по домену в url),
+    date_from/date_to - границы published_at в ISO-формате (включительно).
+    raw=True - query передаётся в FTS5 как есть (синтаксис MATCH).
+    """
+    match = query if raw else build_match_query(query)
+    if not match:
+        return []
+    # топ-k считается только по индексу FTS; статьи и сниппеты - для k найденных
+    filters = []
+    params: list = [FTS_TITLE_WEIGHT, FTS_DESCRIPTION_WEIGHT, match]
+    if site is not None:
+        # диапазон по url вместо LIKE: домен сайта - префикс url статьи
+        domain = site_spec(site)['domain']
+        filters.append("a.url >= ? AND a.url < ?")
+        params += [domain, domain + '\U0010ffff']
+    if date_from:
+        filters.append("a.published_at >= ?")
+        params.append(date_from)
+    if date_to:
+        # '~' больше цифр и разделителей ISO: дата без времени включает весь день
+        filters.append("a.published_at <= ?")
+        params.append(date_to + '~')
+    params += [limit, match]
+
+    join = "JOIN articles a ON a.id = articles_fts.rowid" if filters else ""
+    where = "".join(f" AND {f}" for f in filters)
+    sql = f"""
+    WITH top AS (
+        SELECT articles_fts.rowid AS id, bm25(articles_fts, ?, ?) AS score
+        FROM articles_fts {join}
+        WHERE articles_fts MATCH ?{where}
+        ORDER BY score LIMIT ?
+    )
+    SELECT a.id, a.title, a.url, a.published_at, top.score,
+           snippet(articles_fts, 1, '[', ']', '…', 16) AS snippet
+    FROM top
+    JOIN articles a ON a.id = top.id
+    JOIN articles_fts ON articles_fts.rowid = top.id
+    WHERE articles_fts MATCH ?
+    ORDER BY top.score
+    """
+    rows = conn.execute(sql, params).fetchall()
+    return [
+        {'id': r[0], 'title': r[1], 'url': r[2], 'published_at': r[3], 'score': r[4], 'snippet': r[5]}
+        for r in rows
+    ]
+
+
+def rebuild_fts_index(conn) -> int:
+    """Переиндексирует все статьи (для БД, созданных до появления FTS) и сжимает индекс"""
+    with conn:
+        conn.execute("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO articles_fts(articles_fts) VALUES ('optimize')")
+    return conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+
+def print_search_results(results: List[Dict], elapsed: float):
+    print(f"Найдено: {len(results)} ({elapsed * 1000:.1f} мс)")
+    for i, r in enumerate(results, 1):
+        print(f"\n{i}. {r['title']}  [{r['score']:.2f}]")
+        print(f"   {r['url']}")
+        if r['published_at']:
+            print(f"   {r['published_at']}")
+        if r['snippet']:
+            print(f"   {r['snippet']}")
+
+
+def run_search(conn, args):
+    started = time.perf_counter()
+    results = search_articles(
+        conn, args.query,
+        limit=args.limit,
+        site=args.site,
+        date_from=args.date_from,
+        date_to=args.date_to,
+        raw=args.raw
+    )
+    print_search_results(results, time.perf_counter() - started)
@@ -0,0 +1,125 @@
+import hashlib
+import math
+import sys
+import threading
+from typing import Dict, Iterable, Set
+
+from config import SEEN_INDEX_KIND, SEEN_INDEX_CAPACITY, SEEN_INDEX_FP_RATE
+
+
+def _url_digest(url: str) -> bytes:
+    return hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+
+
+class SeenUrlIndex:
+    """
+    Индекс уже сохранённых URL в памяти.
+    kind='hashset' - множество 64-битных хэшей URL (ложные срабатывания
+    практически исключены, положительный ответ считается окончательным);
+    kind='bloom' - фильтр Блума заданной ёмкости и вероятности ошибки,
+    положительный ответ нужно подтвердить запросом к БД.
+    Отрицательный ответ в обоих режимах означает, что URL точно новый.
+    """
+
+    def __init__(self, kind: str = SEEN_INDEX_KIND, capacity: int = SEEN_INDEX_CAPACITY,
+                 fp_rate: float = SEEN_INDEX_FP_RATE):
+        if kind not in ('hashset', 'bloom'):
+            raise ValueError(f"Неизвестный тип индекса URL: {kind}")
+        self.kind = kind
+        self.capacity = max(int(capacity), 1)
+        self.fp_rate = fp_rate
+        self.count = 0
+        self.lookups = 0
+        self.positives = 0
+        self._lock = threading.Lock()
+        self._hashes: Set[int] = set()
+        if kind == 'bloom':
+            # m = -n ln p / (ln 2)^2, k = m/n ln 2
+            self.num_bits = max(8, int(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+            self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+            self._bits = bytearray((self.num_bits + 7) // 8)
+
+    @property
+    def is_exact(self) -> bool:
+        """Положительный ответ не требует проверки в БД"""
+        return self.kind == 'hashset'
+
+    def _bit_positions(self, digest: bytes):
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, url: str):
+        if not url:
+            return
+        digest = _url_digest(url)
+        with self._lock:
+            if self.kind == 'hashset':
+                h = int.from_bytes(digest[:8], 'little')
+                if h in self._hashes:
+                    return
+                self._hashes.add(h)
+            else:
+                for pos in self._bit_positions(digest):
+                    self._bits[pos >> 3] |= 1 << (pos & 7)
+            self.count += 1
+
+    def update(self, urls: Iterable[str]):
+        for url in urls:
+            self.add(url)
+
+    def might_contain(self, url: str) -> bool:
+        digest = _url_digest(url)
+        if self.kind == 'hashset':
+            found = int.from_bytes(digest[:8], 'little') in self._hashes
+        else:
+            found = all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._bit_positions(digest))
+        self.lookups += 1
+        if found:
+            self.positives += 1
+        return found
+
+    def __contains__(self, url: str) -> bool:
+        return self.might_contain(url)
+
+    def load_from_db(self, conn):
+        """Заполняет индекс всеми URL из таблицы articles (потоково)"""
+        cur = conn.cursor()
+        cur.execute("SELECT url FROM articles WHERE url IS NOT NULL")
+        while True:
+            rows = cur.fetchmany(10000)
+            if not rows:
+                break
+            for (url,) in rows:
+                self.add(url)
+        return self
+
+    def memory_bytes(self) -> int:
+        if self.kind == 'hashset':
+            # сама таблица множества + объекты int (по 32 байта на 64-битное число)
+            return sys.getsizeof(self._hashes) + 32 * len(self._hashes)
+        return sys.getsizeof(self._bits)
+
+    def expected_fp_rate(self) -> float:
+        """Оценка вероятности ложного срабатывания при текущем заполнении"""
+        if self.kind == 'hashset':
+            return self.count / 2.0 ** 64
+        n = max(self.count, 1)
+        return (1 - math.exp(-self.num_hashes * n / self.num_bits)) ** self.num_hashes
+
+    def stats(self) -> Dict:
+        return {
+            'kind': self.kind,
+            'count': self.count,
+            'memory_bytes': self.memory_bytes(),
+            'expected_fp_rate': self.expected_fp_rate(),
+            'lookups': self.lookups,
+            'positives': self.positives,
+        }
+
+
+def build_seen_index(conn, kind: str = SEEN_INDEX_KIND) -> SeenUrlIndex:
+    """Создаёт индекс по БД; ёмкость фильтра Блума берётся с запасом от числа строк"""
+    rows = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    capacity = max(SEEN_INDEX_CAPACITY, rows * 2)
+    return SeenUrlIndex(kind=kind, capacity=capacity).load_from_db(conn)
@@ -0,0 +1,26 @@
+"""
+Сайт и домен по URL - по SITES_CONFIG. Модуль лёгкий (только config), поэтому его
+импортируют и http_client, и модули без сети (dates, export).
+"""
+from typing import Optional
+from urllib.parse import urlparse
+
+from config import SITES_CONFIG
+
+
+def domain_for_url(url: str) -> str:
+    """Возвращает домен из SITES_CONFIG, к которому относится url (или scheme://host)"""
+    parsed = urlparse(url)
+    for config in SITES_CONFIG.values():
+        if urlparse(config['domain']).netloc == parsed.netloc:
+            return config['domain']
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def site_for_url(url: str) -> Optional[str]:
+    """Имя сайта из SITES_CONFIG, к которому относится url"""
+    netloc = urlparse(url).netloc
+    for site_name, config in SITES_CONFIG.items():
+        if urlparse(config['domain']).netloc == netloc:
+            return site_name
+    return None
@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import dates
+from dates import published_iso
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('2025-11-09T10:18:00Z', '2025-11-09T10:18:00+00:00'),
+    ('2025-11-09T10:18:00+0300', '2025-11-09T07:18:00+00:00'),
+    ('2025-11-09T10:18:00.5+03:00', '2025-11-09T07:18:00.500000+00:00'),
+    ('2025-11-09T10:18:00.123456789z', '2025-11-09T10:18:00.123456+00:00'),
+])
+def test_iso_variants(text, expected):
+    assert published_iso(text, 'habr') == expected
+
+
+# 2025-03-09 22:30 UTC: по Москве уже 10 марта, во Владивостоке 10 марта 08:30
+NOW = datetime(2025, 3, 9, 22, 30, tzinfo=timezone.utc)
+
+
+class _FixedDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW.astimezone(tz) if tz else NOW.replace(tzinfo=None)
+
+
+@pytest.fixture
+def fixed_now(monkeypatch):
+    monkeypatch.setattr(dates, 'datetime', _FixedDatetime)
+
+
+@pytest.mark.parametrize('text, site, base_date, expected', [
+    # названия месяцев, без года - ближайшая прошедшая дата по времени сайта
+    ('1 ноября 2024, 10:00', 'habr', None, '2024-11-01T07:00:00+00:00'),
+    ('5 марта 2025 г. в 14:05', 'habr', None, '2025-03-05T11:05:00+00:00'),
+    ('10 мар', 'habr', None, '2025-03-09T21:00:00+00:00'),
+    ('15 декабря', 'habr', None, '2024-12-14T21:00:00+00:00'),
+    ('1 Jan 2025', 'habr', None, '2024-12-31T21:00:00+00:00'),
+    # сегодня/вчера - по дате сайта, а не UTC
+    ('сегодня, 00:15', 'habr', None, '2025-03-09T21:15:00+00:00'),
+    ('вчера в 23:50', 'habr', None, '2025-03-09T20:50:00+00:00'),
+    ('вчера, 10:00', 'newsvl', None, '2025-03-09T00:00:00+00:00'),
+    # N ... назад - от текущего момента
+    ('5 минут назад', 'habr', None, '2025-03-09T22:25:00+00:00'),
+    ('2 часа назад', 'newsvl', None, '2025-03-09T20:30:00+00:00'),
+    ('1 день назад', 'habr', None, '2025-03-08T22:30:00+00:00'),
+    # ДД.ММ.ГГГГ
+    ('09.03.2025', 'habr', None, '2025-03-08T21:00:00+00:00'),
+    ('09.03.2025 18:45', 'newsvl', None, '2025-03-09T08:45:00+00:00'),
+    ('1/2/25', 'habr', None, '2025-01-31T21:00:00+00:00'),
+    ('31.02.2025', 'habr', None, None),
+    # interfax отдаёт только время, дата - со страницы списка
+    ('10:15', 'interfax', '2025-03-08', '2025-03-08T07:15:00+00:00'),
+    # дата без пояса - местное время сайта (utc_offset_hours), с поясом - как есть
+    ('2025-03-09 12:00', 'habr', None, '2025-03-09T09:00:00+00:00'),
+    ('2025-03-09 12:00', 'newsvl', None, '2025-03-09T02:00:00+00:00'),
+    ('2025-03-09T12:00:00+05:00', 'newsvl', None, '2025-03-09T07:00:00+00:00'),
+])
+def test_formats_with_fixed_today(fixed_now, text, site, base_date, expected):
+    assert published_iso(text, site, base_date) == expected
@@ -0,0 +1,62 @@
+import pytest
+
+from db import init_db, duplicate_url_report, remove_duplicate_urls
+from near_dup import band_keys, minhash, index_signature
+
+TEXT = 'Правительство утвердило новые правила работы такси в крупных городах страны'
+
+
+def _old_db(path):
+    """
+    БД до уникального индекса по url: у статьи 1 две копии, у статьи 4 - одна,
+    и статья 4 отмечена почти дубликатом своей копии 5
+    """
+    conn = init_db(path)
+    signature = minhash(TEXT)
+    with conn:
+        conn.execute("DROP INDEX idx_url_unique")
+        rows = [(1, 'u1', None), (2, 'u1', 1), (3, 'u1', None), (4, 'u4', 5), (5, 'u4', None),
+                (6, 'u6', 3)]
+        for article_id, url, duplicate_of in rows:
+            conn.execute("INSERT INTO articles (id, guid, title, url, minhash, duplicate_of) VALUES (?, ?, ?, ?, ?, ?)",
+                         (article_id, f'g{article_id}', TEXT, url, signature, duplicate_of))
+        for article_id in (1, 3, 5):
+            index_signature(conn, article_id, signature)
+        for article_id in (1, 3, 4, 5):
+            conn.execute("INSERT INTO article_tokens (article_id, tokens) VALUES (?, 'такси')", (article_id,))
+            conn.execute("INSERT INTO article_topics (article_id, topic, distance) VALUES (?, 0, 0.1)", (article_id,))
+    conn.close()
+
+
+def test_init_db_refuses_duplicate_urls_without_deleting(tmp_path):
+    path = str(tmp_path / 'old.sqlite')
+    _old_db(path)
+    with pytest.raises(RuntimeError, match='dedup-urls'):
+        init_db(path)
+    conn = init_db(path, require_url_unique=False)
+    assert conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0] == 6
+    report = duplicate_url_report(conn)
+    assert report == {'articles': 3, 'urls': 2, 'duplicate_of': 2,
+                      'article_lsh': 2 * len(band_keys(minhash(TEXT))), 'article_tokens': 2, 'article_topics': 2}
+    # отчёт ничего не меняет
+    assert conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0] == 6
+    conn.close()
+
+
+def test_remove_duplicate_urls_cleans_dependent_rows(tmp_path):
+    path = str(tmp_path / 'old.sqlite')
+    _old_db(path)
+    conn = init_db(path, require_url_unique=False)
+    assert remove_duplicate_urls(conn)['articles'] == 3
+    conn.close()
+
+    conn = init_db(path)
+    assert [row[0] for row in conn.execute("SELECT id FROM articles ORDER BY id")] == [1, 4, 6]
+    for table in ('article_lsh', 'article_tokens', 'article_topics'):
+        assert {row[0] for row in conn.execute(f"SELECT DISTINCT article_id FROM {table}")} == {1, 4}
+    # ссылка на удалённую копию перенесена на оставшуюся запись того же url
+    assert conn.execute("SELECT duplicate_of FROM articles WHERE id = 6").fetchone()[0] == 1
+    # статья 4 была копией удалённой 5 и стала оригиналом: её полосы в индексе LSH
+    assert conn.execute("SELECT duplicate_of FROM articles WHERE id = 4").fetchone()[0] is None
+    assert conn.execute("SELECT COUNT(*) FROM articles_fts WHERE articles_fts MATCH 'такси'").fetchone()[0] == 3
+    conn.close()
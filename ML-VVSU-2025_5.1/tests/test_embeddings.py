@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pytest
+
+from embeddings import EmbeddingStore, IDS_FILE, VECTORS_FILE
+
+
+def _vectors(n, dim=4, start=0):
+    return np.arange(start * dim, (start + n) * dim, dtype=np.float32).reshape(n, dim)
+
+
+def test_reader_does_not_truncate_rows_being_appended(tmp_path):
+    path = str(tmp_path)
+    writer = EmbeddingStore(path)
+    writer.reset(4, 'v1')
+    writer.append([1, 2], _vectors(2))
+    # дозапись в процессе: данные уже в файлах, meta.json ещё не обновлён
+    with open(os.path.join(path, VECTORS_FILE), 'ab') as f:
+        f.write(_vectors(1, start=2).tobytes())
+    with open(os.path.join(path, IDS_FILE), 'ab') as f:
+        f.write(np.int64(3).tobytes())
+
+    reader = EmbeddingStore(path, readonly=True)
+    assert reader.count == 2 and reader.ids.tolist() == [1, 2]
+    assert os.path.getsize(os.path.join(path, IDS_FILE)) == 3 * 8
+    with pytest.raises(ValueError):
+        reader.append([3], _vectors(1))
+
+
+def test_concurrent_writers_skip_stored_rows(tmp_path):
+    path = str(tmp_path)
+    first = EmbeddingStore(path)
+    first.reset(4, 'v1')
+    second = EmbeddingStore(path)
+    first.append([1, 2], _vectors(2))
+    second.append([2, 3], _vectors(2, start=1))
+    assert EmbeddingStore(path, readonly=True).ids.tolist() == [1, 2, 3]
+
+    # читатель, открытый до пересчёта, видит прежние строки
+    reader = EmbeddingStore(path, readonly=True)
+    first.reset(4, 'v2')
+    assert reader.vectors.shape == (3, 4) and float(reader.vectors[2, 0]) == 8.0
+    with pytest.raises(ValueError):
+        second.append([4], _vectors(1))
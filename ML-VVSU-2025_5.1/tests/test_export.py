@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+import export
+from db import init_db
+from export import STATE_FILE, export_articles, read_articles
+
+ARTICLES = [
+    ('https://habr.com/ru/articles/1/', '2025-11-01T07:30:00+00:00', 5),
+    ('https://habr.com/ru/articles/2/', '2025-12-02T10:00:00+00:00', None),
+    ('https://www.newsvl.ru/vlad/2025/11/03/3/', '2025-11-03T01:00:00+00:00', 0),
+    ('https://example.com/4', '2025-11-04T00:00:00+00:00', None),
+    ('https://habr.com/ru/articles/5/', None, 12),
+]
+
+
+def _insert(conn, articles, first_id=1):
+    with conn:
+        for i, (url, published_at, comments) in enumerate(articles, first_id):
+            conn.execute(
+                "INSERT INTO articles (id, guid, title, description, url, published_at, comments_count, "
+                "created_at_utc) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (i, f'g{i}', f'Статья {i}', 'текст', url, published_at, comments, 1760000000 + i)
+            )
+
+
+def _files(out_dir, suffix='.parquet'):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), out_dir)
+        for root, _, names in os.walk(out_dir) for name in names if name.endswith(suffix)
+    )
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = init_db(str(tmp_path / 'a.sqlite'))
+    _insert(conn, ARTICLES)
+    yield conn
+    conn.close()
+
+
+def test_partitions_and_types(conn, tmp_path):
+    out_dir = str(tmp_path / 'export')
+    assert export_articles(conn, out_dir, batch_rows=2) == {'rows': 5, 'files': 5, 'last_id': 5}
+    assert _files(out_dir) == [
+        os.path.join('site=habr', 'month=2025-11', 'part-000000000001.parquet'),
+        os.path.join('site=habr', 'month=2025-12', 'part-000000000002.parquet'),
+        os.path.join('site=habr', 'month=unknown', 'part-000000000005.parquet'),
+        os.path.join('site=newsvl', 'month=2025-11', 'part-000000000003.parquet'),
+        os.path.join('site=other', 'month=2025-11', 'part-000000000004.parquet'),
+    ]
+    schema = pq.read_schema(os.path.join(out_dir, _files(out_dir)[0]))
+    assert schema.field('id').type == pa.int64()
+    assert schema.field('published_at').type == pa.timestamp('us', tz='UTC')
+    # в Parquet нет секундной точности - created_at_utc хранится в миллисекундах
+    assert schema.field('created_at_utc').type == pa.timestamp('ms', tz='UTC')
+    assert schema.field('comments_count').type == pa.int32()
+    assert 'minhash' not in schema.names
+
+    frame = read_articles(out_dir, columns=['id', 'comments_count', 'published_at', 'created_at_utc'], site='habr')
+    assert sorted(frame['id']) == [1, 2, 5]
+    row = frame.set_index('id').loc[1]
+    assert row['comments_count'] == 5 and row['published_at'].isoformat() == '2025-11-01T07:30:00+00:00'
+    assert row['created_at_utc'].timestamp() == 1760000001
+
+
+def test_incremental_export_appends_new_ids(conn, tmp_path):
+    out_dir = str(tmp_path / 'export')
+    export_articles(conn, out_dir)
+    _insert(conn, [('https://habr.com/ru/articles/6/', '2025-11-20T00:00:00+00:00', 1)], first_id=6)
+    assert export_articles(conn, out_dir) == {'rows': 1, 'files': 1, 'last_id': 6}
+    # новый файл рядом с прежним в том же разделе
+    assert sorted(os.listdir(os.path.join(out_dir, 'site=habr', 'month=2025-11'))) == [
+        'part-000000000001.parquet', 'part-000000000006.parquet'
+    ]
+    assert export_articles(conn, out_dir) == {'rows': 0, 'files': 0, 'last_id': 6}
+    assert sorted(read_articles(out_dir, columns=['id'])['id']) == [1, 2, 3, 4, 5, 6]
+
+    assert export_articles(conn, out_dir, full=True)['rows'] == 6
+    assert len(_files(out_dir)) == 5
+
+
+def test_aborted_export_leaves_no_tmp_files(conn, tmp_path, monkeypatch):
+    out_dir = str(tmp_path / 'export')
+    export_articles(conn, out_dir)
+    state = open(os.path.join(out_dir, STATE_FILE)).read()
+    _insert(conn, [(f'https://habr.com/ru/articles/{i}/', '2026-01-05T00:00:00+00:00', None)
+                   for i in range(6, 10)], first_id=6)
+
+    export_row = export._export_row
+
+    def fail_on_last(row):
+        if row[0] == 9:
+            raise RuntimeError('сбой')
+        return export_row(row)
+
+    monkeypatch.setattr(export, '_export_row', fail_on_last)
+    # первые статьи уже в .tmp раздела, когда выгрузка обрывается
+    with pytest.raises(RuntimeError):
+        export_articles(conn, out_dir, batch_rows=1)
+    assert _files(out_dir, '.tmp') == [] and len(_files(out_dir)) == 5
+    assert open(os.path.join(out_dir, STATE_FILE)).read() == state
+    monkeypatch.undo()
+
+    # недописанный файл процесса, убитого до очистки, удаляется следующей выгрузкой
+    stray = os.path.join(out_dir, 'site=habr', 'month=2026-02')
+    os.makedirs(stray)
+    open(os.path.join(stray, 'part-000000000099.parquet.tmp'), 'wb').close()
+    assert export_articles(conn, out_dir)['rows'] == 4
+    assert _files(out_dir, '.tmp') == [] and not os.path.exists(stray)
+    assert sorted(read_articles(out_dir, columns=['id'])['id']) == list(range(1, 10))
@@ -0,0 +1,88 @@
+import pytest
+
+from html_stream import ContainerEndDetector, decode_html, read_body
+
+# начало страницы длиннее 4096 байт: открывающий тег контейнера находит повторный просмотр;
+# разметка - ASCII, текст - UTF-8, как на сайтах
+HEAD = ('<html><head><title>Список</title>' + '<script>var x = 1;</script>\n' * 200 + '</head><body>').encode()
+ITEMS = ''.join(
+    f'<div class="item"><DIV class="title">Статья {i}</DIV><divider/><div>текст</div></div>\n'
+    for i in range(30)
+).encode()
+CONTAINER = b'<div id="list" class="list articles" data-x="1">\n' + ITEMS + b'<div class="articles-footer"></div>'
+TAIL = ('<footer>' + '<p>подвал</p>' * 60 + '</footer></body></html>').encode()
+
+
+def _page(closing=b'</div>'):
+    data = HEAD + CONTAINER + closing + TAIL
+    return data, len(HEAD + CONTAINER + closing)
+
+
+def _feed_in_chunks(detector, data, size):
+    body = bytearray()
+    for start in range(0, len(data), size):
+        body += data[start:start + size]
+        end = detector.feed(body)
+        if end is not None:
+            return end
+    return None
+
+
+@pytest.mark.parametrize('size', [1, 7, 4096])
+def test_cut_right_after_container_closing_tag(size):
+    data, expected = _page()
+    assert len(TAIL) > 256 and len(HEAD) > 4096
+    assert _feed_in_chunks(ContainerEndDetector('articles'), data, size) == expected
+
+
+@pytest.mark.parametrize('size', [1, 7, 4096])
+def test_closing_tag_split_across_chunks(size):
+    # '>' закрывающего тега дальше 256 байт хвоста: тег разбирается в два приёма
+    data, expected = _page(b'</div' + b' ' * 300 + b'>')
+    assert _feed_in_chunks(ContainerEndDetector('articles'), data, size) == expected
+
+
+def test_container_not_closed_within_last_256_bytes():
+    data, _ = _page()
+    # конец контейнера в последних 256 байтах прочитанного ещё не засчитывается
+    cut = len(HEAD + CONTAINER) + 10
+    assert ContainerEndDetector('articles').feed(data[:cut]) is None
+    assert ContainerEndDetector('missing').feed(data) is None
+
+
+class _Response:
+    def __init__(self, data, size):
+        self.data, self.size = data, size
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.data), self.size):
+            yield self.data[start:start + self.size]
+
+
+def test_read_body_stops_after_container():
+    data, expected = _page()
+    assert read_body(_Response(data, 1000), 10 ** 6, 'articles') == (data[:expected], 'container')
+    assert read_body(_Response(data, 1000), 10 ** 6) == (data, None)
+    assert read_body(_Response(data, 1000), 5000, 'missing') == (data[:5000], 'max_bytes')
+
+
+TEXT = 'Новости Владивостока: в городе открыли новую набережную, жители довольны погодой. ' * 5
+
+
+def _html(meta=''):
+    return f'<html><head>{meta}</head><body><p>{TEXT}</p></body></html>'
+
+
+@pytest.mark.parametrize('data, content_type', [
+    # заголовок важнее <meta>
+    (_html('<meta charset="utf-8">').encode('cp1251'), 'text/html; charset=windows-1251'),
+    # без заголовка (или с неизвестной кодировкой в нём) - <meta>
+    (_html('<meta http-equiv="Content-Type" content="text/html; charset=koi8-r">').encode('koi8-r'), 'text/html'),
+    (_html('<meta charset="windows-1251">').encode('cp1251'), 'text/html; charset=x-unknown'),
+    # ни того, ни другого - UTF-8
+    (_html().encode('utf-8'), None),
+    # не UTF-8 - определение по содержимому
+    (_html().encode('cp1251'), None),
+])
+def test_decode_html_encoding_order(data, content_type):
+    assert TEXT in decode_html(data, content_type)
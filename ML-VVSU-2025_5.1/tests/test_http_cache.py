@@ -0,0 +1,22 @@
+from http_cache import ResponseCache
+
+
+def test_running_total_matches_index(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=50_000)
+    try:
+        for i in range(300):
+            # 40 разных тел: часть записей делит одно тело
+            cache.store(f'https://example.com/{i}', f'x{i % 40}' * 500)
+            assert cache.total_bytes() == cache._count_bytes()
+            assert cache.total_bytes() <= 50_000
+        cache.store('https://example.com/299', 'новое тело')
+        assert cache.total_bytes() == cache._count_bytes()
+        total = cache.total_bytes()
+    finally:
+        cache.close()
+
+    reopened = ResponseCache(str(tmp_path), max_bytes=50_000)
+    try:
+        assert reopened.total_bytes() == total
+    finally:
+        reopened.close()
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from http_client import SessionPool, configure_cache, fetch_page
+
+FETCHES = 50
+
+
+def _fetch_all(server, pool, workers=1):
+    urls = [f'{server.base_url}/a{i % 5}' for i in range(FETCHES)]
+
+    def fetch(url):
+        response = pool.get(url).get(url, timeout=5)
+        assert response.status_code == 200
+        return response.text
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(fetch, urls))
+    finally:
+        pool.close()
+
+
+def test_session_pool_reuses_connections(stand_in_server):
+    stand_in_server.pages.update({f'/a{i}': f'статья {i}' for i in range(5)})
+    _fetch_all(stand_in_server, SessionPool())
+    assert stand_in_server.requests == FETCHES
+    assert stand_in_server.connections == 1
+
+    # из нескольких потоков соединений не больше, чем потоков
+    stand_in_server.connections = 0
+    _fetch_all(stand_in_server, SessionPool(), workers=4)
+    assert stand_in_server.connections <= 4
+
+
+def test_without_keep_alive_every_fetch_connects(stand_in_server):
+    stand_in_server.pages.update({f'/a{i}': f'статья {i}' for i in range(5)})
+    _fetch_all(stand_in_server, SessionPool(keep_alive=False))
+    assert stand_in_server.connections == FETCHES
+
+
+def test_revalidate_bypasses_fresh_cache(stand_in_server, tmp_path):
+    stand_in_server.pages['/list'] = 'список'
+    url = f'{stand_in_server.base_url}/list'
+    configure_cache(str(tmp_path))
+    try:
+        assert fetch_page(url, kind='list').status == 200
+        # в пределах cache_ttl ответ берётся с диска без запроса
+        cached = fetch_page(url, kind='list')
+        assert cached.from_cache and stand_in_server.requests == 1
+        # revalidate: условный запрос, сервер подтверждает кэш ответом 304
+        revalidated = fetch_page(url, kind='list', revalidate=True)
+        assert revalidated.status == 304 and revalidated.text == 'список'
+        assert stand_in_server.requests == 2
+
+        stand_in_server.pages['/list'] = 'новый список'
+        assert fetch_page(url, kind='list', revalidate=True).text == 'новый список'
+    finally:
+        configure_cache(None)
@@ -0,0 +1,26 @@
+import pytest
+
+from bench import fixture_path, recorded_sites
+from parser import create_parser
+
+
+def _read(site_name, kind):
+    with open(fixture_path(site_name, kind), encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('site_name', recorded_sites())
+def test_backends_parse_fixtures_identically(site_name):
+    bs4_parser = create_parser(site_name, backend='bs4')
+    lxml_parser = create_parser(site_name, backend='lxml')
+
+    list_html = _read(site_name, 'list')
+    articles_meta = bs4_parser.parse_list_page(list_html)
+    assert articles_meta
+    assert lxml_parser.parse_list_page(list_html) == articles_meta
+
+    article_html = _read(site_name, 'article')
+    meta = articles_meta[0]
+    article = bs4_parser.parse_article_page(article_html, dict(meta))
+    assert article
+    assert lxml_parser.parse_article_page(article_html, dict(meta)) == article
@@ -0,0 +1,58 @@
+import pytest
+
+from metrics import Counter, Histogram, Registry
+
+BUCKETS = (0.1, 1.0)
+
+
+def _registry():
+    registry = Registry()
+    pages = registry.register(Counter('pages_total', 'Страницы', ('site', 'kind')))
+    latency = registry.register(Histogram('fetch_seconds', 'Загрузка', ('site',), buckets=BUCKETS))
+    return registry, pages, latency
+
+
+def test_prometheus_histogram_buckets_are_cumulative():
+    registry, pages, latency = _registry()
+    pages.inc('habr', 'list')
+    pages.inc('habr', 'list', amount=2)
+    # граница корзины включается в неё (le - меньше или равно)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe('habr', value=value)
+    assert registry.render_prometheus().splitlines() == [
+        '# HELP pages_total Страницы',
+        '# TYPE pages_total counter',
+        'pages_total{site="habr",kind="list"} 3',
+        '# HELP fetch_seconds Загрузка',
+        '# TYPE fetch_seconds histogram',
+        'fetch_seconds_bucket{site="habr",le="0.1"} 2',
+        'fetch_seconds_bucket{site="habr",le="1"} 3',
+        'fetch_seconds_bucket{site="habr",le="+Inf"} 4',
+        'fetch_seconds_sum{site="habr"} 3.65',
+        'fetch_seconds_count{site="habr"} 4',
+    ]
+
+
+@pytest.mark.parametrize('counts, maximum, q, expected', [
+    # линейно внутри корзины: 0.1 - граница первой корзины
+    ([2, 1, 1], 3.0, 0.5, 0.1),
+    ([2, 1, 1], 3.0, 0.75, 1.0),
+    ([2, 1, 1], 3.0, 0.25, 0.05),
+    # в корзине +Inf верхняя граница - максимум
+    ([2, 1, 1], 3.0, 0.95, 2.6),
+    # верхняя граница не больше максимума
+    ([4, 0, 0], 0.02, 0.5, 0.01),
+    ([0, 0, 0], 0.0, 0.5, 0.0),
+])
+def test_quantile_interpolates_within_bucket(counts, maximum, q, expected):
+    histogram = Histogram('h', 'h', buckets=BUCKETS)
+    assert histogram._quantile(counts, sum(counts), q, maximum) == pytest.approx(expected)
+
+
+def test_summary_stats_from_observations():
+    _, _, latency = _registry()
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe('habr', value=value)
+    [(labels, stats)] = latency.items()
+    assert labels == ('habr',)
+    assert stats == {'count': 4, 'sum': 3.65, 'mean': 0.9125, 'p50': 0.1, 'p95': 2.6, 'max': 3.0}
@@ -0,0 +1,63 @@
+import random
+import struct
+
+from db import init_db, BatchWriter
+from near_dup import NUM_HASHES, find_near_duplicate, index_signature, similarities
+
+TEXT = ('Правительство утвердило новые правила работы такси в крупных городах страны, '
+        'они вступят в силу с первого марта следующего года и коснутся всех агрегаторов')
+
+
+def _signature(values):
+    return struct.pack(f'<{NUM_HASHES}I', *values)
+
+
+def test_similarities_match_elementwise_comparison():
+    rng = random.Random(1)
+    base = [rng.getrandbits(32) for _ in range(NUM_HASHES)]
+    others = []
+    for changed in (0, 1, 17, NUM_HASHES):
+        values = list(base)
+        for i in rng.sample(range(NUM_HASHES), changed):
+            values[i] ^= 1 << rng.randrange(32)
+        others.append(values)
+    scores = similarities(_signature(base), [_signature(values) for values in others])
+    assert scores == [sum(a == b for a, b in zip(base, values)) / NUM_HASHES for values in others]
+    assert scores[0] == 1.0 and scores[-1] == 0.0
+
+
+def test_candidates_ranked_by_matched_bands(tmp_path):
+    conn = init_db(str(tmp_path / 'a.sqlite'))
+    rng = random.Random(2)
+    query = [rng.getrandbits(32) for _ in range(NUM_HASHES)]
+    # много статей делят с запросом одну полосу, настоящая копия добавлена последней
+    rows = [query[:4] + [rng.getrandbits(32) for _ in range(NUM_HASHES - 4)] for _ in range(300)]
+    rows.append(query[:-2] + [0, 0])
+    with conn:
+        for i, values in enumerate(rows):
+            cur = conn.execute("INSERT INTO articles (guid, url, minhash) VALUES (?, ?, ?)",
+                               (f'g{i}', f'u{i}', _signature(values)))
+            index_signature(conn, cur.lastrowid, _signature(values))
+    assert find_near_duplicate(conn, _signature(query)) == (len(rows), (NUM_HASHES - 2) / NUM_HASHES)
+    conn.close()
+
+
+def test_batch_writer_links_duplicates_within_and_across_batches(tmp_path):
+    conn = init_db(str(tmp_path / 'a.sqlite'))
+    record = {'guid': 'g1', 'title': 'Такси', 'description': TEXT, 'url': 'https://a.ru/1'}
+    writer = BatchWriter(conn, batch_size=100, near_dup_action='drop_text')
+    writer.add(record)
+    writer.add(dict(record, guid='g2', url='https://b.ru/1', description=TEXT + ' Источник: ТАСС'))
+    writer.add(dict(record, guid='g3', url='https://c.ru/1', description='Совсем другая новость про погоду в Москве'))
+    assert writer.close() == 3 and writer.duplicate_count == 1
+    writer.add(dict(record, guid='g4', url='https://d.ru/1', description=TEXT + ' Подробнее на сайте'))
+    assert writer.close() == 1 and writer.duplicate_count == 2
+
+    rows = dict(conn.execute("SELECT url, duplicate_of FROM articles").fetchall())
+    ids = dict(conn.execute("SELECT url, id FROM articles").fetchall())
+    assert rows == {'https://a.ru/1': None, 'https://b.ru/1': ids['https://a.ru/1'],
+                    'https://c.ru/1': None, 'https://d.ru/1': ids['https://a.ru/1']}
+    assert conn.execute("SELECT description FROM articles WHERE url = 'https://b.ru/1'").fetchone()[0] is None
+    indexed = {row[0] for row in conn.execute("SELECT DISTINCT article_id FROM article_lsh")}
+    assert indexed == {ids['https://a.ru/1'], ids['https://c.ru/1']}
+    conn.close()
@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pytest
+
+import neighbors
+from embeddings import EmbeddingStore
+from neighbors import NORMS_FILE, open_index
+
+DIM = 16
+
+
+def _store(path, vectors, version='v1', first_id=1):
+    store = EmbeddingStore(path)
+    if store.model_version != version:
+        store.reset(DIM, version)
+    # id через один - строки хранилища не совпадают с id статей
+    store.append(range(first_id, first_id + 2 * len(vectors), 2), vectors)
+    return store
+
+
+def _clustered(rng, n, clusters=40):
+    centers = rng.normal(size=(clusters, DIM))
+    return (centers[rng.integers(clusters, size=n)] + rng.normal(0, 0.3, (n, DIM))).astype(np.float32)
+
+
+def _oracle(vectors, ids, queries, k):
+    """Точный ответ: косинусная близость ко всем векторам и argsort"""
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ unit.T
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    return ids[order], np.take_along_axis(scores, order, axis=1)
+
+
+def test_exact_matches_argsort_oracle(tmp_path, monkeypatch):
+    # несколько блоков перебора: лучшие k собираются между блоками
+    monkeypatch.setattr(neighbors, 'NEIGHBORS_BLOCK_ROWS', 64)
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, DIM)).astype(np.float32)
+    _store(str(tmp_path), vectors)
+    index = open_index(str(tmp_path))
+    assert index.centroids is None
+
+    queries = rng.normal(size=(5, DIM)).astype(np.float32)
+    ids, scores = index.search(queries, 10, mode='exact')
+    expected_ids, expected_scores = _oracle(vectors, np.arange(1, 1001, 2), queries, 10)
+    assert ids.tolist() == expected_ids.tolist()
+    assert scores == pytest.approx(expected_scores, abs=1e-5)
+
+    # similar не возвращает саму статью
+    pairs = index.similar(1, k=3)
+    assert len(pairs) == 3 and 1 not in [article_id for article_id, _ in pairs]
+    with pytest.raises(KeyError):
+        index.similar(2)
+
+
+def test_ivf_recall_on_clustered_store(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = _clustered(rng, 3000)
+    _store(str(tmp_path), vectors)
+    index = open_index(str(tmp_path), ivf=True)
+    assert len(index.centroids) == int(np.sqrt(3000))
+
+    queries = vectors[rng.choice(len(vectors), 50, replace=False)] + rng.normal(0, 0.1, (50, DIM)).astype(np.float32)
+    exact, _ = index.search(queries, 10, mode='exact')
+    approximate, _ = index.search(queries, 10, mode='ivf')
+    recall = np.mean([len(set(a) & set(e)) / 10 for a, e in zip(approximate.tolist(), exact.tolist())])
+    assert recall >= 0.9
+
+
+def test_update_appends_and_retrains(tmp_path):
+    path = str(tmp_path)
+    rng = np.random.default_rng(2)
+    first = _clustered(rng, 400)
+    _store(path, first)
+    index = open_index(path, ivf=True)
+    assert (index.count, index.trained_count) == (400, 400)
+    centroids = index.centroids.copy()
+
+    # новые статьи дописываются к прежним центроидам
+    more = _clustered(rng, 200)
+    _store(path, more, first_id=801)
+    index = open_index(path)
+    assert (index.count, index.trained_count) == (600, 400)
+    assert np.array_equal(index.centroids, centroids)
+    assert os.path.getsize(os.path.join(path, NORMS_FILE)) == 4 * 600
+    for mode in ('exact', 'ivf'):
+        ids, _ = index.search(more[-1], 1, mode=mode)
+        assert ids[0, 0] == 801 + 2 * 199
+
+    # корпус вырос в NEIGHBORS_IVF_RETRAIN_FACTOR раз - центроиды обучаются заново
+    _store(path, _clustered(rng, 1000), first_id=1201)
+    index = open_index(path)
+    assert index.count == index.trained_count == 1600
+    assert len(index.centroids) == int(np.sqrt(1600))
+
+    # векторы пересчитаны под другую модель - индекс и центроиды строятся с нуля
+    EmbeddingStore(path).reset(DIM, 'v2')
+    other = _clustered(rng, 100)
+    _store(path, other, version='v2')
+    index = open_index(path)
+    assert index.count == 100 and index.centroids is None
+    index = open_index(path, ivf=True)
+    assert index.count == index.trained_count == 100 and len(index.centroids) == 10
+    ids, _ = index.search(other[5], 1, mode='exact')
+    assert ids[0, 0] == 11
@@ -0,0 +1,146 @@
+from db import init_db, get_crawl_state
+from http_client import configure_cache
+from main import parse_site
+from parser import create_parser
+from pipeline import iter_new_articles, run_pipeline, CrawlProgress, save_crawl_progress
+from ratelimit import AdaptiveRateLimiter
+
+
+class LinkListParser:
+    """Парсер-заглушка: на странице списка - ссылки по строке, статьи не разбираются"""
+
+    def __init__(self):
+        self.rate_limiter = AdaptiveRateLimiter(rate=1000, burst=1000)
+
+    def parse_list_page(self, html):
+        return [{'title': url, 'url': url} for url in html.split()]
+
+
+class DatedListParser(LinkListParser):
+    """Статьи на странице списка идут от новых к старым, дата - по номеру статьи"""
+
+    def parse_list_page(self, html):
+        return [dict(meta, published_at=f'2025-01-0{meta["url"][-1]}T00:00:00')
+                for meta in super().parse_list_page(html)]
+
+
+def _site(server):
+    articles = [f'{server.base_url}/a{i}' for i in (1, 2)]
+    server.pages['/list'] = '\n'.join(articles)
+    for i in (1, 2):
+        server.pages[f'/a{i}'] = f'статья {i}'
+    return f'{server.base_url}/list', articles
+
+
+def _crawl(list_url, db_conn=None):
+    return [meta['url'] for meta, _ in iter_new_articles(LinkListParser(), [list_url], db_conn=db_conn)]
+
+
+def test_fresh_cache_hit_does_not_skip_listing(stand_in_server, tmp_path):
+    list_url, articles = _site(stand_in_server)
+    configure_cache(str(tmp_path / 'cache'))
+    try:
+        # как --dry-run: страницы попадают в кэш, но в БД ничего не пишется
+        assert _crawl(list_url) == articles
+        requests_before = stand_in_server.requests
+        conn = init_db(str(tmp_path / 'articles.sqlite'))
+        try:
+            # в пределах cache_ttl страница списка берётся из кэша, но статьи всё равно отдаются
+            assert _crawl(list_url, conn) == articles
+            assert stand_in_server.requests == requests_before
+
+            # уже сохранённые статьи пропускает known_urls
+            with conn:
+                conn.execute("INSERT INTO articles (guid, title, description, url) VALUES ('g1', 't', 'd', ?)",
+                             (articles[0],))
+            assert _crawl(list_url, conn) == articles[1:]
+        finally:
+            conn.close()
+    finally:
+        configure_cache(None)
+
+
+def _store(conn, url):
+    with conn:
+        conn.execute("INSERT INTO articles (guid, title, description, url) VALUES (?, 't', 'd', ?)", (url, url))
+
+
+def test_crawl_state_waits_for_stored_articles(stand_in_server, tmp_path):
+    list_url, articles = _site(stand_in_server)
+    conn = init_db(str(tmp_path / 'articles.sqlite'))
+    try:
+        def crawl():
+            progress = CrawlProgress('site')
+            for _ in iter_new_articles(DatedListParser(), [list_url], db_conn=conn, site_name='site',
+                                       incremental=True, progress=progress):
+                pass
+            return progress
+
+        # загружено, но ещё не записано: состояние не сохраняется при прерванном обходе
+        progress = crawl()
+        progress.completed = False
+        save_crawl_progress(conn, progress)
+        assert get_crawl_state(conn, 'site') is None
+
+        # записана только более новая статья: отметка не выше даты незаписанной
+        progress = crawl()
+        _store(conn, articles[1])
+        save_crawl_progress(conn, progress)
+        assert get_crawl_state(conn, 'site')['newest_published_at'] == '2025-01-01T00:00:00'
+
+        progress = crawl()
+        assert list(progress.yielded) == articles[:1]
+        _store(conn, articles[0])
+        save_crawl_progress(conn, progress)
+        assert get_crawl_state(conn, 'site')['newest_published_at'] == '2025-01-02T00:00:00'
+    finally:
+        conn.close()
+
+
+ARTICLES = 8
+
+
+def _article_html(i):
+    # статья 7 - перепечатка статьи 3: почти дубликат при любом порядке записи
+    words = ' '.join(f'слово{i % 7 if i == 7 else i}x{j}' for j in range(60))
+    return f'<html><body><div class="tm-article-presenter__content"><p>{words}</p></div></body></html>'
+
+
+def _habr_site(server):
+    """Страницы для парсера habr: список - ссылки по строке, статьи разбирает настоящий парсер"""
+    articles = [f'{server.base_url}/a{i}' for i in range(ARTICLES)]
+    server.pages['/list'] = '\n'.join(articles)
+    for i in range(ARTICLES):
+        server.pages[f'/a{i}'] = _article_html(i)
+    parser = create_parser('habr')
+    parser.parse_list_page = LinkListParser().parse_list_page
+    parser.rate_limiter = AdaptiveRateLimiter(rate=1000, burst=1000)
+    return f'{server.base_url}/list', parser
+
+
+def _contents(db_path):
+    conn = init_db(db_path)
+    try:
+        rows = conn.execute("SELECT guid, title, description, url FROM articles").fetchall()
+        duplicates = conn.execute("SELECT COUNT(duplicate_of) FROM articles").fetchone()[0]
+    finally:
+        conn.close()
+    return sorted(rows), duplicates
+
+
+def test_pipeline_with_workers_matches_serial_path(stand_in_server, tmp_path):
+    list_url, parser = _habr_site(stand_in_server)
+    serial_path, pipeline_path = str(tmp_path / 'serial.sqlite'), str(tmp_path / 'pipeline.sqlite')
+
+    conn = init_db(serial_path)
+    try:
+        serial_saved = parse_site(parser, [list_url], db_conn=conn, site_name='habr')
+    finally:
+        conn.close()
+    # в процессах пула статьи разбирает свой экземпляр парсера habr
+    pipeline_saved = run_pipeline([('habr', parser, [list_url])], pipeline_path, workers=2)
+
+    assert serial_saved == pipeline_saved == ARTICLES
+    rows, duplicates = _contents(pipeline_path)
+    assert len(rows) == ARTICLES and duplicates == 1
+    assert (rows, duplicates) == _contents(serial_path)
@@ -0,0 +1,24 @@
+import threading
+
+import profiling
+
+
+def test_cprofile_only_in_main_thread(tmp_path):
+    profiling.configure(str(tmp_path), 'cprofile')
+    try:
+        def work():
+            # в потоке этап не включает второй профилировщик (в 3.12+ это ошибка)
+            with profiling.stage('fetch'):
+                sum(range(1000))
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        with profiling.stage('article-parse'):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            with profiling.stage('clean'):
+                sum(range(1000))
+    finally:
+        written = dict(profiling.finish())
+    assert set(written) == {'article-parse', 'clean'}
@@ -0,0 +1,74 @@
+import pytest
+
+from db import init_db
+from search import build_match_query, rebuild_fts_index, search_articles
+
+ARTICLES = [
+    ('Новая статья о поиске', 'Полнотекстовый поиск в SQLite', 'https://habr.com/ru/articles/1/', '2025-03-09T12:00:00+00:00'),
+    ('Обзор статей недели', 'Подборка материалов', 'https://www.newsvl.ru/vlad/2025/03/10/2/', '2025-03-10T00:00:00+00:00'),
+    ('Статьи о Python', 'Python и SQLite', 'https://habr.com/ru/articles/3/', '2025-03-10T23:59:59+00:00'),
+    ('Новости города', 'Статья про погоду', 'https://www.newsvl.ru/vlad/2025/03/11/4/', '2025-03-11T00:00:00+00:00'),
+]
+
+
+def _insert(conn):
+    with conn:
+        conn.executemany(
+            "INSERT INTO articles (guid, title, description, url, published_at) VALUES (?, ?, ?, ?, ?)",
+            [(f'g{i}', *article) for i, article in enumerate(ARTICLES, 1)]
+        )
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = init_db(str(tmp_path / 'a.sqlite'))
+    _insert(conn)
+    yield conn
+    conn.close()
+
+
+def _ids(results):
+    return sorted(r['id'] for r in results)
+
+
+def test_russian_words_match_by_stem_prefix(conn):
+    assert build_match_query('Статьи про SQLite') == '"стат"* AND "про" AND "sqlite"'
+    # «статьи» находит «статья», «статей» и «статьи»; заголовок весит больше текста
+    results = search_articles(conn, 'статьи')
+    assert _ids(results) == [1, 2, 3, 4]
+    assert results[-1]['id'] == 4
+    assert _ids(search_articles(conn, 'статья sqlite')) == [1, 3]
+
+
+def test_site_filter_is_url_prefix_range(conn):
+    assert _ids(search_articles(conn, 'статьи', site='habr')) == [1, 3]
+    assert _ids(search_articles(conn, 'статьи', site='newsvl')) == [2, 4]
+    assert search_articles(conn, 'статьи', site='interfax') == []
+
+
+@pytest.mark.parametrize('date_from, date_to, expected', [
+    ('2025-03-10', '2025-03-10', [2, 3]),
+    (None, '2025-03-10', [1, 2, 3]),
+    ('2025-03-11', None, [4]),
+    ('2025-03-10T12:00:00', '2025-03-11T00:00:00+00:00', [3, 4]),
+])
+def test_date_to_includes_whole_day(conn, date_from, date_to, expected):
+    assert _ids(search_articles(conn, 'статьи', date_from=date_from, date_to=date_to)) == expected
+
+
+def test_fts_rebuild_indexes_articles_saved_before_fts(tmp_path, capsys):
+    path = str(tmp_path / 'old.sqlite')
+    conn = init_db(path)
+    with conn:
+        conn.execute("DROP TABLE articles_fts")
+        for suffix in ('ai', 'ad', 'au'):
+            conn.execute(f"DROP TRIGGER articles_fts_{suffix}")
+    _insert(conn)
+    conn.close()
+
+    conn = init_db(path)
+    assert 'fts-rebuild' in capsys.readouterr().out
+    assert search_articles(conn, 'статьи') == []
+    assert rebuild_fts_index(conn) == len(ARTICLES)
+    assert _ids(search_articles(conn, 'статьи')) == [1, 2, 3, 4]
+    conn.close()
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+import textprep
+from db import init_db
+from textprep import load_lemma_cache, preprocess_new_articles
+
+LEMMAS = {'новости': 'новость', 'новостей': 'новость', 'города': 'город', 'городе': 'город',
+          'открыли': 'открыть', 'парк': 'парк', 'жители': 'житель', 'рады': 'радый'}
+
+
+class StubAnalyzer:
+    """Вместо pymorphy3: леммы из словаря, запоминает разобранные слова"""
+
+    def __init__(self):
+        self.parsed = []
+
+    def parse(self, token):
+        self.parsed.append(token)
+        return [SimpleNamespace(normal_form=LEMMAS.get(token, token))]
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    stub = StubAnalyzer()
+    monkeypatch.setattr(textprep, '_analyzer', lambda: stub)
+    monkeypatch.setattr(textprep, '_stopwords', frozenset({'в', 'и', 'этот'}))
+    return stub
+
+
+def _insert(conn, descriptions):
+    with conn:
+        conn.executemany("INSERT INTO articles (guid, description) VALUES (?, ?)",
+                         [(f'g{text}', text) for text in descriptions])
+
+
+def _tokens(conn):
+    return dict(conn.execute("SELECT article_id, tokens FROM article_tokens"))
+
+
+def test_only_new_articles_and_new_words(tmp_path, analyzer):
+    conn = init_db(str(tmp_path / 'a.sqlite'))
+    try:
+        _insert(conn, ['Новости города: в городе открыли парк', 'Жители города рады, и этот парк - Python'])
+        # статьи по одной: слова второй статьи, уже разобранные в первой, берутся из кэша
+        assert preprocess_new_articles(conn, batch_size=1) == (2, 7, 7)
+        # стоп-слова и латиница не разбираются, каждое слово - один раз
+        assert sorted(analyzer.parsed) == sorted(['новости', 'города', 'городе', 'открыли', 'парк', 'жители', 'рады'])
+        assert _tokens(conn) == {1: 'новость город город открыть парк', 2: 'житель город радый парк python'}
+        cache = load_lemma_cache(conn)
+
+        # повторный запуск: статьи с леммами пропускаются
+        analyzer.parsed.clear()
+        assert preprocess_new_articles(conn) == (0, 0, 7)
+        assert analyzer.parsed == []
+
+        # новая статья: разбираются только слова, которых нет в кэше
+        _insert(conn, ['Новостей города больше: жители открыли музей'])
+        assert preprocess_new_articles(conn) == (1, 3, 10)
+        assert sorted(analyzer.parsed) == ['больше', 'музей', 'новостей']
+        assert _tokens(conn)[3] == 'новость город больше житель открыть музей'
+        assert set(load_lemma_cache(conn)) - set(cache) == {'больше', 'музей', 'новостей'}
+    finally:
+        conn.close()
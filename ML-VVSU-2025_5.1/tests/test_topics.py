@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import topics
+from db import init_db
+from embeddings import EmbeddingStore
+
+DIM = 32
+K = 3
+
+
+def _cluster(rng, direction, n):
+    """n векторов вокруг базисного направления direction"""
+    vectors = rng.normal(0, 0.1, (n, DIM)).astype(np.float32)
+    vectors[:, direction] += 1.0
+    return vectors
+
+
+def _topics(conn):
+    return dict(conn.execute("SELECT article_id, topic FROM article_topics").fetchall())
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Хранилище: по 100 статей в трёх темах, id 1..300 (тема статьи - (id - 1) // 100)"""
+    conn = init_db(str(tmp_path / 'a.sqlite'))
+    path = str(tmp_path / 'store')
+    store = EmbeddingStore(path)
+    store.reset(DIM, 'v1')
+    rng = np.random.default_rng(0)
+    store.append(range(1, 301), np.vstack([_cluster(rng, direction, 100) for direction in range(K)]))
+    yield conn, path, store, rng
+    conn.close()
+
+
+def test_first_fit_then_incremental_assign(corpus):
+    conn, path, store, rng = corpus
+    result = topics.update_topics(conn, path, K)
+    assert result == {'assigned': 300, 'refit': True, 'drift': 0.0}
+    assigned = _topics(conn)
+    assert len(assigned) == 300
+    # каждая синтетическая тема целиком попала в одну тему модели
+    labels = [{assigned[i] for i in range(start + 1, start + 101)} for start in (0, 100, 200)]
+    assert all(len(label) == 1 for label in labels) and len(set.union(*labels)) == K
+    fitted = topics.load_topic_model(conn)
+
+    store.append(range(301, 331), _cluster(rng, 1, 30))
+    result = topics.update_topics(conn, path, K)
+    assert result['assigned'] == 30 and not result['refit']
+    assigned = _topics(conn)
+    assert len(assigned) == 330
+    assert {assigned[i] for i in range(301, 331)} == labels[1]
+    model = topics.load_topic_model(conn)
+    # центроиды сдвинуты, а не обучены заново
+    assert model.fitted_at == fitted.fitted_at and model.weights.sum() > fitted.weights.sum()
+
+
+def test_drift_refits_in_one_transaction(corpus, monkeypatch):
+    conn, path, store, rng = corpus
+    topics.update_topics(conn, path, K)
+    before = _topics(conn)
+    # статьи новой темы далеко от всех центроидов
+    store.append(range(301, 401), _cluster(rng, K, 100))
+
+    def fail(conn, model):
+        raise RuntimeError('сбой записи модели')
+
+    monkeypatch.setattr(topics, '_save_topic_model', fail)
+    with pytest.raises(RuntimeError):
+        topics.update_topics(conn, path, K)
+    # ни удаление тем, ни темы новых статей не сохранились
+    assert _topics(conn) == before
+    monkeypatch.undo()
+
+    result = topics.update_topics(conn, path, K)
+    assert result['refit'] and result['drift'] > topics.TOPICS_DRIFT_THRESHOLD
+    assert len(_topics(conn)) == 400
+    model = topics.load_topic_model(conn)
+    assert model.drift == 0.0 and model.centroids.shape == (K, DIM)
@@ -0,0 +1,177 @@
+"""
+Предобработка текстов статей для Word2Vec и подобных моделей (pymorphy3 и стоп-слова nltk):
+нижний регистр, слова из букв длиной от TEXTPREP_MIN_TOKEN_LENGTH, русские слова - в нормальную
+форму (pymorphy3), без стоп-слов; латиница остаётся как есть.
+
+Лемматизация - самая дорогая часть, а слова в корпусе в основном повторяются, поэтому
+нормальная форма каждого слова считается один раз за всё время: кэш токен -> лемма хранится
+в БД (lemma_cache) и пополняется только новыми словами. Новые слова пачки делятся между
+процессами (workers > 0). Леммы статьи сохраняются в article_tokens по id статьи;
+обрабатываются только статьи, которых там ещё нет.
+"""
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+from db import SQL_MAX_VARIABLES
+from config import TEXTPREP_BATCH_SIZE, TEXTPREP_WORKERS, TEXTPREP_CHUNK_TOKENS, TEXTPREP_MIN_TOKEN_LENGTH
+
+TOKEN_RE = re.compile(r'[а-яёa-z]+')
+_CYRILLIC_RE = re.compile(r'[а-яё]')
+
+_NEW_ARTICLES_SQL = """
+SELECT a.id, a.description FROM articles a
+LEFT JOIN article_tokens t ON t.article_id = a.id
+WHERE t.article_id IS NULL AND a.id > ?
+ORDER BY a.id LIMIT ?
+"""
+
+# анализатор создаётся один раз на процесс
+_morph = None
+_stopwords: Optional[FrozenSet[str]] = None
+
+
+def _analyzer():
+    global _morph
+    if _morph is None:
+        try:
+            from pymorphy3 import MorphAnalyzer
+        except ImportError as e:
+            raise ImportError("Для лемматизации нужен пакет pymorphy3: pip install pymorphy3") from e
+        _morph = MorphAnalyzer()
+    return _morph
+
+
+def russian_stopwords() -> FrozenSet[str]:
+    global _stopwords
+    if _stopwords is None:
+        try:
+            from nltk.corpus import stopwords
+            _stopwords = frozenset(stopwords.words('russian'))
+        except (ImportError, LookupError) as e:
+            raise ImportError("Нужны стоп-слова nltk: pip install nltk && "
+                              "python -c \"import nltk; nltk.download('stopwords')\"") from e
+    return _stopwords
+
+
+def lemmatize_tokens(tokens: List[str]) -> List[str]:
+    """Нормальные формы слов (по первому разбору pymorphy3); выполняется и в процессах пула"""
+    morph = _analyzer()
+    return [morph.parse(token)[0].normal_form for token in tokens]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(str(text).lower()) if len(token) >= TEXTPREP_MIN_TOKEN_LENGTH]
+
+
+def _is_russian(token: str) -> bool:
+    return _CYRILLIC_RE.match(token) is not None
+
+
+def lemmas_from_tokens(tokens: List[str], cache: Dict[str, str], stopwords: FrozenSet[str]) -> List[str]:
+    """Леммы по готовому кэшу: все русские слова tokens (кроме стоп-слов) должны в нём быть"""
+    lemmas = []
+    for token in tokens:
+        if not _is_russian(token):
+            lemmas.append(token)
+            continue
+        if token in stopwords:
+            continue
+        lemma = cache[token]
+        if lemma not in stopwords:
+            lemmas.append(lemma)
+    return lemmas
+
+
+def preprocess_text(text: Optional[str], cache: Optional[Dict[str, str]] = None) -> List[str]:
+    """Леммы одного текста; cache - словарь токен -> лемма, пополняется новыми словами"""
+    stopwords = russian_stopwords()
+    cache = {} if cache is None else cache
+    tokens = tokenize(text)
+    new_tokens = list({t for t in tokens if _is_russian(t) and t not in stopwords and t not in cache})
+    cache.update(zip(new_tokens, lemmatize_tokens(new_tokens)))
+    return lemmas_from_tokens(tokens, cache, stopwords)
+
+
+def load_lemma_cache(conn) -> Dict[str, str]:
+    return dict(conn.execute("SELECT token, lemma FROM lemma_cache"))
+
+
+def _lemmatize_new(tokens: List[str], pool: Optional[ProcessPoolExecutor]) -> Dict[str, str]:
+    if not tokens:
+        return {}
+    if pool is None:
+        return dict(zip(tokens, lemmatize_tokens(tokens)))
+    chunks = [tokens[i:i + TEXTPREP_CHUNK_TOKENS] for i in range(0, len(tokens), TEXTPREP_CHUNK_TOKENS)]
+    lemmas = []
+    for chunk_lemmas in pool.map(lemmatize_tokens, chunks):
+        lemmas.extend(chunk_lemmas)
+    return dict(zip(tokens, lemmas))
+
+
+def preprocess_new_articles(conn, workers: int = TEXTPREP_WORKERS,
+                            batch_size: int = TEXTPREP_BATCH_SIZE) -> Tuple[int, int, int]:
+    """
+    Лемматизирует статьи, которых ещё нет в article_tokens.
+    Возвращает (статей обработано, новых слов в кэше, слов всего в кэше).
+    """
+    stopwords = russian_stopwords()
+    cache = load_lemma_cache(conn)
+    processed = new_words = 0
+    last_id = 0
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    try:
+        while True:
+            rows = conn.execute(_NEW_ARTICLES_SQL, (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            docs = [(article_id, tokenize(description)) for article_id, description in rows]
+            unknown = sorted({
+                token for _, tokens in docs for token in tokens
+                if _is_russian(token) and token not in stopwords and token not in cache
+            })
+            lemmatized = _lemmatize_new(unknown, pool)
+            cache.update(lemmatized)
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO lemma_cache (token, lemma) VALUES (?, ?)",
+                                 lemmatized.items())
+                conn.executemany(
+                    "INSERT OR REPLACE INTO article_tokens (article_id, tokens) VALUES (?, ?)",
+                    [(article_id, ' '.join(lemmas_from_tokens(tokens, cache, stopwords)))
+                     for article_id, tokens in docs]
+                )
+            processed += len(rows)
+            new_words += len(lemmatized)
+            last_id = rows[-1][0]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return processed, new_words, len(cache)
+
+
+def iter_article_tokens(conn, ids: Optional[List[int]] = None) -> Iterator[Tuple[int, List[str]]]:
+    """(id статьи, леммы) из article_tokens - например, предложения для Word2Vec"""
+    if ids is None:
+        cursor = conn.execute("SELECT article_id, tokens FROM article_tokens ORDER BY article_id")
+        for article_id, tokens in cursor:
+            yield article_id, tokens.split()
+        return
+    for start in range(0, len(ids), SQL_MAX_VARIABLES):
+        chunk = ids[start:start + SQL_MAX_VARIABLES]
+        placeholders = ','.join('?' * len(chunk))
+        found = dict(conn.execute(
+            f"SELECT article_id, tokens FROM article_tokens WHERE article_id IN ({placeholders})", chunk
+        ))
+        for article_id in chunk:
+            if article_id in found:
+                yield article_id, found[article_id].split()
+
+
+def run_textprep(conn, workers: int = TEXTPREP_WORKERS):
+    started = time.perf_counter()
+    processed, new_words, cache_size = preprocess_new_articles(conn, workers=workers)
+    print(f"Обработано статей: {processed}, новых слов: {new_words}, слов в кэше лемм: {cache_size} "
+          f"за {time.perf_counter() - started:.1f} с")
@@ -0,0 +1,252 @@
+"""
+Темы статей: онлайн-кластеризация векторов статей (embeddings.py) мини-пакетным k-means
+по косинусной близости - вместо KMeans ноутбука, заново обучаемого на всём корпусе.
+
+Центроиды хранятся в БД (topic_model), тема каждой статьи - в article_topics.
+update_topics() относит статьи, получившие вектор с прошлого раза, к ближайшим центроидам
+и сдвигает центроиды мини-пакетами из этих статей (шаг кластера - 1 / число его статей):
+темы остаются актуальными без переобучения на всём корпусе, номера тем не меняются.
+Дрейф - рост скользящего среднего расстояния новых статей до центроидов относительно
+среднего расстояния при обучении; выше TOPICS_DRIFT_THRESHOLD темы обучаются заново,
+и новые центроиды сопоставляются старым, чтобы номера похожих тем сохранились.
+"""
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from embeddings import EmbeddingStore, update_embeddings
+from neighbors import normalize_rows
+from textprep import preprocess_new_articles
+from config import (
+    EMBEDDINGS_DIR, NEIGHBORS_BLOCK_ROWS, TOPICS_CLUSTERS, TOPICS_BATCH_SIZE, TOPICS_FIT_ITERATIONS,
+    TOPICS_DRIFT_THRESHOLD, TOPICS_DRIFT_SMOOTHING
+)
+
+try:
+    import numpy as np
+except ImportError:
+    # без numpy не откроется EmbeddingStore - сообщение об установке выдаёт он
+    np = None
+
+KMEANS_SEED = 42
+
+_SAVE_MODEL_SQL = """
+INSERT OR REPLACE INTO topic_model
+    (id, model_version, dim, centroids, weights, baseline_distance, recent_distance, fitted_at, refreshed_at)
+VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+class TopicModel(NamedTuple):
+    model_version: str
+    centroids: 'np.ndarray'
+    weights: 'np.ndarray'
+    # среднее косинусное расстояние статей до центроидов при обучении и скользящее - у новых статей
+    baseline_distance: float
+    recent_distance: float
+    fitted_at: int
+
+    @property
+    def drift(self) -> float:
+        if self.baseline_distance <= 0:
+            return 0.0
+        return self.recent_distance / self.baseline_distance - 1.0
+
+
+def load_topic_model(conn) -> Optional[TopicModel]:
+    row = conn.execute("""
+    SELECT model_version, dim, centroids, weights, baseline_distance, recent_distance, fitted_at
+    FROM topic_model WHERE id = 1
+    """).fetchone()
+    if row is None:
+        return None
+    version, dim, centroids, weights, baseline, recent, fitted_at = row
+    return TopicModel(
+        version,
+        np.frombuffer(centroids, dtype=np.float32).reshape(-1, dim).copy(),
+        np.frombuffer(weights, dtype=np.int64).copy(),
+        baseline, recent, fitted_at
+    )
+
+
+def _save_topic_model(conn, model: TopicModel):
+    conn.execute(_SAVE_MODEL_SQL, (
+        model.model_version, model.centroids.shape[1],
+        model.centroids.astype(np.float32).tobytes(), model.weights.astype(np.int64).tobytes(),
+        model.baseline_distance, model.recent_distance, model.fitted_at, int(time.time())
+    ))
+
+
+def _assign(centroids: 'np.ndarray', unit_vectors: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
+    """Ближайший центроид и косинусное расстояние до него для каждой строки"""
+    similarity = unit_vectors @ centroids.T
+    labels = np.argmax(similarity, axis=1)
+    return labels, 1.0 - similarity[np.arange(len(labels)), labels]
+
+
+def _minibatch_step(centroids: 'np.ndarray', weights: 'np.ndarray', unit_batch: 'np.ndarray'):
+    """Шаг мини-пакетного k-means: центроид сдвигается к среднему своих статей пакета с весом 1 / статей кластера"""
+    labels, _ = _assign(centroids, unit_batch)
+    counts = np.bincount(labels, minlength=len(centroids))
+    sums = np.zeros_like(centroids)
+    np.add.at(sums, labels, unit_batch)
+    hit = counts > 0
+    weights[hit] += counts[hit]
+    centroids[hit] += (sums[hit] - counts[hit, None] * centroids[hit]) / weights[hit, None]
+    centroids[hit] = normalize_rows(centroids[hit])
+
+
+def _initial_centroids(sample: 'np.ndarray', k: int, rng) -> 'np.ndarray':
+    """k-means++ по выборке: следующий центр - с вероятностью, пропорциональной квадрату расстояния"""
+    centroids = [sample[rng.integers(len(sample))]]
+    distance = 1.0 - sample @ centroids[0]
+    for _ in range(1, k):
+        weights = np.maximum(distance, 0) ** 2
+        total = weights.sum()
+        index = rng.choice(len(sample), p=weights / total) if total > 0 else rng.integers(len(sample))
+        centroids.append(sample[index])
+        distance = np.minimum(distance, 1.0 - sample @ sample[index])
+    return np.vstack(centroids).astype(np.float32)
+
+
+def _random_rows(store: EmbeddingStore, rng, size: int) -> 'np.ndarray':
+    rows = np.sort(rng.choice(store.count, min(size, store.count), replace=False))
+    return normalize_rows(np.asarray(store.vectors[rows]))
+
+
+def fit_centroids(store: EmbeddingStore, k: int = TOPICS_CLUSTERS, iterations: int = TOPICS_FIT_ITERATIONS,
+                  batch_size: int = TOPICS_BATCH_SIZE, seed: int = KMEANS_SEED) -> Tuple['np.ndarray', 'np.ndarray']:
+    """Обучение с нуля: iterations случайных мини-пакетов корпуса. Возвращает (центроиды, веса кластеров)"""
+    rng = np.random.default_rng(seed)
+    centroids = _initial_centroids(_random_rows(store, rng, max(batch_size, 10 * k)), k, rng)
+    weights = np.zeros(k, dtype=np.int64)
+    for _ in range(iterations):
+        _minibatch_step(centroids, weights, _random_rows(store, rng, batch_size))
+    return centroids, weights
+
+
+def _match_labels(old: 'np.ndarray', new: 'np.ndarray') -> 'np.ndarray':
+    """Порядок новых центроидов, при котором каждый по возможности получает номер ближайшего старого"""
+    similarity = new @ old.T
+    order = np.full(len(new), -1)
+    used_new, used_old = set(), set()
+    for flat in np.argsort(-similarity, axis=None):
+        i, j = divmod(int(flat), similarity.shape[1])
+        if i not in used_new and j not in used_old:
+            order[j] = i
+            used_new.add(i)
+            used_old.add(j)
+    return order
+
+
+def _assign_rows(conn, store: EmbeddingStore, centroids: 'np.ndarray', start: int) -> Tuple[int, float]:
+    """
+    Темы строк хранилища с номера start в article_topics, в транзакции вызывающего.
+    Возвращает (статей, сумма расстояний)
+    """
+    total = 0.0
+    for block_start in range(start, store.count, NEIGHBORS_BLOCK_ROWS):
+        block_stop = min(block_start + NEIGHBORS_BLOCK_ROWS, store.count)
+        labels, distances = _assign(centroids, normalize_rows(np.asarray(store.vectors[block_start:block_stop])))
+        ids = store.ids[block_start:block_stop]
+        conn.executemany(
+            "INSERT OR REPLACE INTO article_topics (article_id, topic, distance) VALUES (?, ?, ?)",
+            zip(ids.tolist(), labels.tolist(), distances.tolist())
+        )
+        total += float(distances.sum())
+    return store.count - start, total
+
+
+def _refit(conn, store: EmbeddingStore, k: int, previous: Optional[TopicModel]) -> TopicModel:
+    """Обучает темы заново; темы всех статей и модель заменяются одной транзакцией"""
+    centroids, weights = fit_centroids(store, k)
+    if previous is not None and previous.centroids.shape == centroids.shape:
+        order = _match_labels(previous.centroids, centroids)
+        centroids, weights = centroids[order], weights[order]
+    with conn:
+        conn.execute("DELETE FROM article_topics")
+        assigned, distance_sum = _assign_rows(conn, store, centroids, 0)
+        baseline = distance_sum / assigned
+        model = TopicModel(store.model_version, centroids, weights, baseline, baseline, int(time.time()))
+        _save_topic_model(conn, model)
+    return model
+
+
+def update_topics(conn, path: str = EMBEDDINGS_DIR, k: int = TOPICS_CLUSTERS, refit: bool = False) -> Dict:
+    """
+    Темы статей, получивших вектор с прошлого вызова, и сдвиг центроидов по ним.
+    Обучает темы заново, если их ещё нет, сменилась модель векторов или число тем, дрейф выше
+    порога или refit. Возвращает {'assigned', 'refit', 'drift'}: сколько статей получили тему,
+    было ли обучение заново и дрейф после обновления.
+    """
+    store = EmbeddingStore(path, readonly=True)
+    if store.count < k:
+        return {'assigned': 0, 'refit': False, 'drift': 0.0}
+    model = load_topic_model(conn)
+    compatible = (
+        model is not None and model.model_version == store.model_version
+        and model.centroids.shape == (k, store.dim)
+    )
+    if refit or not compatible:
+        _refit(conn, store, k, model if compatible else None)
+        return {'assigned': store.count, 'refit': True, 'drift': 0.0}
+
+    # векторы дописываются по возрастанию id: новые - после последней статьи с темой
+    last_id = conn.execute("SELECT MAX(article_id) FROM article_topics").fetchone()[0] or 0
+    start = int(np.searchsorted(store.ids, last_id, side='right'))
+    with conn:
+        # темы новых статей - по центроидам на момент их появления, затем центроиды сдвигаются
+        assigned, distance_sum = _assign_rows(conn, store, model.centroids, start)
+        centroids, weights = model.centroids.copy(), model.weights.copy()
+        for batch_start in range(start, store.count, TOPICS_BATCH_SIZE):
+            batch = np.asarray(store.vectors[batch_start:min(batch_start + TOPICS_BATCH_SIZE, store.count)])
+            _minibatch_step(centroids, weights, normalize_rows(batch))
+        recent = model.recent_distance
+        if assigned:
+            recent += TOPICS_DRIFT_SMOOTHING * (distance_sum / assigned - recent)
+        model = model._replace(centroids=centroids, weights=weights, recent_distance=recent)
+        if model.drift <= TOPICS_DRIFT_THRESHOLD:
+            _save_topic_model(conn, model)
+            return {'assigned': assigned, 'refit': False, 'drift': model.drift}
+        # при дрейфе темы новых статей не сохраняются: _refit заново назначит темы всем статьям
+        conn.rollback()
+
+    drift = model.drift
+    _refit(conn, store, k, model)
+    return {'assigned': assigned, 'refit': True, 'drift': drift}
+
+
+def topic_sizes(conn) -> List[Tuple[int, int]]:
+    return conn.execute("SELECT topic, COUNT(*) FROM article_topics GROUP BY topic ORDER BY topic").fetchall()
+
+
+def topic_examples(conn, topic: int, limit: int = 3) -> List[str]:
+    """Заголовки статей, ближайших к центроиду темы"""
+    rows = conn.execute("""
+    SELECT a.title FROM article_topics t JOIN articles a ON a.id = t.article_id
+    WHERE t.topic = ? ORDER BY t.distance LIMIT ?
+    """, (topic, limit)).fetchall()
+    return [title or '' for (title,) in rows]
+
+
+def refresh_topics(conn, wv, path: str = EMBEDDINGS_DIR, k: int = TOPICS_CLUSTERS) -> Dict:
+    """
+    Фоновое обновление для демона: леммы новых статей (textprep), их векторы по модели wv,
+    темы и сдвиг центроидов
+    """
+    preprocess_new_articles(conn)
+    update_embeddings(conn, wv, path)
+    return update_topics(conn, path, k)
+
+
+def print_topics(conn):
+    for topic, size in topic_sizes(conn):
+        print(f"  тема {topic:>2}: {size:>6} статей  {' | '.join(t[:50] for t in topic_examples(conn, topic))}")
+
+
+def run_topics(conn, path: str = EMBEDDINGS_DIR, k: int = TOPICS_CLUSTERS, refit: bool = False):
+    started = time.perf_counter()
+    result = update_topics(conn, path, k, refit)
+    note = ', темы обучены заново' if result['refit'] else ''
+    print(f"Статей с новой темой: {result['assigned']}, дрейф: {result['drift']:+.1%}{note} "
+          f"за {time.perf_counter() - started:.1f} с")
+    print_topics(conn)